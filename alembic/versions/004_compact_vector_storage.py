@@ -0,0 +1,120 @@
+"""compact vector storage (halfvec) with tuned HNSW indexes
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+# 迁移固定目标结构，不读取运行时配置（EMBEDDING_DIMENSIONS / VECTOR_STORAGE_TYPE / HNSW_*），
+# 保证同一个 revision 在任何环境下得到相同的表结构
+EMBEDDING_DIMENSIONS = 1024
+COLUMN_TYPE = f'halfvec({EMBEDDING_DIMENSIONS})'
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+
+# (表名, 新索引名)
+VECTOR_TABLES = [
+    ('block_versions', 'idx_block_versions_embedding_hnsw'),
+    ('user_memory_items', 'idx_user_memory_items_embedding_hnsw'),
+]
+
+
+def _embedding_column_type(bind, table_name: str):
+    """embedding 列当前的类型（如 vector(1536)），列不存在时返回 None"""
+    return bind.execute(sa.text("""
+        SELECT format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = CAST(:table_name AS regclass)
+          AND attname = 'embedding'
+          AND NOT attisdropped
+    """), {'table_name': table_name}).scalar()
+
+
+def _dimensions(column_type: str):
+    """从 vector(1536) / halfvec(1024) 中取出维度"""
+    if '(' not in column_type:
+        return None
+    return int(column_type[column_type.index('(') + 1:column_type.index(')')])
+
+
+def upgrade():
+    bind = op.get_bind()
+    existing_tables = set(sa.inspect(bind).get_table_names())
+    
+    # 1. 删除 002 中按 vector(1536) 创建的旧索引
+    op.execute('DROP INDEX IF EXISTS idx_block_versions_embedding')
+    
+    for table_name, index_name in VECTOR_TABLES:
+        if table_name not in existing_tables:
+            # user_memory_items 由应用启动时 create_all 创建，按模型直接生成 halfvec 列和索引
+            continue
+        
+        current_type = _embedding_column_type(bind, table_name)
+        if current_type is None:
+            op.execute(f'ALTER TABLE {table_name} ADD COLUMN embedding {COLUMN_TYPE}')
+        elif _dimensions(current_type) != EMBEDDING_DIMENSIONS:
+            # 2a. 维度不同的向量无法转换：清空后转换类型，需重新生成 embedding
+            cleared = bind.execute(sa.text(
+                f'SELECT count(*) FROM {table_name} WHERE embedding IS NOT NULL'
+            )).scalar()
+            op.execute(f"""
+                ALTER TABLE {table_name}
+                ALTER COLUMN embedding TYPE {COLUMN_TYPE}
+                USING NULL::{COLUMN_TYPE}
+            """)
+            if cleared:
+                print(
+                    f'⚠️ {table_name}.embedding 从 {current_type} 转换为 {COLUMN_TYPE}，'
+                    f'已清空 {cleared} 条维度不符的向量；'
+                    '请运行 python scripts/regenerate_embeddings.py 重新生成文档块 embedding'
+                    '（记忆条目的 embedding 在下次写入时重新生成，清空期间按文本相关度召回）'
+                )
+        else:
+            # 2b. 维度一致：直接转换为 halfvec（每维 2 字节，向量内存减半）
+            op.execute(f"""
+                ALTER TABLE {table_name}
+                ALTER COLUMN embedding TYPE {COLUMN_TYPE}
+                USING embedding::{COLUMN_TYPE}
+            """)
+        
+        # 3. 创建维度正确的 HNSW 索引
+        op.execute(f'DROP INDEX IF EXISTS {index_name}')
+        op.execute(f"""
+            CREATE INDEX {index_name}
+            ON {table_name}
+            USING hnsw (embedding halfvec_cosine_ops)
+            WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})
+        """)
+
+
+def downgrade():
+    bind = op.get_bind()
+    existing_tables = set(sa.inspect(bind).get_table_names())
+    
+    for table_name, index_name in VECTOR_TABLES:
+        op.execute(f'DROP INDEX IF EXISTS {index_name}')
+        if table_name not in existing_tables:
+            continue
+        # 还原为全精度 vector，维度保持 1024（002 的 1536 维与实际 embedding 不符，不再恢复）
+        op.execute(f"""
+            ALTER TABLE {table_name}
+            ALTER COLUMN embedding TYPE vector({EMBEDDING_DIMENSIONS})
+            USING embedding::vector({EMBEDDING_DIMENSIONS})
+        """)
+    
+    op.execute("""
+        CREATE INDEX idx_block_versions_embedding 
+        ON block_versions 
+        USING hnsw (embedding vector_cosine_ops)
+    """)
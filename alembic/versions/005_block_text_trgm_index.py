@@ -0,0 +1,30 @@
+"""trigram index on block_versions.plain_text for bulk discovery
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm 让 LIKE '%term%' 和 ~ 正则匹配可以走 GIN 索引
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_block_versions_plain_text_trgm
+        ON block_versions USING gin (plain_text gin_trgm_ops)
+    """)
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS idx_block_versions_plain_text_trgm')
+    # 不删除扩展，可能被其他对象使用
+    # op.execute('DROP EXTENSION IF EXISTS pg_trgm')
@@ -1,7 +1,8 @@
 """
 智能体基类
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import threading
 from langchain.tools import BaseTool
 from langchain_openai import ChatOpenAI
 from app.config import get_settings
@@ -19,12 +20,26 @@ def create_llm():
     )
 
 
+_shared_llm: Optional[ChatOpenAI] = None
+_shared_llm_lock = threading.Lock()
+
+
+def get_shared_llm() -> ChatOpenAI:
+    """获取进程内共享的 LLM 实例（连接池与客户端只创建一次）"""
+    global _shared_llm
+    if _shared_llm is None:
+        with _shared_llm_lock:
+            if _shared_llm is None:
+                _shared_llm = create_llm()
+    return _shared_llm
+
+
 class BaseAgent:
     """智能体基类"""
     
     def __init__(self, tools: List[BaseTool]):
         self.tools = tools
-        self.llm = create_llm()
+        self.llm = get_shared_llm()
     
     def get_system_prompt(self) -> str:
         """获取系统提示 - 子类必须实现"""
@@ -1,10 +1,11 @@
 """
 Workflow-agent wrappers for the document editing pipeline.
 """
-from typing import Any, Dict
+import threading
+from typing import Any, Dict, Optional
 
 from app.agents.runtime import WorkflowAgent, WorkflowSkill
-from app.skills.document_edit import DocumentEditSkillBundle
+from app.skills.document_edit import DocumentEditSkillBundle, get_shared_skill_bundle
 
 
 def _intent_strategy(state: Dict[str, Any], skills: Dict[str, WorkflowSkill]) -> Dict[str, Any]:
@@ -113,3 +114,17 @@ def create_edit_workflow_agents(skill_bundle: DocumentEditSkillBundle) -> Dict[s
             description="Persistence and revision apply agent",
         ),
     }
+
+
+_shared_agents: Optional[Dict[str, WorkflowAgent]] = None
+_shared_agents_lock = threading.Lock()
+
+
+def get_shared_edit_workflow_agents() -> Dict[str, WorkflowAgent]:
+    """Process-wide workflow agents built on the shared skill bundle."""
+    global _shared_agents
+    if _shared_agents is None:
+        with _shared_agents_lock:
+            if _shared_agents is None:
+                _shared_agents = create_edit_workflow_agents(get_shared_skill_bundle())
+    return _shared_agents
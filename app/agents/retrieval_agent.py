@@ -10,6 +10,8 @@ from app.tools.db_tools import GetBlocksTool, GetBlockContextTool
 from app.tools.llm_tools import VerifyTargetTool
 from app.tools.index_tools import GetIndexInfoTool
 from app.utils.intent_helper import get_intent_attr
+from app.services.reranker import get_reranker, record_llm_agreement, record_rerank_decision
+from app.config import get_settings
 
 
 def create_retrieval_agent(db: Session):
@@ -55,10 +57,11 @@ class RetrievalAgent:
             state["next_action"] = "end"
             return state
         
-        # 2. LLM 验证候选结果
+        # 2. 验证候选结果（本地重排足够确定时跳过 LLM）
         verified_candidates = self._verify_candidates(
             candidates=candidates,
-            intent=intent
+            intent=intent,
+            user_message=user_message
         )
         
         if not verified_candidates:
@@ -118,9 +121,26 @@ class RetrievalAgent:
     def _verify_candidates(
         self,
         candidates: List[Dict[str, Any]],
-        intent: Any
+        intent: Any,
+        user_message: str = ""
     ) -> List[Dict[str, Any]]:
         """验证候选结果"""
+        # 本地重排：第一名分差足够大时直接采用，不再逐个调用 LLM
+        rerank = get_reranker().rerank(intent, candidates, user_message=user_message)
+        local_top_id = rerank.top.get("block_id") if rerank.top else None
+        # 多目标操作需要 LLM 逐个确认全部匹配的块，本地重排只能选出一个，不走快速路径
+        multi_target = (get_intent_attr(intent, "operation", "replace") if intent else "replace") == "multi_replace"
+        if get_settings().ENABLE_LOCAL_RERANKER and rerank.is_confident and not multi_target:
+            record_rerank_decision("retrieval_agent", skipped_llm=True)
+            top = rerank.top
+            top["verification"] = {
+                "is_match": True,
+                "confidence": rerank.confidence,
+                "reason": f"本地重排分差 {rerank.margin:.2f} 达到阈值"
+            }
+            return [top]
+        record_rerank_decision("retrieval_agent", skipped_llm=False)
+        
         verified = []
         
         for candidate in candidates:
@@ -138,6 +158,9 @@ class RetrievalAgent:
                 candidate["verification"] = result
                 verified.append(candidate)
         
+        if verified:
+            record_llm_agreement("retrieval_agent", local_top_id, verified[0].get("block_id"))
+        
         return verified
     
     def _collect_location_info(
@@ -9,6 +9,10 @@ from typing import Any, Callable, Dict, Mapping
 WorkflowState = Dict[str, Any]
 SkillHandler = Callable[[WorkflowState], WorkflowState]
 AgentStrategy = Callable[[WorkflowState, Mapping[str, "WorkflowSkill"]], WorkflowState]
+EventListener = Callable[[str, Any], None]
+
+# State key holding the optional progress listener (kept out of the serializable trace).
+EVENT_LISTENER_KEY = "_event_listener"
 
 
 def _utc_now() -> str:
@@ -47,6 +51,26 @@ def record_trace_event(
     if detail:
         event["detail"] = detail
     trace["events"].append(event)
+    emit_workflow_event(state, "stage", event)
+
+
+def set_event_listener(state: WorkflowState, listener: EventListener | None) -> None:
+    """Attach a progress listener that receives (event, data) as the workflow runs."""
+    if listener is None:
+        state.pop(EVENT_LISTENER_KEY, None)
+    else:
+        state[EVENT_LISTENER_KEY] = listener
+
+
+def emit_workflow_event(state: WorkflowState, event: str, data: Any) -> None:
+    """Forward a progress event to the attached listener; listener errors are ignored."""
+    listener = state.get(EVENT_LISTENER_KEY)
+    if listener is None:
+        return
+    try:
+        listener(event, data)
+    except Exception:
+        pass
 
 
 def get_trace_metadata(state: WorkflowState) -> Dict[str, Any]:
@@ -7,6 +7,7 @@ import logging
 import json
 
 from app.db.connection import get_db
+from app.db.redis_pool import get_async_redis_client
 from app.services.collaboration import CollaborationManager
 from app.services.cache import get_cache_manager
 from app.auth.dependencies import get_current_user_ws
@@ -24,13 +25,11 @@ def get_collaboration_manager() -> CollaborationManager:
     """获取协同管理器实例"""
     global collaboration_manager
     if collaboration_manager is None:
-        # 从缓存管理器获取 Redis 客户端
+        # 从缓存管理器确认 Redis 可用
         cache_manager = get_cache_manager()
         if cache_manager.redis_available:
-            # 创建异步 Redis 客户端
-            import redis.asyncio as redis
-            redis_client = redis.from_url(cache_manager.redis_url)
-            collaboration_manager = CollaborationManager(redis_client)
+            # 使用进程共享的异步连接池
+            collaboration_manager = CollaborationManager(get_async_redis_client())
         else:
             raise RuntimeError("Redis not available for collaboration")
     return collaboration_manager
@@ -10,6 +10,7 @@ import uuid
 from app.db.connection import get_db
 from app.auth.models import User, APIKey
 from app.auth.security import decode_token, hash_api_key
+from app.utils.concurrency import run_blocking
 from datetime import datetime
 
 # JWT Bearer 认证
@@ -27,7 +28,11 @@ async def get_current_user_from_token(
     if not credentials:
         return None
     
-    token = credentials.credentials
+    return await run_blocking(_load_user_from_token, credentials.credentials, db)
+
+
+def _load_user_from_token(token: str, db: Session) -> Optional[User]:
+    """解析 JWT Token 并查询用户（同步实现，在线程池中执行）"""
     payload = decode_token(token)
     
     if not payload:
@@ -62,6 +67,11 @@ async def get_current_user_from_api_key(
     if not api_key:
         return None
     
+    return await run_blocking(_load_user_from_api_key, api_key, db)
+
+
+def _load_user_from_api_key(api_key: str, db: Session) -> Optional[User]:
+    """校验 API Key 并查询用户（同步实现，在线程池中执行）"""
     # 哈希 API Key
     key_hash = hash_api_key(api_key)
     
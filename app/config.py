@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict
 
 
 class Settings(BaseSettings):
@@ -16,7 +17,21 @@ class Settings(BaseSettings):
     
     # Redis 配置
     REDIS_URL: str
+    # 每个 worker 的同步 / 异步连接池各自的上限；连接用尽时最多等待 REDIS_POOL_TIMEOUT_SECONDS
     REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT_SECONDS: float = 5.0
+    # 进程内 L1 缓存（LRU，按条目数与字节数限制，TTL 不超过上限）
+    LOCAL_CACHE_MAX_ENTRIES: int = 1000
+    LOCAL_CACHE_MAX_MB: int = 64
+    LOCAL_CACHE_MAX_TTL_SECONDS: int = 300
+    # 通过 Redis pub/sub 广播失效消息，所有 worker 同步丢弃本地缓存中的过期 key
+    ENABLE_CACHE_INVALIDATION_PUBSUB: bool = True
+    # 缓存值编码（msgpack / json，未安装 msgpack 时回退 json）；编码后超过阈值用 zstd 压缩（0 表示不压缩）
+    CACHE_SERIALIZER: str = "msgpack"
+    CACHE_COMPRESSION_MIN_BYTES: int = 4096
+    CACHE_COMPRESSION_LEVEL: int = 3
+    # API 响应使用 orjson 编码（需安装 orjson）
+    ENABLE_ORJSON_RESPONSE: bool = True
     
     # Meilisearch 配置
     MEILI_HOST: str
@@ -39,6 +54,89 @@ class Settings(BaseSettings):
     ENABLE_MEMORY_MAINTENANCE_SCHEDULER: bool = True
     MEMORY_MAINTENANCE_INTERVAL_MINUTES: int = 60
     
+    # 向量存储配置（pgvector）
+    EMBEDDING_DIMENSIONS: int = 1024
+    VECTOR_STORAGE_TYPE: str = "halfvec"  # halfvec（半精度，省一半内存） | vector
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 64
+    HNSW_EF_SEARCH: int = 40
+    
+    # 混合检索配置（BM25 与向量两路并发召回，单路超时则降级为单路 RRF）
+    HYBRID_BM25_TIMEOUT_SECONDS: float = 2.0
+    HYBRID_VECTOR_TIMEOUT_SECONDS: float = 3.0
+    RETRIEVAL_MAX_WORKERS: int = 8
+    ENABLE_RETRIEVAL_CACHE: bool = True
+    RETRIEVAL_CACHE_TTL_SECONDS: int = 600
+    # 推测检索：意图解析的同时用原始消息提前召回（需要澄清时会多一次 embedding 调用）
+    ENABLE_SPECULATIVE_RETRIEVAL: bool = False
+    
+    # 工作流检查点：澄清 / 消歧时保存意图、记忆上下文和候选，后续选择轮从中断处继续
+    ENABLE_WORKFLOW_CHECKPOINTS: bool = True
+    WORKFLOW_CHECKPOINT_TTL_SECONDS: int = 900
+    
+    # 确认接口响应：full 返回全文 export_md；changes 只返回变更块，全文经导出接口按需获取
+    CONFIRM_RESPONSE_MODE: str = "full"
+    # 导出缓存（revision 不可变，按 rev_id 缓存导出的 Markdown）
+    EXPORT_CACHE_TTL_SECONDS: int = 3600
+    
+    # 进程内向量矩阵缓存（小文档精确检索，不走 pgvector）
+    ENABLE_VECTOR_MATRIX_CACHE: bool = True
+    VECTOR_MATRIX_CACHE_MAX_BLOCKS: int = 5000
+    VECTOR_MATRIX_CACHE_MAX_MB: int = 256
+    # 矩阵最长缓存时间（其他 worker 的失效广播丢失时的兜底）
+    VECTOR_MATRIX_CACHE_TTL_SECONDS: int = 600
+    
+    # 进程内 BM25 索引（Meilisearch 不可用时的降级检索）
+    BM25_INDEX_CACHE_MAX_MB: int = 128
+    
+    # 规划快速路径（"把X改成Y" 等字面替换且 X 出现在目标块中时不调用 LLM）
+    ENABLE_PLANNER_FAST_PATH: bool = True
+    
+    # 本地重排（分差足够大时跳过 LLM 定位）
+    ENABLE_LOCAL_RERANKER: bool = True
+    RERANK_MARGIN_THRESHOLD: float = 0.15
+    
+    # 模型调用限流（Redis 令牌桶 + 并发闸门，跨 worker 共享；后台任务为交互式调用保留容量）
+    ENABLE_LLM_RATE_LIMIT: bool = True
+    LLM_RATE_LIMIT_DEFAULT_RPM: float = 600
+    LLM_RATE_LIMIT_DEFAULT_BURST: float = 20
+    LLM_RATE_LIMIT_DEFAULT_CONCURRENCY: int = 16
+    # 按模型覆盖 rpm / burst / concurrency
+    LLM_RATE_LIMITS: Dict[str, Dict[str, float]] = {}
+    LLM_RATE_LIMIT_MAX_WAIT_SECONDS: float = 30.0
+    LLM_RATE_LIMIT_BACKGROUND_MAX_WAIT_SECONDS: float = 300.0
+    LLM_RATE_LIMIT_BACKGROUND_RESERVE_RATIO: float = 0.5
+    LLM_RATE_LIMIT_BACKGROUND_CONCURRENCY_RATIO: float = 0.5
+    LLM_RATE_LIMIT_LEASE_SECONDS: float = 120.0
+    
+    # 预览语义冲突检测（多个操作并发检测，共享总截止时间，超时视为无冲突）
+    PREVIEW_CONFLICT_MAX_WORKERS: int = 8
+    PREVIEW_CONFLICT_TIMEOUT_SECONDS: float = 8.0
+    
+    # 批量修改（按游标分页发现/预览，应用时一次提交为单个 revision）
+    BULK_PAGE_SIZE: int = 200
+    BULK_MAX_CHANGES: int = 50000
+    BULK_IN_DATABASE_APPLY: bool = True  # 精确词 / 正则替换在数据库内执行（INSERT ... SELECT）
+    
+    # 多文档批量任务（按文档并发发现 / 应用）
+    BULK_JOB_MAX_WORKERS: int = 4
+    BULK_JOB_MAX_DOCUMENTS: int = 500
+    BULK_JOB_TTL_SECONDS: int = 86400
+    BULK_JOB_HEARTBEAT_SECONDS: int = 15  # 执行任务的进程定期写入心跳
+    BULK_JOB_STALE_SECONDS: int = 120  # 心跳超过该时长未更新的执行中任务视为已中断
+    
+    # LLM 响应缓存（仅低温度调用；key 为 model / messages / temperature / response_format 摘要）
+    ENABLE_LLM_CACHE: bool = True
+    LLM_CACHE_MAX_TEMPERATURE: float = 0.3
+    LLM_CACHE_TTL_SECONDS: int = 3600
+    # 按 span_name 覆盖 TTL（秒），0 表示该调用不缓存
+    LLM_CACHE_SPAN_TTLS: Dict[str, int] = {
+        "intent_parser": 3600,
+        "intent_ambiguity": 3600,
+        "semantic_conflict": 1800,
+        "verify_target": 1800,
+    }
+    
     # 安全配置
     SECRET_KEY: str = "change-this-in-production"
     JWT_ALGORITHM: str = "HS256"
@@ -46,6 +144,7 @@ class Settings(BaseSettings):
     
     # 性能配置
     MAX_WORKERS: int = 4
+    BLOCKING_POOL_MAX_WORKERS: int = 24  # async 接口中同步 DB / LLM 调用的线程池，不超过 DB 连接池容量
     MAX_BLOCK_SIZE: int = 1000
     TARGET_BLOCK_SIZE: int = 300
     MIN_BLOCK_SIZE: int = 50
@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
 from app.config import get_settings
 
 settings = get_settings()
@@ -37,3 +39,33 @@ def get_db_context():
         raise
     finally:
         db.close()
+
+
+_current_session: ContextVar[Optional[Session]] = ContextVar("current_db_session", default=None)
+
+
+@contextmanager
+def bind_session(db: Session) -> Iterator[Session]:
+    """Bind a session to the current context for process-wide workflow components"""
+    token = _current_session.set(db)
+    try:
+        yield db
+    finally:
+        _current_session.reset(token)
+
+
+class SessionProxy:
+    """Forwards attribute access to the session bound by bind_session()"""
+
+    def _get_session(self) -> Session:
+        db = _current_session.get()
+        if db is None:
+            raise RuntimeError("No database session bound to the current context")
+        return db
+
+    def __getattr__(self, name):
+        return getattr(self._get_session(), name)
+
+
+# Shared by components that are built once per process and used across requests
+request_session = SessionProxy()
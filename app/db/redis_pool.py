@@ -0,0 +1,130 @@
+"""
+Shared Redis connection pools.
+
+One blocking sync pool and one async pool per worker process, both sized by
+REDIS_MAX_CONNECTIONS. CacheManager, the rate limiter, collaboration and
+health checks all draw from these instead of opening their own clients.
+When a pool is exhausted, callers wait up to REDIS_POOL_TIMEOUT_SECONDS for
+a connection rather than opening a new one.
+
+The sync pool returns raw bytes because cache values are binary (msgpack and
+zstd, see app/services/serialization.py). The async pool returns decoded str.
+"""
+from typing import Optional
+import threading
+import time
+
+import redis
+import redis.asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.config import get_settings
+from app.monitoring.metrics import (
+    redis_pool_connections,
+    redis_pool_exhausted,
+    redis_pool_max_connections,
+    redis_pool_wait_seconds,
+)
+
+
+class InstrumentedBlockingConnectionPool(redis.BlockingConnectionPool):
+    """Blocking pool that records checkout wait time and exhaustion"""
+
+    def get_connection(self, command_name, *keys, **options):
+        started = time.perf_counter()
+        try:
+            return super().get_connection(command_name, *keys, **options)
+        except RedisConnectionError as exc:
+            if "No connection available" in str(exc):
+                redis_pool_exhausted.labels(pool="sync").inc()
+            raise
+        finally:
+            redis_pool_wait_seconds.labels(pool="sync").observe(time.perf_counter() - started)
+
+    def idle_count(self) -> int:
+        # The queue is pre-filled with None placeholders for connections not yet created
+        return sum(1 for connection in list(self.pool.queue) if connection is not None)
+
+    def in_use_count(self) -> int:
+        return max(len(self._connections) - self.idle_count(), 0)
+
+
+class InstrumentedAsyncBlockingConnectionPool(aioredis.BlockingConnectionPool):
+    """Async blocking pool that records checkout wait time and exhaustion"""
+
+    async def get_connection(self, command_name, *keys, **options):
+        started = time.perf_counter()
+        try:
+            return await super().get_connection(command_name, *keys, **options)
+        except RedisConnectionError as exc:
+            if "No connection available" in str(exc):
+                redis_pool_exhausted.labels(pool="async").inc()
+            raise
+        finally:
+            redis_pool_wait_seconds.labels(pool="async").observe(time.perf_counter() - started)
+
+    def idle_count(self) -> int:
+        return len(self._available_connections)
+
+    def in_use_count(self) -> int:
+        return len(self._in_use_connections)
+
+
+_sync_pool: Optional[InstrumentedBlockingConnectionPool] = None
+_async_pool: Optional[InstrumentedAsyncBlockingConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def _register_pool_metrics(name: str, pool) -> None:
+    """Pool gauges are computed at scrape time"""
+    redis_pool_max_connections.labels(pool=name).set(pool.max_connections)
+    redis_pool_connections.labels(pool=name, state="in_use").set_function(pool.in_use_count)
+    redis_pool_connections.labels(pool=name, state="idle").set_function(pool.idle_count)
+
+
+def get_redis_pool() -> InstrumentedBlockingConnectionPool:
+    """Process-wide sync connection pool (raw bytes responses)"""
+    global _sync_pool
+    if _sync_pool is None:
+        with _pool_lock:
+            if _sync_pool is None:
+                settings = get_settings()
+                pool = InstrumentedBlockingConnectionPool.from_url(
+                    settings.REDIS_URL,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+                    decode_responses=False,
+                    health_check_interval=30,
+                )
+                _register_pool_metrics("sync", pool)
+                _sync_pool = pool
+    return _sync_pool
+
+
+def get_async_redis_pool() -> InstrumentedAsyncBlockingConnectionPool:
+    """Process-wide async connection pool (responses decoded to str)"""
+    global _async_pool
+    if _async_pool is None:
+        with _pool_lock:
+            if _async_pool is None:
+                settings = get_settings()
+                pool = InstrumentedAsyncBlockingConnectionPool.from_url(
+                    settings.REDIS_URL,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+                    decode_responses=True,
+                    health_check_interval=30,
+                )
+                _register_pool_metrics("async", pool)
+                _async_pool = pool
+    return _async_pool
+
+
+def get_redis_client() -> redis.Redis:
+    """Sync client backed by the shared pool (clients are cheap; the pool holds the connections)"""
+    return redis.Redis(connection_pool=get_redis_pool())
+
+
+def get_async_redis_client() -> aioredis.Redis:
+    """Async client backed by the shared pool"""
+    return aioredis.Redis(connection_pool=get_async_redis_pool())
@@ -124,8 +124,28 @@ MEMORY_SCHEMA_DDL = [
 ]
 
 
+DISCOVERY_SCHEMA_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE INDEX IF NOT EXISTS idx_block_versions_plain_text_trgm
+    ON block_versions USING gin (plain_text gin_trgm_ops)
+    """,
+]
+
+
 def ensure_memory_schema(engine) -> None:
     """Apply additive schema sync for memory-related tables."""
     with engine.begin() as connection:
         for statement in MEMORY_SCHEMA_DDL:
             connection.execute(text(statement))
+
+
+def ensure_discovery_schema(engine) -> None:
+    """Apply the trigram index used by database-side bulk discovery."""
+    try:
+        with engine.begin() as connection:
+            for statement in DISCOVERY_SCHEMA_DDL:
+                connection.execute(text(statement))
+    except Exception as exc:
+        # Discovery still works without the index, just with sequential scans.
+        print(f"Discovery schema sync skipped: {exc}")
@@ -0,0 +1,63 @@
+"""
+pgvector 存储与 HNSW 索引配置
+"""
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from pgvector.sqlalchemy import HALFVEC, Vector
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# halfvec 每维 2 字节，vector 每维 4 字节
+_STORAGE_TYPES = {
+    "halfvec": (HALFVEC, "halfvec_cosine_ops"),
+    "vector": (Vector, "vector_cosine_ops"),
+}
+
+
+def _storage_type() -> str:
+    storage_type = (settings.VECTOR_STORAGE_TYPE or "halfvec").lower()
+    if storage_type not in _STORAGE_TYPES:
+        raise ValueError(f"不支持的 VECTOR_STORAGE_TYPE: {settings.VECTOR_STORAGE_TYPE}")
+    return storage_type
+
+
+def embedding_column_type():
+    """embedding 列的 SQLAlchemy 类型"""
+    column_type, _ = _STORAGE_TYPES[_storage_type()]
+    return column_type(settings.EMBEDDING_DIMENSIONS)
+
+
+def vector_sql_type() -> str:
+    """embedding 列的 SQL 类型，查询向量需显式 cast 成该类型才能命中 HNSW 索引"""
+    return f"{_storage_type()}({settings.EMBEDDING_DIMENSIONS})"
+
+
+def vector_cosine_ops() -> str:
+    """HNSW 索引使用的余弦距离操作符类"""
+    _, ops = _STORAGE_TYPES[_storage_type()]
+    return ops
+
+
+def hnsw_index_kwargs(column_name: str = "embedding") -> dict:
+    """构建 HNSW 索引参数（供模型 __table_args__ 使用）"""
+    return {
+        "postgresql_using": "hnsw",
+        "postgresql_with": {
+            "m": settings.HNSW_M,
+            "ef_construction": settings.HNSW_EF_CONSTRUCTION,
+        },
+        "postgresql_ops": {column_name: vector_cosine_ops()},
+    }
+
+
+def to_vector_literal(embedding) -> str:
+    """将向量转换为 pgvector 文本格式"""
+    return '[' + ','.join(map(str, embedding)) + ']'
+
+
+def apply_hnsw_search_params(db: Session, ef_search: int = None) -> None:
+    """设置当前事务内的 hnsw.ef_search（越大召回越高、延迟越高）"""
+    value = int(ef_search or settings.HNSW_EF_SEARCH)
+    db.execute(text(f"SET LOCAL hnsw.ef_search = {value}"))
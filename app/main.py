@@ -1,16 +1,18 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Security, Form, File, UploadFile
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from prometheus_client import make_asgi_app
 import uuid
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
+import asyncio
 import logging
 import json
 
 from app.config import get_settings
-from app.db.connection import get_db, engine
-from app.db.schema_sync import ensure_memory_schema
+from app.db.connection import SessionLocal, get_db, engine
+from app.db.schema_sync import ensure_discovery_schema, ensure_memory_schema
 from app.models.database import Base
 from app.auth.models import User as AuthUser, APIKey
 from app.models.schemas import (
@@ -33,6 +35,8 @@ from app.services.chat_sessions import (
 )
 from app.services.memory import MemoryService
 from app.services.memory_scheduler import MemoryMaintenanceScheduler
+from app.services.serialization import default_response_class, dumps_json
+from app.utils.concurrency import run_blocking
 
 # 配置日志
 logging.basicConfig(
@@ -46,11 +50,14 @@ settings = get_settings()
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
 ensure_memory_schema(engine)
+ensure_discovery_schema(engine)
 
 app = FastAPI(
     title=settings.APP_NAME,
     version="1.0.0",
-    description="AI-powered document editing system with authentication and monitoring"
+    description="AI-powered document editing system with authentication and monitoring",
+    # 安装了 orjson 时响应使用 ORJSONResponse 编码
+    default_response_class=default_response_class()
 )
 
 # CORS 配置
@@ -211,6 +218,26 @@ async def upload_document(
     else:
         raise HTTPException(400, "Either file or content must be provided")
     
+    return await run_blocking(
+        _create_document,
+        title,
+        markdown,
+        source_filename,
+        source_format,
+        user_id,
+        db
+    )
+
+
+def _create_document(
+    title: str,
+    markdown: str,
+    source_filename: str,
+    source_format: str,
+    user_id: uuid.UUID,
+    db: Session
+) -> UploadDocumentResponse:
+    """分块、入库并建立索引（同步实现，在线程池中执行）"""
     # 分块
     splitter = BlockSplitter()
     blocks = splitter.split_document(markdown)
@@ -298,6 +325,18 @@ async def export_document(
     db: Session = Depends(get_db)
 ):
     """导出文档"""
+    return await run_blocking(_export_document, doc_id, rev_id, db)
+
+
+def _export_document(
+    doc_id: str,
+    rev_id: Optional[str],
+    db: Session
+):
+    """导出文档（同步实现，在线程池中执行）"""
+    from app.services.cache import get_cache_manager
+    from app.services.workflow import export_revision
+    
     doc_uuid = uuid.UUID(doc_id)
     
     # 获取 revision
@@ -311,18 +350,11 @@ async def export_document(
     else:
         rev_uuid = uuid.UUID(rev_id)
     
-    # 获取所有 blocks
-    blocks = db.query(db_models.BlockVersion).filter(
-        db_models.BlockVersion.rev_id == rev_uuid
-    ).order_by(db_models.BlockVersion.order_index).all()
-    
-    if not blocks:
+    # 拼接 Markdown（按 rev_id 缓存）
+    markdown = export_revision(db, str(rev_uuid), get_cache_manager())
+    if markdown is None:
         raise HTTPException(404, "No blocks found")
     
-    # 拼接 Markdown
-    markdown_parts = [block.content_md for block in blocks]
-    markdown = '\n\n'.join(markdown_parts)
-    
     return {
         "doc_id": doc_id,
         "rev_id": str(rev_uuid),
@@ -337,6 +369,16 @@ async def chat_edit(
     db: Session = Depends(get_db)
 ):
     """对话式编辑"""
+    return await run_blocking(_chat_edit, request, current_user, db)
+
+
+def _chat_edit(
+    request: ChatEditRequest,
+    current_user: AuthUser,
+    db: Session,
+    event_callback: Optional[Callable[[str, Any], None]] = None
+):
+    """对话式编辑（同步实现，在线程池中执行）"""
     from app.services.workflow import EditWorkflow
 
     _get_owned_document_or_404(db, request.doc_id, current_user.user_id)
@@ -360,7 +402,8 @@ async def chat_edit(
         session_id=session_id,
         user_id=user_id,
         user_message=request.message,
-        user_selection=request.user_selection
+        user_selection=request.user_selection,
+        event_callback=event_callback
     )
 
     _ensure_session_or_409(
@@ -413,6 +456,83 @@ async def chat_edit(
     return result
 
 
+# 流式编辑的后台工作流任务
+_stream_tasks: set = set()
+
+
+def _format_sse(event: str, data: Any) -> str:
+    """格式化一条 SSE 消息"""
+    return f"event: {event}\ndata: {dumps_json(data).decode('utf-8')}\n\n"
+
+
+@app.post("/v1/chat/edit/stream")
+async def chat_edit_stream(
+    request: ChatEditRequest,
+    current_user: AuthUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    对话式编辑（SSE 流式）
+
+    事件依次为：
+    - stage: 工作流阶段事件（agent / skill 的 started / completed / failed）
+    - candidates: 检索完成后的候选块
+    - token: 编辑计划生成时的模型输出片段
+    - result: 最终结果（与 /v1/chat/edit 响应相同）
+    - error: 处理失败
+    """
+    await run_blocking(_get_owned_document_or_404, db, request.doc_id, current_user.user_id)
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: Optional[str], data: Any = None):
+        # 工作流在线程池中执行，事件经事件循环线程安全地入队
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    async def run_workflow():
+        try:
+            result = await run_blocking(_chat_edit_in_session, request, current_user, emit)
+            emit("result", result.model_dump(mode="json"))
+        except HTTPException as exc:
+            emit("error", {"status_code": exc.status_code, "detail": exc.detail})
+        except Exception as exc:
+            logger.exception("chat_edit_stream failed")
+            emit("error", {"status_code": 500, "detail": str(exc)})
+        finally:
+            emit(None)
+
+    async def event_stream():
+        # 客户端断开后工作流仍会执行完并落库，与非流式接口一致（持有任务引用，避免被回收）
+        task = asyncio.create_task(run_workflow())
+        _stream_tasks.add(task)
+        task.add_done_callback(_stream_tasks.discard)
+        while True:
+            event, data = await queue.get()
+            if event is None:
+                break
+            yield _format_sse(event, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _chat_edit_in_session(
+    request: ChatEditRequest,
+    current_user: AuthUser,
+    event_callback: Callable[[str, Any], None]
+):
+    """流式编辑使用独立会话：响应开始发送后，请求级会话可能已被依赖清理关闭"""
+    db = SessionLocal()
+    try:
+        return _chat_edit(request, current_user, db, event_callback=event_callback)
+    finally:
+        db.close()
+
+
 @app.post("/v1/chat/confirm", response_model=ConfirmResponse)
 async def confirm_edit(
     request: ConfirmRequest,
@@ -420,6 +540,15 @@ async def confirm_edit(
     db: Session = Depends(get_db)
 ):
     """确认编辑"""
+    return await run_blocking(_confirm_edit, request, current_user, db)
+
+
+def _confirm_edit(
+    request: ConfirmRequest,
+    current_user: AuthUser,
+    db: Session
+):
+    """确认编辑（同步实现，在线程池中执行）"""
     import hashlib
     from app.models.schemas import EditPlan
     from app.nodes.apply import ApplyEditsNode
@@ -641,17 +770,27 @@ async def confirm_edit(
     
     if result.get("apply_result"):
         edits_applied.labels(operation_type=operation_type).inc()
-        # 导出文档
-        from app.services.workflow import EditWorkflow
-        workflow = EditWorkflow(db, cache)
-        export_md = workflow._export_document(result["apply_result"].new_rev_id)
-        response = ConfirmResponse(
-            status="applied",
-            session_id=session_id,
-            new_rev_id=result["apply_result"].new_rev_id,
-            export_md=export_md,
-            message="修改已应用"
-        )
+        new_rev_id = result["new_rev_id"]
+        response_mode = request.response_mode or settings.CONFIRM_RESPONSE_MODE
+        if response_mode == "changes":
+            # 只返回变更块，全文通过导出接口按需获取
+            response = ConfirmResponse(
+                status="applied",
+                session_id=session_id,
+                new_rev_id=new_rev_id,
+                changed_blocks=result.get("changed_blocks", []),
+                export_url=f"/v1/docs/{request.doc_id}/export?rev_id={new_rev_id}",
+                message="修改已应用"
+            )
+        else:
+            from app.services.workflow import export_revision
+            response = ConfirmResponse(
+                status="applied",
+                session_id=session_id,
+                new_rev_id=new_rev_id,
+                export_md=export_revision(db, new_rev_id, cache) or "",
+                message="修改已应用"
+            )
         _ensure_session_or_409(
             db,
             session_id=session_id,
@@ -772,6 +911,16 @@ async def list_revisions(
     db: Session = Depends(get_db)
 ):
     """列出文档版本"""
+    return await run_blocking(_list_revisions, doc_id, limit, offset, db)
+
+
+def _list_revisions(
+    doc_id: str,
+    limit: int,
+    offset: int,
+    db: Session
+):
+    """列出文档版本（同步实现，在线程池中执行）"""
     from app.models.schemas import RevisionResponse, ListRevisionsResponse
     
     doc_uuid = uuid.UUID(doc_id)
@@ -816,6 +965,15 @@ async def rollback_revision(
     db: Session = Depends(get_db)
 ):
     """回滚到指定版本"""
+    return await run_blocking(_rollback_revision, doc_id, request, db)
+
+
+def _rollback_revision(
+    doc_id: str,
+    request: dict,
+    db: Session
+):
+    """回滚到指定版本（同步实现，在线程池中执行）"""
     from app.models.schemas import RollbackResponse
     
     doc_uuid = uuid.UUID(doc_id)
@@ -907,9 +1065,16 @@ async def bulk_edit(
         }
     }
     """
-    from app.nodes.bulk_discover import BulkDiscoverNode
-    from app.nodes.bulk_preview import BulkPreviewNode
-    from app.models.schemas import Intent, ScopeHint
+    return await run_blocking(_bulk_edit, request, current_user, db)
+
+
+def _bulk_edit(
+    request: dict,
+    current_user: AuthUser,
+    db: Session
+):
+    """批量修改接口（同步实现，在线程池中执行）"""
+    from app.services.bulk_edit import BulkEditPipeline, build_bulk_intent, build_confirm_payload
     
     # 解析请求
     session_id = request.get("session_id")
@@ -938,78 +1103,45 @@ async def bulk_edit(
         raise HTTPException(404, "文档不存在")
     
     # 构建 Intent
-    intent = Intent(
-        operation="multi_replace",
-        scope_hint=ScopeHint(
-            heading=scope_filter.get("heading"),
-            keywords=[scope_filter.get("term", "")],
-            block_type=scope_filter.get("block_type")
-        ),
-        constraints={},
-        risk="medium",
-        match_type=match_type,
-        apply_scope="all_matches",
-        scope_filter=scope_filter
-    )
+    intent = build_bulk_intent(match_type, scope_filter)
     
     try:
-        # 1. 批量发现
-        discover_node = BulkDiscoverNode(db)
-        candidates = discover_node.discover(
-            intent,
-            doc_id,
-            str(active_rev.rev_id),
-            max_changes=100
-        )
+        # 1. 分页发现并生成预览（只返回第一页 diff，统计与 preview_hash 覆盖全部匹配）
+        pipeline = BulkEditPipeline(db)
+        result = pipeline.preview(intent, doc_id, str(active_rev.rev_id))
+        preview = result.preview
+        preview_hash = result.preview_hash
         
-        if not candidates:
+        if not result.matched_blocks:
             return {
                 "status": "no_matches",
                 "message": "未找到匹配的内容",
                 "candidates": []
             }
         
-        # 2. 生成预览
-        preview_node = BulkPreviewNode(db)
-        preview = preview_node.generate_preview(
-            intent,
-            candidates,
-            str(active_rev.rev_id)
-        )
-        
-        if not preview.diffs:
+        if not preview.total_changes:
             return {
                 "status": "no_changes",
                 "message": "没有需要修改的内容",
                 "preview": preview.model_dump()
             }
         
-        # 3. 生成 confirm_token
+        # 2. 生成 confirm_token（只保存 intent 与版本信息，大小与匹配数量无关）
         from app.services.cache import get_cache_manager
-        import hashlib
-        import json
-        import time
         
         cache = get_cache_manager()
         token_id = str(uuid.uuid4())
         
-        # 计算 preview_hash
-        preview_json = json.dumps(preview.model_dump(), sort_keys=True)
-        preview_hash = hashlib.sha256(preview_json.encode()).hexdigest()
-        
-        payload = {
-            "token_id": token_id,
-            "session_id": session_id,
-            "user_id": str(current_user.user_id),
-            "doc_id": doc_id,
-            "active_rev_id": str(active_rev.rev_id),
-            "active_version": active_rev.version,
-            "preview_hash": preview_hash,
-            "preview": preview.model_dump(),
-            "intent": intent.model_dump(),
-            "created_at": time.time(),
-            "expires_at": time.time() + 900  # 15 分钟
-        }
+        payload = build_confirm_payload(
+            token_id,
+            session_id,
+            str(current_user.user_id),
+            doc_id,
+            str(active_rev.rev_id),
+            active_rev.version,
+            intent,
+            result
+        )
         
         cache.store_confirm_token(session_id, token_id, payload, ttl=900)
         
@@ -1020,7 +1152,8 @@ async def bulk_edit(
             "preview": preview.model_dump(),
             "confirm_token": token_id,
             "preview_hash": preview_hash,
-            "grouped_by_heading": preview.grouped_by_heading
+            "grouped_by_heading": preview.grouped_by_heading,
+            "next_cursor": result.next_cursor
         }
         
     except ValueError as e:
@@ -1029,6 +1162,84 @@ async def bulk_edit(
         raise HTTPException(500, f"批量修改失败: {str(e)}")
 
 
+@app.post("/v1/chat/bulk-preview")
+async def bulk_preview_page(
+    request: dict,
+    current_user: AuthUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    分页获取批量修改预览
+    
+    请求格式:
+    {
+        "session_id": "uuid",
+        "doc_id": "uuid",
+        "confirm_token": "uuid",
+        "cursor": 123  // 上一页返回的 next_cursor
+    }
+    """
+    return await run_blocking(_bulk_preview_page, request, current_user, db)
+
+
+def _bulk_preview_page(
+    request: dict,
+    current_user: AuthUser,
+    db: Session
+):
+    """分页获取批量修改预览（同步实现，在线程池中执行）"""
+    from app.services.bulk_edit import BulkEditPipeline
+    from app.services.cache import get_cache_manager
+    from app.models.schemas import Intent
+    
+    session_id = request.get("session_id")
+    doc_id = request.get("doc_id")
+    confirm_token = request.get("confirm_token")
+    cursor = request.get("cursor")
+    
+    if not all([session_id, doc_id, confirm_token]) or cursor is None:
+        raise HTTPException(400, "缺少必需参数")
+
+    _get_owned_document_or_404(db, doc_id, current_user.user_id)
+    session_id = normalize_session_id(
+        session_id,
+        user_id=str(current_user.user_id),
+        doc_id=doc_id,
+    )
+    
+    cache = get_cache_manager()
+    payload = cache.get_confirm_token(session_id, confirm_token)
+    
+    if not payload:
+        raise HTTPException(400, "确认令牌无效或已过期")
+
+    if payload.get("user_id") != str(current_user.user_id):
+        raise HTTPException(403, "确认令牌不属于当前用户")
+    
+    if payload.get("doc_id") != doc_id:
+        raise HTTPException(400, "确认令牌与文档不匹配")
+    
+    try:
+        # 预览基于 token 中记录的 revision（不可变），分页结果与首次预览一致
+        pipeline = BulkEditPipeline(db)
+        diffs, next_cursor = pipeline.preview_page(
+            Intent(**payload["intent"]),
+            doc_id,
+            payload["active_rev_id"],
+            int(cursor)
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        raise HTTPException(500, f"获取预览失败: {str(e)}")
+    
+    return {
+        "diffs": [diff.model_dump() for diff in diffs],
+        "next_cursor": next_cursor,
+        "total_changes": payload.get("total_changes")
+    }
+
+
 @app.post("/v1/chat/bulk-confirm")
 async def bulk_confirm(
     request: dict,
@@ -1047,11 +1258,18 @@ async def bulk_confirm(
         "action": "apply" | "cancel"
     }
     """
-    from app.nodes.bulk_apply import BulkApplyNode
+    return await run_blocking(_bulk_confirm, request, current_user, db)
+
+
+def _bulk_confirm(
+    request: dict,
+    current_user: AuthUser,
+    db: Session
+):
+    """确认批量修改（同步实现，在线程池中执行）"""
+    from app.services.bulk_edit import BulkEditPipeline, BulkPreviewMismatchError, reindex_revision
     from app.services.cache import get_cache_manager
-    from app.models.schemas import PreviewDiff
-    import hashlib
-    import json
+    from app.models.schemas import Intent
     
     session_id = request.get("session_id")
     doc_id = request.get("doc_id")
@@ -1080,6 +1298,16 @@ async def bulk_confirm(
         cache.delete_confirm_token(session_id, confirm_token)
         raise HTTPException(403, "确认令牌不属于当前用户")
     
+    if payload.get("doc_id") != doc_id:
+        raise HTTPException(400, "确认令牌与文档不匹配")
+
+    # 批量任务的文档级 token 只能通过任务确认接口应用（任务状态与进度由任务统一记录）
+    if payload.get("job_id"):
+        raise HTTPException(
+            409,
+            f"确认令牌属于批量任务，请通过 /v1/chat/bulk-jobs/{payload['job_id']}/confirm 确认"
+        )
+
     # 验证 preview_hash
     if preview_hash != payload.get("preview_hash"):
         cache.delete_confirm_token(session_id, confirm_token)
@@ -1108,29 +1336,28 @@ async def bulk_confirm(
         raise HTTPException(409, "文档版本已变更，预览已失效")
     
     try:
-        # 应用批量修改
-        apply_node = BulkApplyNode(db)
-        preview = PreviewDiff(**payload["preview"])
-        
-        result = apply_node.apply_bulk_changes(
-            preview,
-            doc_id,
-            str(active_rev.rev_id),
-            active_rev.version,
-            user_id=str(current_user.user_id),
-            trace_id=None
-        )
+        # 应用批量修改（单个 revision，数据库内执行或重新计算并校验 preview_hash）
+        pipeline = BulkEditPipeline(db)
+        try:
+            result = pipeline.apply(
+                Intent(**payload["intent"]),
+                doc_id,
+                str(active_rev.rev_id),
+                active_rev.version,
+                user_id=str(current_user.user_id),
+                preview_hash=payload.get("preview_hash"),
+                expected_changes=payload.get("total_changes", 0),
+                trace_id=None
+            )
+        except BulkPreviewMismatchError as e:
+            cache.delete_confirm_token(session_id, confirm_token)
+            raise HTTPException(409, str(e))
         
         # 删除 token
         cache.delete_confirm_token(session_id, confirm_token)
         
         # 重新索引（如果启用了 Meilisearch）
-        try:
-            from app.services.search_indexer import get_indexer
-            indexer = get_indexer()
-            indexer.index_document_blocks(doc_id, result['new_rev_id'], db)
-        except Exception as e:
-            print(f"重新索引失败（不影响主流程）: {e}")
+        reindex_revision(db, doc_id, result['new_rev_id'])
         
         return {
             "status": "applied",
@@ -1141,11 +1368,169 @@ async def bulk_confirm(
             "changes_applied": result['changes_applied']
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(500, f"应用批量修改失败: {str(e)}")
 
 
+@app.post("/v1/chat/bulk-jobs")
+async def create_bulk_job(
+    request: dict,
+    current_user: AuthUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    创建多文档批量修改任务（后台并发发现 / 预览）
+    
+    请求格式:
+    {
+        "message": "将所有'旧名称'替换为'新名称'",
+        "match_type": "exact_term",  // exact_term | regex
+        "scope_filter": {"term": "旧名称", "replacement": "新名称"},
+        "doc_ids": ["uuid", ...]  // 可选：默认为当前用户的全部文档
+    }
+    
+    预览完成后，每个文档的 confirm_token 以 job_id 作为 session_id，
+    可通过 /v1/chat/bulk-preview 分页查看单个文档的 diff。
+    """
+    return await run_blocking(_create_bulk_job, request, current_user, db)
+
+
+def _create_bulk_job(
+    request: dict,
+    current_user: AuthUser,
+    db: Session
+):
+    """创建多文档批量修改任务（同步实现，在线程池中执行）"""
+    from app.services.bulk_edit import build_bulk_intent
+    from app.services.bulk_jobs import get_bulk_job_manager
+    
+    message = request.get("message")
+    match_type = request.get("match_type", "exact_term")
+    scope_filter = request.get("scope_filter", {})
+    doc_ids = request.get("doc_ids")
+    
+    if not message:
+        raise HTTPException(400, "缺少必需参数")
+    
+    documents_query = db.query(db_models.Document).filter(
+        db_models.Document.user_id == current_user.user_id
+    )
+    if doc_ids:
+        try:
+            doc_uuids = [uuid.UUID(doc_id) for doc_id in doc_ids]
+        except ValueError as exc:
+            raise HTTPException(400, "无效的 doc_id") from exc
+        documents_query = documents_query.filter(db_models.Document.doc_id.in_(doc_uuids))
+    documents = documents_query.order_by(db_models.Document.created_at).all()
+    
+    if not documents:
+        raise HTTPException(404, "没有可修改的文档")
+    if len(documents) > settings.BULK_JOB_MAX_DOCUMENTS:
+        raise HTTPException(
+            400,
+            f"将涉及 {len(documents)} 个文档，超过限制 {settings.BULK_JOB_MAX_DOCUMENTS}，请缩小范围"
+        )
+    
+    intent = build_bulk_intent(match_type, scope_filter)
+    job = get_bulk_job_manager().create_job(str(current_user.user_id), intent, documents)
+    
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "total_documents": len(job.documents)
+    }
+
+
+def _get_owned_bulk_job_or_404(job_id: str, user_id: uuid.UUID):
+    """获取当前用户的批量任务"""
+    from app.services.bulk_jobs import get_bulk_job_manager
+    
+    job = get_bulk_job_manager().get_job(job_id)
+    if not job or job.user_id != str(user_id):
+        raise HTTPException(404, "任务不存在或已过期")
+    return job
+
+
+@app.get("/v1/chat/bulk-jobs/{job_id}")
+async def get_bulk_job(
+    job_id: str,
+    current_user: AuthUser = Depends(get_current_active_user)
+):
+    """
+    查询多文档批量任务进度
+    
+    发现 / 应用在执行进程内的后台线程中进行；执行进程重启后任务不会自动恢复，
+    心跳超过 BULK_JOB_STALE_SECONDS 的任务返回 status=failed，未完成的文档标记为失败。
+    """
+    return await run_blocking(_get_bulk_job, job_id, current_user)
+
+
+def _get_bulk_job(
+    job_id: str,
+    current_user: AuthUser
+):
+    """查询多文档批量任务进度（同步实现，在线程池中执行）"""
+    job = _get_owned_bulk_job_or_404(job_id, current_user.user_id)
+    data = job.to_dict()
+    data.pop("user_id", None)
+    data.pop("owner", None)
+    return data
+
+
+@app.post("/v1/chat/bulk-jobs/{job_id}/confirm")
+async def confirm_bulk_job(
+    job_id: str,
+    request: dict,
+    current_user: AuthUser = Depends(get_current_active_user)
+):
+    """
+    确认多文档批量任务
+    
+    请求格式:
+    {
+        "action": "apply" | "cancel",
+        "doc_ids": ["uuid", ...]  // 可选：只应用部分文档，其余文档作废
+    }
+    """
+    return await run_blocking(_confirm_bulk_job, job_id, request, current_user)
+
+
+def _confirm_bulk_job(
+    job_id: str,
+    request: dict,
+    current_user: AuthUser
+):
+    """确认多文档批量任务（同步实现，在线程池中执行）"""
+    from app.services.bulk_jobs import JOB_AWAITING_CONFIRM, JOB_CANCELLED, get_bulk_job_manager
+    
+    action = request.get("action", "apply")
+    doc_ids = request.get("doc_ids")
+    
+    job = _get_owned_bulk_job_or_404(job_id, current_user.user_id)
+    if job.status != JOB_AWAITING_CONFIRM:
+        raise HTTPException(409, f"任务当前状态为 {job.status}，无法确认")
+    
+    manager = get_bulk_job_manager()
+    if action == "cancel":
+        cancelled = manager.cancel(job.job_id)
+        if cancelled is None:
+            raise HTTPException(409, "任务已被确认或取消")
+        return {"job_id": cancelled.job_id, "status": JOB_CANCELLED, "message": "已取消批量任务"}
+    
+    # 状态迁移是原子的：并发确认时只有一个请求会启动应用
+    job = manager.confirm(job.job_id, doc_ids)
+    if job is None:
+        raise HTTPException(409, "任务已被确认或取消")
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "progress": job.progress()
+    }
+
+
 @app.get("/v1/chat/sessions/{session_id}", response_model=ChatSessionDetailResponse)
 async def get_chat_session(
     session_id: str,
@@ -1153,6 +1538,15 @@ async def get_chat_session(
     db: Session = Depends(get_db)
 ):
     """查看当前用户的会话历史"""
+    return await run_blocking(_get_chat_session, session_id, current_user, db)
+
+
+def _get_chat_session(
+    session_id: str,
+    current_user: AuthUser,
+    db: Session
+):
+    """查看当前用户的会话历史（同步实现，在线程池中执行）"""
     try:
         session, messages = MemoryService(db).get_session_history(
             user_id=str(current_user.user_id),
@@ -1186,6 +1580,14 @@ async def list_my_preferences(
     db: Session = Depends(get_db)
 ):
     """查看当前用户的长期偏好"""
+    return await run_blocking(_list_my_preferences, current_user, db)
+
+
+def _list_my_preferences(
+    current_user: AuthUser,
+    db: Session
+):
+    """查看当前用户的长期偏好（同步实现，在线程池中执行）"""
     items = MemoryService(db).list_user_preferences(str(current_user.user_id))
     return [
         UserPreferenceResponse(
@@ -1208,6 +1610,16 @@ async def upsert_my_preference(
     db: Session = Depends(get_db)
 ):
     """显式更新当前用户偏好"""
+    return await run_blocking(_upsert_my_preference, preference_key, request, current_user, db)
+
+
+def _upsert_my_preference(
+    preference_key: str,
+    request: UserPreferenceUpsertRequest,
+    current_user: AuthUser,
+    db: Session
+):
+    """显式更新当前用户偏好（同步实现，在线程池中执行）"""
     item = MemoryService(db).upsert_user_preference(
         user_id=str(current_user.user_id),
         preference_key=preference_key,
@@ -1236,6 +1648,15 @@ async def delete_my_preference(
     db: Session = Depends(get_db)
 ):
     """删除当前用户偏好"""
+    return await run_blocking(_delete_my_preference, preference_key, current_user, db)
+
+
+def _delete_my_preference(
+    preference_key: str,
+    current_user: AuthUser,
+    db: Session
+):
+    """删除当前用户偏好（同步实现，在线程池中执行）"""
     deleted = MemoryService(db).delete_user_preference(
         user_id=str(current_user.user_id),
         preference_key=preference_key,
@@ -1257,6 +1678,19 @@ async def list_my_memory(
     db: Session = Depends(get_db)
 ):
     """查看当前用户的情景记忆"""
+    return await run_blocking(_list_my_memory, memory_type, scope, doc_id, active_only, limit, current_user, db)
+
+
+def _list_my_memory(
+    memory_type: Optional[str],
+    scope: Optional[str],
+    doc_id: Optional[str],
+    active_only: bool,
+    limit: int,
+    current_user: AuthUser,
+    db: Session
+):
+    """查看当前用户的情景记忆（同步实现，在线程池中执行）"""
     items = MemoryService(db).list_memory_items(
         user_id=str(current_user.user_id),
         memory_type=memory_type,
@@ -1299,6 +1733,15 @@ async def list_document_preferences(
     db: Session = Depends(get_db)
 ):
     """查看某篇文档的结构化偏好"""
+    return await run_blocking(_list_document_preferences, doc_id, current_user, db)
+
+
+def _list_document_preferences(
+    doc_id: str,
+    current_user: AuthUser,
+    db: Session
+):
+    """查看某篇文档的结构化偏好（同步实现，在线程池中执行）"""
     _get_owned_document_or_404(db, doc_id, current_user.user_id)
     items = MemoryService(db).list_document_preferences(str(current_user.user_id), doc_id)
     return [
@@ -1323,6 +1766,17 @@ async def upsert_document_preference(
     db: Session = Depends(get_db)
 ):
     """显式更新某篇文档的结构化偏好"""
+    return await run_blocking(_upsert_document_preference, doc_id, preference_key, request, current_user, db)
+
+
+def _upsert_document_preference(
+    doc_id: str,
+    preference_key: str,
+    request: UserPreferenceUpsertRequest,
+    current_user: AuthUser,
+    db: Session
+):
+    """显式更新某篇文档的结构化偏好（同步实现，在线程池中执行）"""
     _get_owned_document_or_404(db, doc_id, current_user.user_id)
     item = MemoryService(db).upsert_document_preference(
         user_id=str(current_user.user_id),
@@ -1354,6 +1808,15 @@ async def delete_my_memory(
     db: Session = Depends(get_db)
 ):
     """删除当前用户的某条情景记忆"""
+    return await run_blocking(_delete_my_memory, memory_id, current_user, db)
+
+
+def _delete_my_memory(
+    memory_id: str,
+    current_user: AuthUser,
+    db: Session
+):
+    """删除当前用户的某条情景记忆（同步实现，在线程池中执行）"""
     deleted = MemoryService(db).delete_memory_item(
         user_id=str(current_user.user_id),
         memory_id=memory_id,
@@ -1370,6 +1833,14 @@ async def run_my_memory_maintenance(
     db: Session = Depends(get_db)
 ):
     """手动执行一次当前用户记忆热度衰减和归档"""
+    return await run_blocking(_run_my_memory_maintenance, current_user, db)
+
+
+def _run_my_memory_maintenance(
+    current_user: AuthUser,
+    db: Session
+):
+    """手动执行一次当前用户记忆热度衰减和归档（同步实现，在线程池中执行）"""
     result = MemoryService(db).run_maintenance(user_id=str(current_user.user_id))
     db.commit()
     return {"status": "ok", **result}
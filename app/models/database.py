@@ -3,7 +3,7 @@ from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 import uuid
-from pgvector.sqlalchemy import Vector
+from app.db.vector import embedding_column_type, hnsw_index_kwargs
 
 Base = declarative_base()
 
@@ -88,8 +88,8 @@ class BlockVersion(Base):
     plain_text = Column(Text)
     content_hash = Column(Text, nullable=False)
     
-    # 向量 embedding 字段 (Qwen text-embedding-v3 是 1024 维)
-    embedding = Column(Vector(1024))
+    # 向量 embedding 字段 (Qwen text-embedding-v3 是 1024 维，默认 halfvec 存储)
+    embedding = Column(embedding_column_type())
     
     parent_version_id = Column(UUID(as_uuid=True), ForeignKey('block_versions.block_version_id'))
     
@@ -99,6 +99,7 @@ class BlockVersion(Base):
         Index('idx_block_versions_rev_order', 'rev_id', 'order_index'),
         Index('idx_block_versions_block', 'block_id'),
         Index('idx_block_versions_parent', 'parent_version_id'),
+        Index('idx_block_versions_embedding_hnsw', 'embedding', **hnsw_index_kwargs()),
         CheckConstraint(
             '(content_md IS NOT NULL AND parent_version_id IS NULL) OR (content_md IS NULL AND parent_version_id IS NOT NULL)',
             name='check_content_or_parent'
@@ -283,7 +284,7 @@ class UserMemoryItem(Base):
     min_keep_until = Column(DateTime(timezone=True))
     max_keep_until = Column(DateTime(timezone=True))
     archived_at = Column(DateTime(timezone=True))
-    embedding = Column(Vector(1024))
+    embedding = Column(embedding_column_type())
 
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
@@ -293,6 +294,7 @@ class UserMemoryItem(Base):
         Index("idx_user_memory_items_doc", "doc_id"),
         Index("idx_user_memory_items_session", "session_id"),
         Index("idx_user_memory_items_archived", "archived_at"),
+        Index("idx_user_memory_items_embedding_hnsw", "embedding", **hnsw_index_kwargs()),
     )
 
 
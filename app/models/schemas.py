@@ -10,6 +10,7 @@ class ScopeHint(BaseModel):
     nearby: Optional[str] = Field(None, description="相对位置")
     keywords: List[str] = Field(default_factory=list, description="关键词列表")
     block_type: Optional[str] = Field(None, description="块类型过滤")
+    heading_level: Optional[int] = Field(None, description="标题级别过滤")
 
 
 class Constraints(BaseModel):
@@ -93,6 +94,8 @@ class PreviewDiff(BaseModel):
     grouped_by_heading: Optional[Dict[str, int]] = None
     total_chars_added: int = 0
     total_chars_removed: int = 0
+    # 有语义冲突检测超时或失败，预览中的冲突提示可能不完整
+    conflict_check_incomplete: bool = False
 
 
 # ============ API 请求/响应 ============
@@ -143,6 +146,16 @@ class ConfirmRequest(BaseModel):
     confirm_token: str
     action: Literal["apply", "cancel"]
     preview_hash: str
+    response_mode: Optional[Literal["full", "changes"]] = Field(
+        None, description="full: 返回全文 export_md；changes: 只返回变更块，全文通过 export_url 按需获取"
+    )
+
+
+class ChangedBlock(BaseModel):
+    block_id: str
+    change: Literal["updated", "inserted", "deleted"]
+    order_index: Optional[int] = None
+    content_md: Optional[str] = None
 
 
 class ConfirmResponse(BaseModel):
@@ -150,6 +163,8 @@ class ConfirmResponse(BaseModel):
     session_id: Optional[str] = None
     new_rev_id: Optional[str] = None
     export_md: Optional[str] = None
+    changed_blocks: Optional[List[ChangedBlock]] = None
+    export_url: Optional[str] = None
     error: Optional[dict] = None
     message: str
 
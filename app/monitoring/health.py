@@ -6,11 +6,11 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from pydantic import BaseModel
 from typing import Dict, Optional
-import redis
 import meilisearch
 from datetime import datetime
 
 from app.db.connection import get_db
+from app.db.redis_pool import get_async_redis_client
 from app.config import get_settings
 
 settings = get_settings()
@@ -122,8 +122,7 @@ async def check_redis() -> ComponentHealth:
     
     try:
         start_time = time.time()
-        r = redis.from_url(settings.REDIS_URL)
-        r.ping()
+        await get_async_redis_client().ping()
         response_time = (time.time() - start_time) * 1000
         
         return ComponentHealth(
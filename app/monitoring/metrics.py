@@ -58,10 +58,16 @@ bulk_edits_applied = Counter(
     'Total number of bulk edits applied'
 )
 
+bulk_job_documents = Counter(
+    'bulk_job_documents_total',
+    'Documents processed by multi-document bulk jobs',
+    ['stage', 'status']  # preview, apply ; previewed, no_changes, applied, conflict, failed
+)
+
 bulk_changes_count = Histogram(
     'bulk_changes_count',
     'Number of changes in bulk edits',
-    buckets=[1, 5, 10, 20, 50, 100]
+    buckets=[1, 5, 10, 20, 50, 100, 500, 1000, 5000, 10000, 50000]
 )
 
 # 检索操作
@@ -90,6 +96,25 @@ retrieval_requests = Counter(
     ['mode', 'status']  # success, empty, error
 )
 
+retrieval_leg_results = Counter(
+    'retrieval_leg_results_total',
+    'Outcome of each recall leg in hybrid retrieval',
+    ['leg', 'status']  # leg: bm25, vector ; status: success, empty, timeout, error
+)
+
+# 本地重排
+rerank_decisions = Counter(
+    'rerank_decisions_total',
+    'Local reranker decisions before LLM target selection',
+    ['component', 'decision']  # decision: skipped_llm, called_llm
+)
+
+rerank_llm_agreement = Counter(
+    'rerank_llm_agreement_total',
+    'Whether the LLM picked the same top target as the local reranker',
+    ['component', 'agreement']  # agree, disagree
+)
+
 # 认证操作
 auth_login_attempts = Counter(
     'auth_login_attempts_total',
@@ -133,6 +158,69 @@ llm_tokens_used = Counter(
     ['model', 'token_type']  # prompt, completion
 )
 
+llm_rate_limit_wait_seconds = Histogram(
+    'llm_rate_limit_wait_seconds',
+    'Time spent waiting for a model rate-limit permit',
+    ['model', 'priority'],
+    buckets=[0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0]
+)
+
+llm_rate_limit_requests = Counter(
+    'llm_rate_limit_requests_total',
+    'Model rate-limit permit requests',
+    ['model', 'priority', 'outcome']  # outcome: granted, timeout, bypass
+)
+
+preview_conflict_checks = Counter(
+    'preview_conflict_checks_total',
+    'Semantic conflict checks run during preview generation',
+    ['status']  # conflict, clear, timeout, error
+)
+
+llm_cache_requests = Counter(
+    'llm_cache_requests_total',
+    'Total number of LLM response cache lookups',
+    ['operation', 'result']  # result: hit, miss
+)
+
+# 阻塞调用线程池（async 接口中的同步工作）
+blocking_pool_inflight = Gauge(
+    'blocking_pool_inflight',
+    'Number of blocking calls currently running in the offload thread pool'
+)
+
+blocking_pool_wait_seconds = Histogram(
+    'blocking_pool_wait_seconds',
+    'Time blocking calls wait in the offload thread pool queue',
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0]
+)
+
+# Redis 连接池（每个 worker 一个同步池、一个异步池）
+redis_pool_connections = Gauge(
+    'redis_pool_connections',
+    'Redis connection pool connections by state',
+    ['pool', 'state']  # pool: sync, async; state: in_use, idle
+)
+
+redis_pool_max_connections = Gauge(
+    'redis_pool_max_connections',
+    'Configured Redis connection pool size',
+    ['pool']
+)
+
+redis_pool_wait_seconds = Histogram(
+    'redis_pool_wait_seconds',
+    'Time spent waiting to check a connection out of the Redis pool',
+    ['pool'],
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0]
+)
+
+redis_pool_exhausted = Counter(
+    'redis_pool_exhausted_total',
+    'Redis pool checkouts that timed out because every connection was in use',
+    ['pool']
+)
+
 # 数据库操作
 db_query_duration = Histogram(
     'db_query_duration_seconds',
@@ -159,6 +247,24 @@ cache_misses = Counter(
     ['cache_type']
 )
 
+local_cache_bytes = Gauge(
+    'local_cache_bytes',
+    'Approximate bytes held by the in-process L1 cache'
+)
+
+cache_invalidations = Counter(
+    'cache_invalidations_total',
+    'L1 cache invalidations applied, by origin',
+    ['source']  # local: this worker, remote: pub/sub message from another worker, resync: cleared after a pub/sub disconnect
+)
+
+cache_serialized_bytes = Histogram(
+    'cache_serialized_bytes',
+    'Size of cache values as stored in Redis, after encoding and compression',
+    ['codec'],  # json, msgpack, json+zstd, msgpack+zstd
+    buckets=[256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304]
+)
+
 # 搜索引擎
 meilisearch_query_duration = Histogram(
     'meilisearch_query_duration_seconds',
@@ -172,6 +278,34 @@ vector_search_duration = Histogram(
     buckets=[0.01, 0.05, 0.1, 0.5, 1.0]
 )
 
+planner_fast_path = Counter(
+    'planner_fast_path_total',
+    'Planner literal-replacement fast path attempts',
+    ['outcome']  # hit: plan built without an LLM call, miss: fell through to the LLM
+)
+
+speculative_recall = Counter(
+    'speculative_recall_total',
+    'Speculative recall legs started during intent parsing, by outcome',
+    ['leg', 'outcome']  # outcome: reused, refined, unused
+)
+
+workflow_checkpoints = Counter(
+    'workflow_checkpoints_total',
+    'Edit workflow checkpoints saved at clarification / disambiguation and resumed by follow-up turns',
+    ['stage', 'outcome']  # outcome: saved, resumed, stale
+)
+
+vector_matrix_cache_bytes = Gauge(
+    'vector_matrix_cache_bytes',
+    'Approximate bytes held by the in-process revision vector matrix cache'
+)
+
+bm25_index_cache_bytes = Gauge(
+    'bm25_index_cache_bytes',
+    'Approximate bytes held by the in-process BM25 fallback index cache'
+)
+
 # ============ 系统指标 ============
 
 # 应用信息
@@ -136,6 +136,7 @@ class ApplyEditsNode:
             
             # 同时设置 new_rev_id 到状态中
             state["new_rev_id"] = str(new_rev.rev_id)
+            state["changed_blocks"] = self._describe_changes(current_blocks, new_blocks, changed_block_ids)
             
             return state
             
@@ -258,6 +259,39 @@ class ApplyEditsNode:
         
         return new_blocks, changed_block_ids
     
+    def _describe_changes(
+        self,
+        current_blocks: List[db_models.BlockVersion],
+        new_blocks: List[db_models.BlockVersion],
+        changed_block_ids: Set[uuid.UUID]
+    ) -> List[Dict[str, Any]]:
+        """变更块列表（供确认接口只返回改动部分）"""
+        current_by_id = {block.block_id: block for block in current_blocks}
+        new_by_id = {block.block_id: block for block in new_blocks}
+        
+        changes = []
+        for block_id in changed_block_ids:
+            before = current_by_id.get(block_id)
+            after = new_by_id.get(block_id)
+            if after is None:
+                change = "deleted"
+            elif before is None:
+                change = "inserted"
+            elif before.content_hash != after.content_hash:
+                change = "updated"
+            else:
+                # 插入操作的锚点块只是被复制，内容未变
+                continue
+            changes.append({
+                "block_id": str(block_id),
+                "change": change,
+                "order_index": after.order_index if after is not None else None,
+                "content_md": after.content_md if after is not None else None,
+            })
+        
+        changes.sort(key=lambda item: (item["order_index"] is None, item["order_index"] or 0))
+        return changes
+    
     def _copy_block(self, block: db_models.BlockVersion) -> db_models.BlockVersion:
         """复制块"""
         return db_models.BlockVersion(
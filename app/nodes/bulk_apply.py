@@ -1,25 +1,91 @@
 """
 批量应用节点 - 执行批量修改
 """
-from typing import List, Set, Tuple
-from app.models.schemas import PreviewDiff, EditOperation, EvidenceQuote
+from typing import Dict, Optional, Tuple
 from app.models import database as db_models
+from app.monitoring.metrics import bulk_changes_count, bulk_edits_applied
+from app.nodes.bulk_preview import preview_hash_entry
+from app.services.discovery import is_portable_regex
+from app.services.scope_filter import resolve_scope
+from app.utils.intent_helper import get_intent_attr
 from app.utils.markdown import strip_markdown, hash_content
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+import hashlib
+import re
 import uuid
 from datetime import datetime
 
 
+# 替换文本中会被 strip_markdown 处理的 Markdown 标记
+_MARKDOWN_CHARS = re.compile(r"[*_`#>\[\]()!\\]")
+
+
+class BulkPreviewMismatchError(Exception):
+    """应用时重新计算的修改与预览不一致"""
+
+
+def sql_replacement_for(intent) -> Optional[Tuple[str, str, str, dict]]:
+    """
+    生成数据库内替换的 SQL 片段
+    
+    只有替换结果与 Python 路径（预览）一致时才返回：
+    - 精确词：term / replacement 不含 Markdown 标记（plain_text 上同样替换即等价于 strip_markdown）
+    - 正则：模式不含 Python / PostgreSQL 语义不同的写法，替换文本不含反向引用和 Markdown 标记
+    
+    Returns:
+        (匹配条件, content_md 替换表达式, plain_text 替换表达式, 参数)；不支持时返回 None
+    """
+    match_type = get_intent_attr(intent, "match_type", "semantic")
+    scope_filter = get_intent_attr(intent, "scope_filter", {}) or {}
+    replacement = scope_filter.get("replacement", "")
+    if not replacement or _MARKDOWN_CHARS.search(replacement):
+        return None
+    
+    if match_type == "exact_term":
+        term = scope_filter.get("term", "")
+        if not term or _MARKDOWN_CHARS.search(term):
+            return None
+        like_pattern = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return (
+            "bv.plain_text LIKE :bulk_like ESCAPE '\\'",
+            "replace(bv.content_md, :bulk_term, :bulk_replacement)",
+            "replace(plain_text, :bulk_term, :bulk_replacement)",
+            {"bulk_like": f"%{like_pattern}%", "bulk_term": term, "bulk_replacement": replacement}
+        )
+    
+    if match_type == "regex":
+        pattern = scope_filter.get("pattern", "")
+        if not is_portable_regex(pattern):
+            return None
+        try:
+            re.compile(pattern)
+        except re.error:
+            return None
+        return (
+            "bv.plain_text ~ :bulk_pattern",
+            "regexp_replace(bv.content_md, :bulk_pattern, :bulk_replacement, 'g')",
+            "regexp_replace(plain_text, :bulk_pattern, :bulk_replacement, 'g')",
+            {"bulk_pattern": pattern, "bulk_replacement": replacement}
+        )
+    
+    return None
+
+
 class BulkApplyNode:
     """批量应用节点 - 执行批量修改"""
     
     def __init__(self, db: Session):
         self.db = db
     
+    @staticmethod
+    def supports_in_database(intent) -> bool:
+        """是否可以在数据库内执行（替换是纯机械的且与 Python 语义一致）"""
+        return sql_replacement_for(intent) is not None
+    
     def apply_bulk_changes(
         self,
-        preview: PreviewDiff,
+        changes: Dict[str, str],
         doc_id: str,
         active_rev_id: str,
         active_version: int,
@@ -27,10 +93,10 @@ class BulkApplyNode:
         trace_id: str = None
     ) -> dict:
         """
-        应用批量修改
+        应用批量修改（全部修改一次提交为单个 revision）
         
         Args:
-            preview: 预览 diff
+            changes: block_id -> 修改后的完整 Markdown 内容
             doc_id: 文档 ID
             active_rev_id: 当前活跃版本 ID
             active_version: 乐观锁版本号
@@ -50,29 +116,16 @@ class BulkApplyNode:
                 db_models.BlockVersion.rev_id == active_rev_uuid
             ).order_by(db_models.BlockVersion.order_index).all()
             
-            # 创建 block_id -> block 的映射
-            block_map = {str(b.block_id): b for b in current_blocks}
-            
             # 2. 应用变更
-            changed_block_ids = set()
+            changed_blocks = []
             new_blocks = []
             
             for block in current_blocks:
-                block_id_str = str(block.block_id)
+                new_content = changes.get(str(block.block_id))
                 
-                # 查找是否有对应的 diff
-                diff_item = next(
-                    (d for d in preview.diffs if d.block_id == block_id_str),
-                    None
-                )
-                
-                if diff_item and diff_item.op_type == "replace":
+                if new_content is not None:
                     # 有修改：创建新版本
-                    changed_block_ids.add(block.block_id)
-                    
-                    # 从 after_snippet 重建完整内容（实际应该从 intent 重新生成）
-                    # 这里简化处理，实际应该保存完整的新内容
-                    new_content = self._reconstruct_content(block, diff_item)
+                    changed_blocks.append(block)
                     
                     new_block = self._create_new_block_version(
                         block,
@@ -90,7 +143,7 @@ class BulkApplyNode:
                 doc_uuid,
                 new_rev_no,
                 active_rev_uuid,
-                f"批量修改了 {len(preview.diffs)} 处内容"
+                f"批量修改了 {len(changed_blocks)} 处内容"
             )
             
             # 4. 设置新 block_versions 的 rev_id 和 order_index
@@ -102,69 +155,237 @@ class BulkApplyNode:
             self.db.bulk_save_objects(new_blocks)
             
             # 6. 写入 edit_operations（审计）
-            for diff_item in preview.diffs:
-                block = block_map.get(diff_item.block_id)
-                if not block:
-                    continue
-                
-                self._insert_edit_operation(
+            self.db.bulk_save_objects([
+                self._build_edit_operation(
                     doc_uuid,
                     new_rev.rev_id,
                     active_rev_uuid,
                     user_uuid,
-                    uuid.UUID(diff_item.block_id),
+                    block.block_id,
                     block.plain_text or '',
                     trace_id
                 )
+                for block in changed_blocks
+            ])
             
             # 7. 更新 active_rev（CAS 操作）
-            result = self.db.execute(
-                text("""
-                    UPDATE document_active_revision
-                    SET rev_id = :new_rev_id, version = version + 1, updated_at = now()
-                    WHERE doc_id = :doc_id AND version = :expected_version
-                    RETURNING version
+            new_version = self._swap_active_revision(doc_uuid, new_rev.rev_id, active_version)
+            
+            # 8. 提交事务
+            self.db.commit()
+            
+            bulk_edits_applied.inc()
+            bulk_changes_count.observe(len(changed_blocks))
+            
+            return {
+                'success': True,
+                'new_rev_id': str(new_rev.rev_id),
+                'new_rev_no': new_rev_no,
+                'new_version': new_version,
+                'changes_applied': len(changed_blocks)
+            }
+            
+        except Exception as e:
+            self.db.rollback()
+            raise e
+    
+    def apply_in_database(
+        self,
+        intent,
+        doc_id: str,
+        active_rev_id: str,
+        active_version: int,
+        user_id: str,
+        expected_changes: int,
+        preview_hash: str,
+        trace_id: str = None
+    ) -> dict:
+        """
+        在数据库内应用批量替换（exact_term / regex）
+        
+        用一条 INSERT ... SELECT 基于当前 revision 生成新 revision 的全部 block_versions，
+        replace / regexp_replace 计算新内容，同时重算 plain_text 与 content_hash，
+        并写入审计记录；未修改的块不经过 Python。
+        新块与 Python 路径一致地保存完整 content_md，parent_version_id 为 NULL（check_content_or_parent 约束）。
+        
+        修改过的块按 order_index 返回，用新 content_hash 重算 preview_hash，与用户确认的预览不一致时回滚；
+        plain_text 与 strip_markdown 结果不同（如空白处理差异）的块在同一事务内修正。
+        
+        Args:
+            intent: 用户意图（需满足 supports_in_database）
+            expected_changes: 预览统计的修改数量
+            preview_hash: 用户确认的预览哈希
+        
+        Returns:
+            应用结果
+        
+        Raises:
+            BulkPreviewMismatchError: 数据库内替换结果与预览不一致（已回滚）
+        """
+        replacement = sql_replacement_for(intent)
+        if replacement is None:
+            raise ValueError("该批量修改不支持数据库内执行")
+        match_condition, replace_content, replace_plain, params = replacement
+        
+        doc_uuid = uuid.UUID(doc_id)
+        active_rev_uuid = uuid.UUID(active_rev_id)
+        
+        try:
+            # 1. 解析范围（与发现阶段一致），范围外的块原样复制
+            scope = resolve_scope(self.db, active_rev_id, get_intent_attr(intent, "scope_hint", None))
+            if scope.is_empty:
+                match_condition = "FALSE"
+            scope_condition = f"(TRUE {scope.sql_conditions('bv')})"
+            
+            # 2. 创建新 revision
+            new_rev_no = self._get_next_rev_no(doc_uuid)
+            new_rev = self._create_revision(
+                doc_uuid,
+                new_rev_no,
+                active_rev_uuid,
+                "批量修改（数据库内执行）"
+            )
+            
+            # 3. 一条语句生成新 block_versions 与审计记录
+            changed_rows = self.db.execute(
+                text(f"""
+                    WITH src AS (
+                        SELECT
+                            bv.*,
+                            ROW_NUMBER() OVER (ORDER BY bv.order_index) AS rn,
+                            CASE WHEN {scope_condition} AND {match_condition}
+                                THEN {replace_content}
+                                ELSE bv.content_md
+                            END AS new_content
+                        FROM block_versions bv
+                        WHERE bv.rev_id = :active_rev_id
+                    ),
+                    computed AS (
+                        SELECT
+                            src.*,
+                            new_content IS DISTINCT FROM content_md AS changed
+                        FROM src
+                    ),
+                    inserted AS (
+                        INSERT INTO block_versions (
+                            block_version_id, block_id, rev_id, order_index, block_type,
+                            heading_level, parent_heading_block_id, content_md, plain_text,
+                            content_hash, embedding, parent_version_id
+                        )
+                        SELECT
+                            gen_random_uuid(), block_id, :new_rev_id, (rn - 1) * 10, block_type,
+                            heading_level, parent_heading_block_id, new_content,
+                            CASE WHEN changed THEN {replace_plain} ELSE plain_text END,
+                            CASE WHEN changed
+                                THEN encode(sha256(convert_to(new_content, 'UTF8')), 'hex')
+                                ELSE content_hash
+                            END,
+                            CASE WHEN changed THEN NULL ELSE embedding END,
+                            NULL
+                        FROM computed
+                        RETURNING block_version_id, block_id, order_index, content_md, plain_text, content_hash
+                    ),
+                    operations AS (
+                        INSERT INTO edit_operations (
+                            op_id, doc_id, rev_id, parent_rev_id, trace_id, user_id, op_type,
+                            target_block_id, evidence_quote, quote_start, quote_end,
+                            before_hash, after_hash, rationale, status
+                        )
+                        SELECT
+                            gen_random_uuid(), :doc_id, :new_rev_id, :active_rev_id, :trace_id, :user_id, 'replace',
+                            block_id, LEFT(COALESCE(plain_text, ''), 100), 0, LEAST(LENGTH(COALESCE(plain_text, '')), 100),
+                            content_hash, encode(sha256(convert_to(new_content, 'UTF8')), 'hex'), '批量修改', 'applied'
+                        FROM computed
+                        WHERE changed
+                        RETURNING 1
+                    )
+                    SELECT i.block_version_id, i.block_id, i.content_md, i.plain_text, i.content_hash
+                    FROM inserted i
+                    JOIN computed c ON c.block_id = i.block_id
+                    WHERE c.changed
+                    ORDER BY i.order_index
                 """),
                 {
+                    **params,
+                    'active_rev_id': active_rev_uuid,
                     'new_rev_id': new_rev.rev_id,
                     'doc_id': doc_uuid,
-                    'expected_version': active_version
+                    'user_id': uuid.UUID(user_id),
+                    'trace_id': trace_id
                 }
-            ).fetchone()
+            ).fetchall()
+            changed = len(changed_rows)
+            
+            # 4. 数据库替换结果必须与预览一致（数量与逐块内容哈希）
+            if changed != expected_changes:
+                raise BulkPreviewMismatchError(
+                    f"数据库内替换结果（{changed} 处）与预览（{expected_changes} 处）不一致"
+                )
+            hasher = hashlib.sha256()
+            for row in changed_rows:
+                hasher.update(preview_hash_entry(str(row.block_id), row.content_hash))
+            if hasher.hexdigest() != preview_hash:
+                raise BulkPreviewMismatchError("数据库内替换结果与预览内容不一致")
             
-            if not result:
-                raise Exception("并发冲突：文档已被其他用户修改")
+            # 5. plain_text 以 strip_markdown 为准（与 Python 路径一致）
+            plain_text_fixes = [
+                {"block_version_id": row.block_version_id, "plain_text": strip_markdown(row.content_md)}
+                for row in changed_rows
+                if strip_markdown(row.content_md) != row.plain_text
+            ]
+            if plain_text_fixes:
+                self.db.execute(
+                    text("UPDATE block_versions SET plain_text = :plain_text WHERE block_version_id = :block_version_id"),
+                    plain_text_fixes
+                )
             
-            new_version = result[0]
+            new_rev.change_summary = f"批量修改了 {changed} 处内容"
+            
+            # 6. 更新 active_rev（CAS 操作）
+            new_version = self._swap_active_revision(doc_uuid, new_rev.rev_id, active_version)
             
-            # 8. 提交事务
             self.db.commit()
             
+            bulk_edits_applied.inc()
+            bulk_changes_count.observe(changed)
+            
             return {
                 'success': True,
                 'new_rev_id': str(new_rev.rev_id),
                 'new_rev_no': new_rev_no,
                 'new_version': new_version,
-                'changes_applied': len(preview.diffs)
+                'changes_applied': changed
             }
             
         except Exception as e:
             self.db.rollback()
             raise e
     
-    def _reconstruct_content(
+    def _swap_active_revision(
         self,
-        original_block: db_models.BlockVersion,
-        diff_item: DiffItem
-    ) -> str:
-        """
-        重建完整内容
+        doc_id: uuid.UUID,
+        new_rev_id: uuid.UUID,
+        expected_version: int
+    ) -> int:
+        """CAS 更新 active_rev，返回新版本号"""
+        result = self.db.execute(
+            text("""
+                UPDATE document_active_revision
+                SET rev_id = :new_rev_id, version = version + 1, updated_at = now()
+                WHERE doc_id = :doc_id AND version = :expected_version
+                RETURNING version
+            """),
+            {
+                'new_rev_id': new_rev_id,
+                'doc_id': doc_id,
+                'expected_version': expected_version
+            }
+        ).fetchone()
         
-        注意：这是简化实现，实际应该从 intent 重新生成
-        """
-        # 这里简化处理，实际应该保存完整的新内容
-        # 暂时返回原内容（需要在 preview 阶段保存完整的新内容）
-        return original_block.content_md or ''
+        if not result:
+            raise Exception("并发冲突：文档已被其他用户修改")
+        
+        return result[0]
     
     def _create_new_block_version(
         self,
@@ -240,7 +461,7 @@ class BulkApplyNode:
         
         return revision
     
-    def _insert_edit_operation(
+    def _build_edit_operation(
         self,
         doc_id: uuid.UUID,
         rev_id: uuid.UUID,
@@ -249,9 +470,9 @@ class BulkApplyNode:
         target_block_id: uuid.UUID,
         evidence_quote: str,
         trace_id: str = None
-    ):
-        """插入编辑操作记录"""
-        operation = db_models.EditOperation(
+    ) -> db_models.EditOperation:
+        """构建编辑操作记录"""
+        return db_models.EditOperation(
             op_id=uuid.uuid4(),
             doc_id=doc_id,
             rev_id=rev_id,
@@ -266,5 +487,3 @@ class BulkApplyNode:
             rationale="批量修改",
             status="applied"
         )
-        
-        self.db.add(operation)
@@ -1,13 +1,15 @@
 """
 批量发现节点 - 用于批量修改操作
 """
-from typing import List, Set
+from typing import Iterator, List, Optional, Tuple
 from app.models.schemas import Intent, BlockCandidate
 from app.services.search_indexer import get_indexer
+from app.services.discovery import DiscoveryEngine
+from app.services.scope_filter import ResolvedScope, resolve_scope
 from app.models import database as db_models
 from app.utils.intent_helper import get_intent_attr
+from app.config import get_settings
 from sqlalchemy.orm import Session
-import re
 
 
 class BulkDiscoverNode:
@@ -25,63 +27,131 @@ class BulkDiscoverNode:
         intent: Intent,
         doc_id: str,
         rev_id: str,
-        max_changes: int = 100
+        max_changes: Optional[int] = None
     ) -> List[BlockCandidate]:
         """
-        批量发现匹配的块
+        批量发现全部匹配的块（逐页拉取）
         
         Args:
             intent: 用户意图
             doc_id: 文档 ID
             rev_id: 版本 ID
-            max_changes: 最大修改数量限制
+            max_changes: 最大修改数量限制（默认 BULK_MAX_CHANGES）
         
         Returns:
             匹配的块列表
         """
-        # 构建查询
+        if max_changes is None:
+            max_changes = get_settings().BULK_MAX_CHANGES
+        
+        candidates = []
+        for page, _ in self.iter_pages(intent, doc_id, rev_id):
+            candidates.extend(page)
+            # 限制最大影响范围
+            if len(candidates) > max_changes:
+                raise ValueError(
+                    f"将影响超过 {max_changes} 处，超过限制，请缩小范围"
+                )
+        
+        return candidates
+    
+    def iter_pages(
+        self,
+        intent: Intent,
+        doc_id: str,
+        rev_id: str,
+        cursor: Optional[int] = None,
+        page_size: Optional[int] = None
+    ) -> Iterator[Tuple[List[BlockCandidate], Optional[int]]]:
+        """
+        按游标逐页产出匹配块（范围只解析一次）
+        
+        Yields:
+            (匹配块列表, 下一页游标)，跳过空页
+        
+        Args:
+            intent: 用户意图
+            doc_id: 文档 ID
+            rev_id: 版本 ID
+            cursor: 起始游标（上一页最后一块的 order_index）
+            page_size: 每页块数（默认 BULK_PAGE_SIZE）
+        """
+        scope = resolve_scope(self.db, rev_id, get_intent_attr(intent, "scope_hint", None))
+        if scope.is_empty:
+            return
+        
+        while True:
+            candidates, cursor = self._discover_page(intent, doc_id, rev_id, scope, cursor, page_size)
+            if candidates:
+                yield candidates, cursor
+            if cursor is None:
+                break
+    
+    def discover_page(
+        self,
+        intent: Intent,
+        doc_id: str,
+        rev_id: str,
+        cursor: Optional[int] = None,
+        page_size: Optional[int] = None
+    ) -> Tuple[List[BlockCandidate], Optional[int]]:
+        """
+        发现一页匹配块
+        
+        Returns:
+            (匹配块列表, 下一页游标)，游标为 None 表示已到末尾
+        """
+        # 解析范围过滤（heading / block_type / heading_level 下推到检索层）
+        scope = resolve_scope(self.db, rev_id, get_intent_attr(intent, "scope_hint", None))
+        if scope.is_empty:
+            # heading 没有匹配到任何章节
+            return [], None
+        return self._discover_page(intent, doc_id, rev_id, scope, cursor, page_size)
+    
+    def _discover_page(
+        self,
+        intent: Intent,
+        doc_id: str,
+        rev_id: str,
+        scope: ResolvedScope,
+        cursor: Optional[int],
+        page_size: Optional[int]
+    ) -> Tuple[List[BlockCandidate], Optional[int]]:
+        """按匹配类型发现一页"""
         match_type = get_intent_attr(intent, "match_type", "semantic")
-        scope_filter = get_intent_attr(intent, "scope_filter", {})
+        scope_filter = get_intent_attr(intent, "scope_filter", {}) or {}
         scope_hint = get_intent_attr(intent, "scope_hint", None)
+        page_size = page_size or get_settings().BULK_PAGE_SIZE
+        
+        if match_type in ("exact_term", "regex"):
+            # 精确词 / 正则：在完整 plain_text 上由数据库匹配（pg_trgm 索引），按 order_index 游标分页
+            engine = DiscoveryEngine(self.db)
+            if match_type == "exact_term":
+                page = engine.find_exact(rev_id, scope_filter.get("term", ""), scope, cursor, page_size)
+            else:
+                page = engine.find_regex(rev_id, scope_filter.get("pattern", ""), scope, cursor, page_size)
+            return [match.to_candidate() for match in page.matches], page.next_cursor
         
-        if match_type == "exact_term":
-            # 精确词匹配
-            query = scope_filter.get("term", "") if scope_filter else ""
-        elif match_type == "regex":
-            # 正则表达式匹配（需要全量拉取后过滤）
-            query = ""
-        else:
-            # 语义匹配
-            keywords = []
-            if scope_hint:
-                if isinstance(scope_hint, dict):
-                    keywords = scope_hint.get("keywords", [])
-                else:
-                    keywords = getattr(scope_hint, "keywords", [])
-            query = " ".join(keywords) if keywords else ""
+        # 语义匹配：按相关度排序，一次返回全部候选
+        keywords = []
+        if scope_hint:
+            if isinstance(scope_hint, dict):
+                keywords = scope_hint.get("keywords", [])
+            else:
+                keywords = getattr(scope_hint, "keywords", [])
+        query = " ".join(keywords) if keywords else ""
         
         # 召回候选
         if self.indexer and query:
-            candidates = self._search_with_meilisearch(query, doc_id, rev_id)
-        else:
-            candidates = self._search_with_db(doc_id, rev_id)
-        
-        # 按 scope_filter 进一步过滤
-        filtered = self._filter_by_scope(candidates, intent)
-        
-        # 限制最大影响范围
-        if len(filtered) > max_changes:
-            raise ValueError(
-                f"将影响 {len(filtered)} 处，超过限制 {max_changes}，请缩小范围"
-            )
-        
-        return filtered
+            return self._search_with_meilisearch(query, doc_id, rev_id, scope), None
+        return self._search_with_db(doc_id, rev_id, scope), None
     
     def _search_with_meilisearch(
         self,
         query: str,
         doc_id: str,
-        rev_id: str
+        rev_id: str,
+        scope: ResolvedScope
     ) -> List[BlockCandidate]:
         """使用 Meilisearch 搜索"""
         all_candidates = []
@@ -94,8 +164,9 @@ class BulkDiscoverNode:
                     query,
                     doc_id,
                     rev_id,
-                    filters={},
-                    limit=limit
+                    filters=scope.meilisearch_filters(),
+                    limit=limit,
+                    offset=offset
                 )
                 
                 if not results:
@@ -131,21 +202,34 @@ class BulkDiscoverNode:
     def _search_with_db(
         self,
         doc_id: str,
-        rev_id: str
+        rev_id: str,
+        scope: ResolvedScope
     ) -> List[BlockCandidate]:
-        """使用数据库全量拉取"""
+        """使用数据库拉取范围内的块"""
         import uuid
         
         rev_uuid = uuid.UUID(rev_id)
         
-        blocks = self.db.query(db_models.BlockVersion).filter(
+        blocks_query = self.db.query(db_models.BlockVersion).filter(
             db_models.BlockVersion.rev_id == rev_uuid
-        ).order_by(db_models.BlockVersion.order_index).all()
+        )
+        blocks = scope.apply_to_query(blocks_query).order_by(db_models.BlockVersion.order_index).all()
+        
+        # 一次查询取出父级标题，避免逐块查询
+        parent_ids = {block.parent_heading_block_id for block in blocks if block.parent_heading_block_id}
+        parent_headings = {}
+        if parent_ids:
+            parent_headings = dict(self.db.query(
+                db_models.BlockVersion.block_id,
+                db_models.BlockVersion.plain_text
+            ).filter(
+                db_models.BlockVersion.rev_id == rev_uuid,
+                db_models.BlockVersion.block_id.in_(parent_ids)
+            ).all())
         
         candidates = []
         for block in blocks:
-            # 获取父级标题
-            parent_heading = self._get_parent_heading(block)
+            parent_heading = parent_headings.get(block.parent_heading_block_id)
             
             candidates.append(BlockCandidate(
                 block_id=str(block.block_id),
@@ -157,80 +241,3 @@ class BulkDiscoverNode:
             ))
         
         return candidates
-    
-    def _filter_by_scope(
-        self,
-        candidates: List[BlockCandidate],
-        intent: Intent
-    ) -> List[BlockCandidate]:
-        """按 scope_filter 过滤"""
-        filtered = candidates
-        
-        scope_hint = get_intent_attr(intent, "scope_hint", None)
-        match_type = get_intent_attr(intent, "match_type", "semantic")
-        scope_filter = get_intent_attr(intent, "scope_filter", {})
-        
-        # 按 block_type 过滤
-        if scope_hint:
-            block_type = None
-            if isinstance(scope_hint, dict):
-                block_type = scope_hint.get("block_type")
-            else:
-                block_type = getattr(scope_hint, "block_type", None)
-            
-            if block_type:
-                filtered = [
-                    c for c in filtered 
-                    if c.block_type == block_type
-                ]
-        
-        # 按 heading 过滤
-        if scope_hint:
-            heading = None
-            if isinstance(scope_hint, dict):
-                heading = scope_hint.get("heading")
-            else:
-                heading = getattr(scope_hint, "heading", None)
-            
-            if heading:
-                heading_keyword = heading.lower()
-                filtered = [
-                    c for c in filtered 
-                    if heading_keyword in c.heading_context.lower()
-                ]
-        
-        # 按 regex 过滤
-        if match_type == "regex" and scope_filter:
-            pattern_str = scope_filter.get("pattern", "") if isinstance(scope_filter, dict) else ""
-            if pattern_str:
-                try:
-                    pattern = re.compile(pattern_str)
-                    filtered = [
-                        c for c in filtered 
-                        if pattern.search(c.snippet)
-                    ]
-                except re.error as e:
-                    print(f"正则表达式错误: {e}")
-        
-        # 按精确词过滤
-        if match_type == "exact_term" and scope_filter:
-            term = scope_filter.get("term", "") if isinstance(scope_filter, dict) else ""
-            if term:
-                filtered = [
-                    c for c in filtered 
-                    if term in c.snippet
-                ]
-        
-        return filtered
-    
-    def _get_parent_heading(self, block: db_models.BlockVersion) -> str:
-        """获取父级标题"""
-        if not block.parent_heading_block_id:
-            return None
-        
-        parent = self.db.query(db_models.BlockVersion).filter(
-            db_models.BlockVersion.block_id == block.parent_heading_block_id,
-            db_models.BlockVersion.rev_id == block.rev_id
-        ).first()
-        
-        return parent.plain_text if parent else None
@@ -1,15 +1,63 @@
 """
 批量预览节点 - 生成批量修改的预览
 """
-from typing import List, Dict
+from typing import Any, Dict, Iterator, List, Tuple
 from app.models.schemas import Intent, BlockCandidate, PreviewDiff, DiffItem
 from app.models import database as db_models
-from app.utils.markdown import strip_markdown
+from app.utils.markdown import strip_markdown, hash_content
 from app.utils.intent_helper import get_intent_attr
 from sqlalchemy.orm import Session
+import hashlib
 import uuid
 
 
+def preview_hash_entry(block_id: str, content_hash: str) -> bytes:
+    """preview_hash 中一处修改对应的输入（应用阶段按同样格式重算）"""
+    return f"{block_id}:{content_hash}\n".encode()
+
+
+class PreviewAccumulator:
+    """
+    逐页累计预览统计
+    
+    只保留计数和摘要，不保留完整 diff 列表；preview_hash 由每处修改的
+    block_id 与新内容哈希按顺序滚动计算，应用阶段重新计算后比对即可校验预览未变。
+    """
+    
+    def __init__(self):
+        self.total_changes = 0
+        self.grouped_by_heading: Dict[str, int] = {}
+        self.total_chars_added = 0
+        self.total_chars_removed = 0
+        self._hasher = hashlib.sha256()
+    
+    def add(self, diff: DiffItem, new_content: str):
+        """累计一处修改"""
+        self.total_changes += 1
+        if diff.char_diff > 0:
+            self.total_chars_added += diff.char_diff
+        else:
+            self.total_chars_removed += abs(diff.char_diff)
+        heading = diff.heading_context
+        self.grouped_by_heading[heading] = self.grouped_by_heading.get(heading, 0) + 1
+        self._hasher.update(preview_hash_entry(diff.block_id, hash_content(new_content)))
+    
+    @property
+    def preview_hash(self) -> str:
+        return self._hasher.hexdigest()
+    
+    def to_preview(self, diffs: List[DiffItem]) -> PreviewDiff:
+        """生成 PreviewDiff（diffs 可以只是其中一页，统计为全量）"""
+        return PreviewDiff(
+            diffs=diffs,
+            total_changes=self.total_changes,
+            estimated_impact=BulkPreviewNode.estimate_impact(self.total_changes),
+            grouped_by_heading=self.grouped_by_heading,
+            total_chars_added=self.total_chars_added,
+            total_chars_removed=self.total_chars_removed
+        )
+
+
 class BulkPreviewNode:
     """批量预览节点 - 生成批量修改的预览"""
     
@@ -33,11 +81,40 @@ class BulkPreviewNode:
         Returns:
             预览 diff
         """
+        accumulator = PreviewAccumulator()
+        diffs = []
+        for block, candidate, new_content in self.iter_changes(intent, candidates, rev_id):
+            diff = self.build_diff(block, candidate, new_content)
+            accumulator.add(diff, new_content)
+            diffs.append(diff)
+        return accumulator.to_preview(diffs)
+    
+    def iter_changes(
+        self,
+        intent: Intent,
+        candidates: List[BlockCandidate],
+        rev_id: str
+    ) -> Iterator[Tuple[Any, BlockCandidate, str]]:
+        """
+        逐块生成替换结果（跳过内容未变化的块）
+        
+        只查询需要的列，不把 ORM 对象留在 session 中，逐页处理大批量修改时内存不随总量增长。
+        
+        Yields:
+            (原始块行 block_id/content_md/plain_text, 候选, 替换后的内容)
+        """
+        if not candidates:
+            return
+        
         rev_uuid = uuid.UUID(rev_id)
         
         # 获取所有候选块的完整内容
         block_ids = [uuid.UUID(c.block_id) for c in candidates]
-        blocks = self.db.query(db_models.BlockVersion).filter(
+        blocks = self.db.query(
+            db_models.BlockVersion.block_id,
+            db_models.BlockVersion.content_md,
+            db_models.BlockVersion.plain_text
+        ).filter(
             db_models.BlockVersion.block_id.in_(block_ids),
             db_models.BlockVersion.rev_id == rev_uuid
         ).all()
@@ -45,12 +122,6 @@ class BulkPreviewNode:
         # 创建 block_id -> block 的映射
         block_map = {str(b.block_id): b for b in blocks}
         
-        # 生成每个块的 diff
-        diffs = []
-        grouped_by_heading = {}
-        total_chars_added = 0
-        total_chars_removed = 0
-        
         for candidate in candidates:
             block = block_map.get(candidate.block_id)
             if not block:
@@ -63,45 +134,33 @@ class BulkPreviewNode:
                 # 内容没有变化，跳过
                 continue
             
-            # 计算字符变化
-            char_diff = len(new_content) - len(block.content_md or '')
-            if char_diff > 0:
-                total_chars_added += char_diff
-            else:
-                total_chars_removed += abs(char_diff)
-            
-            # 创建 diff item
-            before_snippet = block.plain_text[:200] if block.plain_text else ''
-            after_snippet = strip_markdown(new_content)[:200]
-            
-            diffs.append(DiffItem(
-                block_id=str(block.block_id),
-                op_type="replace",
-                before_snippet=before_snippet,
-                after_snippet=after_snippet,
-                heading_context=candidate.heading_context,
-                char_diff=char_diff
-            ))
-            
-            # 按章节分组统计
-            heading = candidate.heading_context
-            grouped_by_heading[heading] = grouped_by_heading.get(heading, 0) + 1
+            yield block, candidate, new_content
+    
+    def build_diff(
+        self,
+        block: Any,
+        candidate: BlockCandidate,
+        new_content: str
+    ) -> DiffItem:
+        """生成单块的 diff item"""
+        # 计算字符变化
+        char_diff = len(new_content) - len(block.content_md or '')
         
-        # 评估影响等级
-        estimated_impact = self._estimate_impact(len(diffs))
+        before_snippet = block.plain_text[:200] if block.plain_text else ''
+        after_snippet = strip_markdown(new_content)[:200]
         
-        return PreviewDiff(
-            diffs=diffs,
-            total_changes=len(diffs),
-            estimated_impact=estimated_impact,
-            grouped_by_heading=grouped_by_heading,
-            total_chars_added=total_chars_added,
-            total_chars_removed=total_chars_removed
+        return DiffItem(
+            block_id=str(block.block_id),
+            op_type="replace",
+            before_snippet=before_snippet,
+            after_snippet=after_snippet,
+            heading_context=candidate.heading_context,
+            char_diff=char_diff
         )
     
     def _generate_replacement(
         self,
-        block: db_models.BlockVersion,
+        block: Any,
         intent: Intent
     ) -> str:
         """
@@ -144,7 +203,8 @@ class BulkPreviewNode:
         # 其他类型需要调用 LLM 生成（暂不实现）
         return content
     
-    def _estimate_impact(self, change_count: int) -> str:
+    @staticmethod
+    def estimate_impact(change_count: int) -> str:
         """评估影响等级"""
         if change_count > 20:
             return "high"
@@ -154,7 +154,7 @@ class IntentClarifierNode:
         ]
         
         try:
-            response = self.llm.chat_completion_json(messages, temperature=0.3)
+            response = self.llm.chat_completion_json(messages, temperature=0.3, span_name="intent_ambiguity")
             result = json.loads(response)
             
             if result.get("is_ambiguous"):
@@ -247,7 +247,7 @@ class SemanticConflictDetector:
         ]
         
         try:
-            response = self.llm.chat_completion_json(messages, temperature=0.3)
+            response = self.llm.chat_completion_json(messages, temperature=0.3, span_name="semantic_conflict")
             result = json.loads(response)
             
             if result.get("has_conflict"):
@@ -36,7 +36,8 @@ class IntentParserNode:
     "heading": "章节名称（可选）",
     "nearby": "相对位置（可选）",
     "keywords": ["关键词1", "关键词2"],
-    "block_type": "paragraph|heading|list|code|table（可选）"
+    "block_type": "paragraph|heading|list|code|table（可选）",
+    "heading_level": "标题级别 1-6（可选，仅在用户明确指定时填写）"
   },
   "constraints": {
     "tone": "formal|neutral|casual",
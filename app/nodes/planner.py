@@ -1,14 +1,48 @@
-from typing import Dict, Any, Optional
+from typing import Any, Callable, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
 from app.models.schemas import EditPlan, EditOperation, EvidenceQuote
 from app.models import database as db_models
 from app.services.llm_client import get_qwen_client
 from app.nodes.intent_clarifier import CrossReferenceResolver, SemanticConflictDetector
+from app.config import get_settings
+from app.monitoring.metrics import planner_fast_path
 import json
 import uuid
 import re
 
 
+# 字面替换指令（X 必须原样出现在目标块中才走规则化改写）。
+# 所有形式都必须占满整条消息：“把“甲方”改成“委托方”，并把语气改得更正式”这类带后续要求的指令
+# 只匹配前半句会丢掉其余要求，交给 LLM
+_OPEN_QUOTES = "“\"「『‘'"
+_CLOSE_QUOTES = "”\"」』’'"
+_QUOTED = f"[{_OPEN_QUOTES}]([^{_OPEN_QUOTES}{_CLOSE_QUOTES}]+)[{_CLOSE_QUOTES}]"
+# 无引号形式两侧都是不含空白、标点的词语（如“把甲方改成委托方”）
+_BARE = r"([^\s，,。；;：:！!？?、]+?)"
+_END = r"\s*[。.!！]?\s*$"
+LITERAL_REPLACE_PATTERNS = [
+    re.compile(rf"^\s*(?:请)?[把将]{_QUOTED}\s*(?:全部|都)?(?:改成|改为|替换成|替换为|换成)\s*{_QUOTED}{_END}"),
+    re.compile(rf"^\s*(?:please\s+)?(?:replace|change)\s+{_QUOTED}\s+(?:with|to|by|into)\s+{_QUOTED}{_END}", re.IGNORECASE),
+    re.compile(rf"^\s*(?:请)?[把将]{_BARE}\s*(?:全部|都)?(?:改成|改为|替换成|替换为|换成)\s*{_BARE}{_END}"),
+]
+
+
+def parse_literal_replacement(user_message: str) -> Optional[Tuple[str, str]]:
+    """
+    解析字面替换指令
+    
+    Returns:
+        (原文, 新文本)，不是字面替换指令时返回 None
+    """
+    for pattern in LITERAL_REPLACE_PATTERNS:
+        match = pattern.match(user_message or "")
+        if match:
+            old_text = match.group(1).strip()
+            if old_text:
+                return old_text, match.group(2).strip()
+    return None
+
+
 class EditPlannerNode:
     """编辑计划生成节点"""
     
@@ -30,6 +64,15 @@ class EditPlannerNode:
         intent_dict = state["intent"]
         operations = []
         
+        # 流式接口：把 LLM 输出逐段推送给客户端（app.agents 依赖本模块，延迟导入）
+        from app.agents.runtime import EVENT_LISTENER_KEY, emit_workflow_event
+        on_token = None
+        if state.get(EVENT_LISTENER_KEY):
+            def on_token(text: str):
+                emit_workflow_event(state, "token", {"text": text})
+        
+        fast_path_enabled = get_settings().ENABLE_PLANNER_FAST_PATH
+        
         # 将 selected_target 转换为 target 列表
         targets = [selected_target] if isinstance(selected_target, dict) else []
         
@@ -42,19 +85,33 @@ class EditPlannerNode:
             if not block:
                 continue
             
+            evidence = EvidenceQuote(
+                text=block.plain_text[: min(50, len(block.plain_text or ""))],
+                start=0,
+                end=min(50, len(block.plain_text or "")),
+            ) if isinstance(target, dict) else target.evidence
+            
+            # 快速路径：字面替换且原文出现在目标块中时直接规则化改写，不调用 LLM
+            if fast_path_enabled:
+                fast_operation = self._build_direct_replace_operation(
+                    intent_dict=intent_dict,
+                    block=block,
+                    evidence=evidence,
+                )
+                planner_fast_path.labels(outcome="hit" if fast_operation else "miss").inc()
+                if fast_operation is not None:
+                    operations.append(fast_operation)
+                    continue
+            
             try:
                 # 使用 LLM 生成编辑操作
-                operation = self._generate_operation(intent_dict, target, block)
+                operation = self._generate_operation(intent_dict, target, block, memory_context, on_token)
                 operations.append(operation)
             except Exception as e:
-                fallback_operation = self._build_direct_replace_operation(
+                fallback_operation = None if fast_path_enabled else self._build_direct_replace_operation(
                     intent_dict=intent_dict,
                     block=block,
-                    evidence=EvidenceQuote(
-                        text=block.plain_text[: min(50, len(block.plain_text or ""))],
-                        start=0,
-                        end=min(50, len(block.plain_text or "")),
-                    ) if isinstance(target, dict) else target.evidence,
+                    evidence=evidence,
                 )
                 if fallback_operation is not None:
                     operations.append(fallback_operation)
@@ -73,8 +130,15 @@ class EditPlannerNode:
         state["edit_plan"] = edit_plan.model_dump()  # 转换为字典
         return state
     
-    def _generate_operation(self, intent_dict, target, block: db_models.BlockVersion) -> EditOperation:
-        """生成单个编辑操作"""
+    def _generate_operation(
+        self,
+        intent_dict,
+        target,
+        block: db_models.BlockVersion,
+        memory_context: str = "",
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> EditOperation:
+        """生成单个编辑操作（提供 on_token 时流式生成）"""
         # 从 target 字典中提取信息
         if isinstance(target, dict):
             plain_text = target.get("plain_text", "")
@@ -134,8 +198,8 @@ class EditPlannerNode:
 """
         
         # 将 intent_dict 转换为 JSON 字符串
-        import json
-        intent_json = json.dumps(intent_dict, ensure_ascii=False, indent=2)
+        intent_payload = intent_dict.model_dump() if hasattr(intent_dict, "model_dump") else intent_dict
+        intent_json = json.dumps(intent_payload, ensure_ascii=False, indent=2)
         
         user_content = f"""用户意图：
 {intent_json}
@@ -173,7 +237,15 @@ evidence_quote：{evidence.text}
             {"role": "user", "content": user_content + "\n请生成修改后的内容。输出 JSON："}
         ]
 
-        response = self.llm.chat_completion_json(messages, temperature=0.7)
+        if on_token:
+            response = self.llm.chat_completion_stream(
+                messages,
+                on_token,
+                temperature=0.7,
+                response_format={"type": "json_object"}
+            )
+        else:
+            response = self.llm.chat_completion_json(messages, temperature=0.7)
         result = json.loads(response)
         
         # 提取操作类型
@@ -203,31 +275,19 @@ evidence_quote：{evidence.text}
         if not user_message:
             return None
 
-        patterns = [
-            r'把[“"「](.+?)[”"」]改成[“"「](.+?)[”"」]',
-            r'把[“"「](.+?)[”"」]改为[“"「](.+?)[”"」]',
-            r'将[“"「](.+?)[”"」]改成[“"「](.+?)[”"」]',
-            r'将[“"「](.+?)[”"」]改为[“"「](.+?)[”"」]',
-        ]
-        old_text = None
-        new_text = None
-        for pattern in patterns:
-            match = re.search(pattern, user_message)
-            if match:
-                old_text = match.group(1).strip()
-                new_text = match.group(2).strip()
-                break
-
-        if not old_text or new_text is None:
+        replacement = parse_literal_replacement(user_message)
+        if replacement is None:
             return None
+        old_text, new_text = replacement
 
         if old_text not in (block.content_md or "") and old_text not in (block.plain_text or ""):
             return None
 
+        # 替换块内全部出现位置（“把 X 改成 Y”指的是所有 X，只改第一处会留下不一致的文本）
         if old_text in (block.content_md or ""):
-            new_content_md = block.content_md.replace(old_text, new_text, 1)
+            new_content_md = block.content_md.replace(old_text, new_text)
         else:
-            new_content_md = (block.content_md or "").replace(block.plain_text or "", (block.plain_text or "").replace(old_text, new_text, 1), 1)
+            new_content_md = (block.content_md or "").replace(block.plain_text or "", (block.plain_text or "").replace(old_text, new_text))
 
         if not new_content_md or new_content_md == block.content_md:
             return None
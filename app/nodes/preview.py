@@ -1,15 +1,39 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from sqlalchemy.orm import Session
+from app.config import get_settings
 from app.models.schemas import PreviewDiff, DiffItem
 from app.models import database as db_models
+from app.monitoring.metrics import preview_conflict_checks
 from app.nodes.intent_clarifier import SemanticConflictDetector
 from app.utils.markdown import strip_markdown
+from concurrent.futures import ThreadPoolExecutor, wait
+import threading
 import uuid
 import hashlib
 import json
 import time
 
 
+# 超时或失败的冲突检测结果（与“无冲突”的 None 区分，需要在预览中提示）
+CONFLICT_CHECK_INCOMPLETE = {"incomplete": True}
+
+_conflict_executor: Optional[ThreadPoolExecutor] = None
+_conflict_executor_lock = threading.Lock()
+
+
+def _get_conflict_executor() -> ThreadPoolExecutor:
+    """获取语义冲突检测线程池（进程内共享）"""
+    global _conflict_executor
+    if _conflict_executor is None:
+        with _conflict_executor_lock:
+            if _conflict_executor is None:
+                _conflict_executor = ThreadPoolExecutor(
+                    max_workers=get_settings().PREVIEW_CONFLICT_MAX_WORKERS,
+                    thread_name_prefix="preview-conflict",
+                )
+    return _conflict_executor
+
+
 class PreviewGeneratorNode:
     """预览生成节点"""
     
@@ -46,6 +70,7 @@ class PreviewGeneratorNode:
         total_chars_added = 0
         total_chars_removed = 0
         grouped = {}
+        conflict_checks = []
         
         for op in operations:
             target_block_id = op.get("target_block_id") if isinstance(op, dict) else op.target_block_id
@@ -78,26 +103,18 @@ class PreviewGeneratorNode:
             
             heading_context = self._get_parent_heading(block) or "（无标题）"
             
-            # 语义冲突检测（仅对 replace 操作）
+            # 语义冲突检测（仅对 replace 操作），收集后统一并发执行
             if op_type == "replace" and new_content_md:
-                context = self.conflict_detector.get_context(
-                    target_block_id,
-                    state["active_rev_id"],
-                    window=1
-                )
-                conflict = self.conflict_detector.check_conflict(
-                    block.plain_text,
-                    strip_markdown(new_content_md),
-                    context
-                )
-                if conflict and conflict.get("severity") == "high":
-                    # 记录冲突警告
-                    state.setdefault("warnings", []).append({
-                        "type": "semantic_conflict",
-                        "block_id": target_block_id,
-                        "message": conflict["message"],
-                        "suggestion": conflict.get("suggestion", "")
-                    })
+                conflict_checks.append({
+                    "block_id": target_block_id,
+                    "original": block.plain_text,
+                    "new": strip_markdown(new_content_md),
+                    "context": self.conflict_detector.get_context(
+                        target_block_id,
+                        state["active_rev_id"],
+                        window=1
+                    )
+                })
             
             diffs.append(DiffItem(
                 block_id=target_block_id,
@@ -111,13 +128,35 @@ class PreviewGeneratorNode:
             # 按章节分组
             grouped[heading_context] = grouped.get(heading_context, 0) + 1
         
+        # 记录冲突警告（按计划中的操作顺序）
+        conflict_check_incomplete = False
+        for check, conflict in zip(conflict_checks, self._check_conflicts(conflict_checks)):
+            if conflict is CONFLICT_CHECK_INCOMPLETE:
+                # 检测未完成不等于没有冲突，提示用户人工核对
+                conflict_check_incomplete = True
+                state.setdefault("warnings", []).append({
+                    "type": "conflict_check_incomplete",
+                    "block_id": check["block_id"],
+                    "message": "语义冲突检测超时或失败，未能确认该修改是否与上下文冲突，请人工核对",
+                    "suggestion": ""
+                })
+                continue
+            if conflict and conflict.get("severity") == "high":
+                state.setdefault("warnings", []).append({
+                    "type": "semantic_conflict",
+                    "block_id": check["block_id"],
+                    "message": conflict["message"],
+                    "suggestion": conflict.get("suggestion", "")
+                })
+        
         preview = PreviewDiff(
             diffs=diffs,
             total_changes=len(diffs),
             estimated_impact=edit_plan_dict.get("estimated_impact", "low"),
             grouped_by_heading=grouped,
             total_chars_added=total_chars_added,
-            total_chars_removed=total_chars_removed
+            total_chars_removed=total_chars_removed,
+            conflict_check_incomplete=conflict_check_incomplete
         )
         
         # 计算 preview_hash
@@ -128,7 +167,8 @@ class PreviewGeneratorNode:
         requires_confirmation = edit_plan_dict.get("requires_confirmation", False)
         estimated_impact = edit_plan_dict.get("estimated_impact", "low")
         
-        if requires_confirmation or estimated_impact == "high":
+        # 冲突检测未完成时也要求确认，让用户看到提示，不直接应用
+        if requires_confirmation or estimated_impact == "high" or conflict_check_incomplete:
             token = self._generate_confirm_token(state, edit_plan_dict, preview, preview_hash)
             state["confirm_token"] = token
             state["preview_hash"] = preview_hash
@@ -137,6 +177,51 @@ class PreviewGeneratorNode:
         state["preview_diff"] = preview.model_dump()  # 转换为字典
         return state
     
+    def _check_conflicts(self, checks: List[Dict[str, Any]]) -> List[Optional[Dict]]:
+        """
+        并发执行语义冲突检测（只调用 LLM，不访问 self.db）
+        
+        所有检测共享一个总截止时间，超时或失败的检测返回 CONFLICT_CHECK_INCOMPLETE
+        （预览中提示人工核对），预览延迟约为一次 LLM 调用，与计划中的操作数量无关。
+        """
+        if not checks:
+            return []
+        
+        executor = _get_conflict_executor()
+        futures = [
+            executor.submit(
+                self.conflict_detector.check_conflict,
+                check["original"],
+                check["new"],
+                check["context"]
+            )
+            for check in checks
+        ]
+        wait(futures, timeout=get_settings().PREVIEW_CONFLICT_TIMEOUT_SECONDS)
+        
+        results = []
+        timed_out = 0
+        for future in futures:
+            if not future.done():
+                future.cancel()
+                timed_out += 1
+                preview_conflict_checks.labels(status="timeout").inc()
+                results.append(CONFLICT_CHECK_INCOMPLETE)
+                continue
+            try:
+                conflict = future.result()
+            except Exception as e:
+                print(f"语义冲突检测失败: {e}")
+                preview_conflict_checks.labels(status="error").inc()
+                results.append(CONFLICT_CHECK_INCOMPLETE)
+                continue
+            preview_conflict_checks.labels(status="conflict" if conflict else "clear").inc()
+            results.append(conflict)
+        
+        if timed_out:
+            print(f"{timed_out} 个语义冲突检测超时，已在预览中提示")
+        return results
+    
     def _generate_confirm_token(self, state, edit_plan_dict, preview, preview_hash: str) -> str:
         """生成确认 token"""
         from uuid import uuid4
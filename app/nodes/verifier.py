@@ -5,6 +5,8 @@ from app.models import database as db_models
 from app.services.llm_client import get_qwen_client
 from app.utils.markdown import normalize_text
 from app.utils.intent_helper import get_intent_attr
+from app.services.reranker import get_reranker, record_llm_agreement, record_rerank_decision
+from app.config import get_settings
 import json
 import uuid
 
@@ -58,7 +60,7 @@ class VerifierNode:
         
         # 如果有多个候选，使用 LLM 选择
         try:
-            selection = self._llm_select(state["intent"], candidates)
+            selection = self._llm_select(state["intent"], candidates, state.get("user_message"))
             
             # 验证 evidence_quote
             for target in selection.targets:
@@ -80,7 +82,7 @@ class VerifierNode:
             state["error"] = {"code": "verification_failed", "message": str(e)}
             return state
     
-    def _llm_select(self, intent, candidates: List[BlockCandidate]) -> TargetSelection:
+    def _llm_select(self, intent, candidates: List[BlockCandidate], user_message: str = None) -> TargetSelection:
         """使用 LLM 选择目标块"""
         # 如果候选很少，直接返回
         if len(candidates) <= 2:
@@ -96,6 +98,22 @@ class VerifierNode:
                     reasoning="候选数量少，直接选择最佳匹配"
                 )
         
+        # 本地重排：第一名分差足够大时直接选定，跳过 LLM
+        rerank = get_reranker().rerank(intent, candidates, user_message=user_message)
+        local_top_id = rerank.top.block_id if rerank.top else None
+        if get_settings().ENABLE_LOCAL_RERANKER and rerank.is_confident:
+            record_rerank_decision("verifier", skipped_llm=True)
+            return TargetSelection(
+                targets=[TargetBlock(
+                    block_id=rerank.top.block_id,
+                    evidence=rerank.evidence_for(rerank.top),
+                    confidence=rerank.confidence
+                )],
+                need_user_disambiguation=False,
+                reasoning=f"本地重排分差 {rerank.margin:.2f} 达到阈值，直接选择"
+            )
+        record_rerank_decision("verifier", skipped_llm=False)
+        
         system_prompt = """你是一个文档定位助手。
 
 关键规则：
@@ -139,10 +157,16 @@ class VerifierNode:
         ]
         
         try:
-            response = self.llm.chat_completion_json(messages, temperature=0.3)
+            response = self.llm.chat_completion_json(messages, temperature=0.3, span_name="verify_target")
             selection_data = json.loads(response)
             
-            return TargetSelection(**selection_data)
+            selection = TargetSelection(**selection_data)
+            record_llm_agreement(
+                "verifier",
+                local_top_id,
+                selection.targets[0].block_id if selection.targets else None
+            )
+            return selection
         except Exception as e:
             # 降级：返回第一个候选
             if candidates:
@@ -0,0 +1,261 @@
+"""
+进程内 BM25 倒排索引（Meilisearch 不可用时的降级检索）
+
+按 rev_id 懒加载构建，revision 内容不可变，因此无需失效，只按字节数做 LRU 淘汰。
+中文按二元组（bigram）切分，英文/数字按单词切分，与 memory.py 的 _extract_keywords 思路一致。
+"""
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import math
+import re
+import threading
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import database as db_models
+from app.monitoring.metrics import bm25_index_cache_bytes, cache_hits, cache_misses
+
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9_]+|[\u4e00-\u9fff]+")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """分词：中文连续片段切成 bigram（单字片段保留单字），英文/数字按单词"""
+    tokens: List[str] = []
+    for token in _TOKEN_PATTERN.findall((text or "").lower()):
+        if "\u4e00" <= token[0] <= "\u9fff" and len(token) > 1:
+            tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+class RevisionBM25Index:
+    """单个 revision 的倒排索引与块元数据"""
+
+    def __init__(
+        self,
+        rev_id: str,
+        block_ids: List[str],
+        snippets: List[str],
+        order_indexes: List[int],
+        block_types: List[str],
+        parent_headings: List[Optional[str]],
+        heading_levels: List[Optional[int]],
+        parent_heading_block_ids: List[Optional[str]],
+        postings: Dict[str, Tuple[array, array]],
+        doc_lengths: array,
+    ):
+        self.rev_id = rev_id
+        self.block_ids = block_ids
+        self.snippets = snippets
+        self.order_indexes = order_indexes
+        self.block_types = block_types
+        self.parent_headings = parent_headings
+        self.heading_levels = heading_levels
+        self.parent_heading_block_ids = parent_heading_block_ids
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.avg_doc_length = (sum(doc_lengths) / len(doc_lengths)) if len(doc_lengths) else 0.0
+        self.nbytes = self._estimate_bytes()
+
+    @classmethod
+    def build(cls, rev_id: str, rows) -> "RevisionBM25Index":
+        """
+        从 (block_id, plain_text, order_index, block_type, parent_heading,
+        heading_level, parent_heading_block_id) 行构建索引
+        """
+        block_ids, snippets, order_indexes, block_types, parent_headings = [], [], [], [], []
+        heading_levels, parent_heading_block_ids = [], []
+        doc_lengths = array("I")
+        term_docs: Dict[str, array] = {}
+        term_freqs: Dict[str, array] = {}
+
+        for doc_index, row in enumerate(rows):
+            (block_id, plain_text, order_index, block_type, parent_heading,
+             heading_level, parent_heading_block_id) = row
+            tokens = tokenize(plain_text)
+
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                if token not in term_docs:
+                    term_docs[token] = array("I")
+                    term_freqs[token] = array("H")
+                term_docs[token].append(doc_index)
+                term_freqs[token].append(min(count, 65535))
+
+            block_ids.append(block_id)
+            snippets.append((plain_text or "")[:200])
+            order_indexes.append(order_index)
+            block_types.append(block_type)
+            parent_headings.append(parent_heading)
+            heading_levels.append(heading_level)
+            parent_heading_block_ids.append(parent_heading_block_id)
+            doc_lengths.append(len(tokens))
+
+        postings = {token: (term_docs[token], term_freqs[token]) for token in term_docs}
+        return cls(
+            rev_id, block_ids, snippets, order_indexes, block_types, parent_headings,
+            heading_levels, parent_heading_block_ids, postings, doc_lengths
+        )
+
+    def _estimate_bytes(self) -> int:
+        """内存占用估算"""
+        posting_bytes = sum(
+            docs.itemsize * len(docs) + freqs.itemsize * len(freqs) + len(token) * 4 + 160
+            for token, (docs, freqs) in self.postings.items()
+        )
+        meta_bytes = sum(len(snippet) * 3 + 150 for snippet in self.snippets)
+        return posting_bytes + meta_bytes + self.doc_lengths.itemsize * len(self.doc_lengths)
+
+    def matches_all(self, doc_index: int, tokens: List[str]) -> bool:
+        """块是否包含全部 token（用于关键词提示加权）"""
+        for token in tokens:
+            posting = self.postings.get(token)
+            if not posting:
+                return False
+            # 倒排表按块序号升序构建，二分查找代替线性扫描
+            docs = posting[0]
+            position = bisect_left(docs, doc_index)
+            if position == len(docs) or docs[position] != doc_index:
+                return False
+        return bool(tokens)
+
+    def in_scope(self, doc_index: int, scope) -> bool:
+        """块是否在 ResolvedScope 范围内"""
+        return scope is None or scope.matches(
+            self.block_types[doc_index],
+            self.heading_levels[doc_index],
+            self.parent_heading_block_ids[doc_index]
+        )
+
+    def search(self, query: str, scope=None) -> Dict[int, float]:
+        """
+        BM25 打分
+
+        Args:
+            scope: ResolvedScope，只对范围内的块打分
+
+        Returns:
+            {块序号: BM25 分数}，只包含命中至少一个 token 的块
+        """
+        doc_count = len(self.block_ids)
+        if not doc_count:
+            return {}
+
+        scores: Dict[int, float] = {}
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            docs, freqs = posting
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_index, tf in zip(docs, freqs):
+                if scope is not None and not self.in_scope(doc_index, scope):
+                    continue
+                length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc_index] / (self.avg_doc_length or 1.0)
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+
+        return scores
+
+
+class BM25IndexCache:
+    """按 rev_id 缓存 BM25 索引，按字节数做 LRU 淘汰"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, RevisionBM25Index]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, db: Session, rev_id: str) -> RevisionBM25Index:
+        """获取 revision 的索引，未缓存时构建（同一 revision 只构建一次）"""
+        with self._lock:
+            entry = self._entries.get(rev_id)
+            if entry is not None:
+                self._entries.move_to_end(rev_id)
+                cache_hits.labels(cache_type="bm25_index").inc()
+                return entry
+            build_lock = self._build_locks.setdefault(rev_id, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(rev_id)
+                if entry is not None:
+                    return entry
+
+            cache_misses.labels(cache_type="bm25_index").inc()
+            try:
+                entry = self._build(db, rev_id)
+            finally:
+                with self._lock:
+                    self._build_locks.pop(rev_id, None)
+
+            with self._lock:
+                self._entries[rev_id] = entry
+                self._total_bytes += entry.nbytes
+                self._evict()
+
+        return entry
+
+    def _evict(self):
+        """超出字节上限时淘汰最久未使用的索引（调用方持有锁）"""
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.nbytes
+        bm25_index_cache_bytes.set(self._total_bytes)
+
+    def _build(self, db: Session, rev_id: str) -> RevisionBM25Index:
+        """一次查询加载 revision 的块文本（不读取 embedding 列），父级标题在内存中解析"""
+        BlockVersion = db_models.BlockVersion
+        rows = db.query(
+            BlockVersion.block_id,
+            BlockVersion.plain_text,
+            BlockVersion.order_index,
+            BlockVersion.block_type,
+            BlockVersion.heading_level,
+            BlockVersion.parent_heading_block_id,
+        ).filter(
+            BlockVersion.rev_id == uuid.UUID(rev_id)
+        ).order_by(BlockVersion.order_index).all()
+
+        heading_texts = {row.block_id: row.plain_text for row in rows}
+        return RevisionBM25Index.build(
+            rev_id,
+            [
+                (
+                    str(row.block_id),
+                    row.plain_text or "",
+                    row.order_index,
+                    row.block_type,
+                    heading_texts.get(row.parent_heading_block_id) if row.parent_heading_block_id else None,
+                    row.heading_level,
+                    str(row.parent_heading_block_id) if row.parent_heading_block_id else None,
+                )
+                for row in rows
+            ],
+        )
+
+
+# 全局实例
+_bm25_index_cache = None
+
+
+def get_bm25_index_cache() -> BM25IndexCache:
+    """获取 BM25 索引缓存单例"""
+    global _bm25_index_cache
+    if _bm25_index_cache is None:
+        _bm25_index_cache = BM25IndexCache(
+            max_bytes=get_settings().BM25_INDEX_CACHE_MAX_MB * 1024 * 1024
+        )
+    return _bm25_index_cache
@@ -0,0 +1,249 @@
+"""
+批量修改流水线
+
+发现 → 预览 → 应用 全程按游标分页：
+- 预览只返回第一页 diff 和全量统计，后续页通过游标按需生成
+- confirm_token 只保存 intent、版本信息和 preview_hash，大小与匹配数量无关
+- 应用时基于同一（不可变的）revision 重新计算全部修改，校验 preview_hash 后一次提交为单个 revision
+"""
+from typing import Dict, List, Optional, Tuple
+import time
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.schemas import DiffItem, Intent, PreviewDiff, ScopeHint
+from app.nodes.bulk_apply import BulkApplyNode, BulkPreviewMismatchError
+from app.nodes.bulk_discover import BulkDiscoverNode
+from app.nodes.bulk_preview import BulkPreviewNode, PreviewAccumulator
+
+
+# confirm_token 默认有效期（秒）
+CONFIRM_TOKEN_TTL_SECONDS = 900
+
+
+class BulkPreviewResult:
+    """批量预览结果（第一页 diff + 全量统计）"""
+
+    def __init__(
+        self,
+        preview: PreviewDiff,
+        preview_hash: str,
+        next_cursor: Optional[int] = None,
+        matched_blocks: int = 0
+    ):
+        self.preview = preview
+        self.preview_hash = preview_hash
+        self.next_cursor = next_cursor
+        # 发现阶段命中的块数（含替换后内容不变的块）
+        self.matched_blocks = matched_blocks
+
+
+def build_bulk_intent(match_type: str, scope_filter: dict) -> Intent:
+    """根据批量修改请求构建 Intent"""
+    return Intent(
+        operation="multi_replace",
+        scope_hint=ScopeHint(
+            heading=scope_filter.get("heading"),
+            keywords=[scope_filter.get("term", "")],
+            block_type=scope_filter.get("block_type")
+        ),
+        constraints={},
+        risk="medium",
+        match_type=match_type,
+        apply_scope="all_matches",
+        scope_filter=scope_filter
+    )
+
+
+def build_confirm_payload(
+    token_id: str,
+    session_id: str,
+    user_id: str,
+    doc_id: str,
+    active_rev_id: str,
+    active_version: int,
+    intent: Intent,
+    result: BulkPreviewResult,
+    ttl: int = CONFIRM_TOKEN_TTL_SECONDS,
+    job_id: Optional[str] = None
+) -> dict:
+    """
+    构建 confirm_token payload（只保存 intent 与版本信息，大小与匹配数量无关）
+
+    多文档批量任务的文档级 token 记录 job_id，只能通过任务确认接口应用。
+    """
+    now = time.time()
+    return {
+        "token_id": token_id,
+        "session_id": session_id,
+        "user_id": user_id,
+        "doc_id": doc_id,
+        "active_rev_id": active_rev_id,
+        "active_version": active_version,
+        "preview_hash": result.preview_hash,
+        "total_changes": result.preview.total_changes,
+        "intent": intent.model_dump(),
+        "job_id": job_id,
+        "created_at": now,
+        "expires_at": now + ttl
+    }
+
+
+def reindex_revision(db: Session, doc_id: str, rev_id: str):
+    """应用后重新索引新 revision（失败不影响主流程）"""
+    try:
+        from app.services.search_indexer import get_indexer
+        indexer = get_indexer()
+        indexer.index_document_blocks(doc_id, rev_id, db)
+    except Exception as e:
+        print(f"重新索引失败（不影响主流程）: {e}")
+
+
+class BulkEditPipeline:
+    """批量修改流水线"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.discover_node = BulkDiscoverNode(db)
+        self.preview_node = BulkPreviewNode(db)
+
+    def preview(
+        self,
+        intent: Intent,
+        doc_id: str,
+        rev_id: str,
+        max_changes: Optional[int] = None
+    ) -> BulkPreviewResult:
+        """
+        生成批量预览
+
+        遍历全部匹配页累计统计和 preview_hash，只保留第一页的 diff。
+
+        Raises:
+            ValueError: 修改数量超过 max_changes
+        """
+        if max_changes is None:
+            max_changes = get_settings().BULK_MAX_CHANGES
+
+        accumulator = PreviewAccumulator()
+        first_page: List[DiffItem] = []
+        next_cursor = None
+        matched_blocks = 0
+
+        for candidates, page_cursor in self.discover_node.iter_pages(intent, doc_id, rev_id):
+            matched_blocks += len(candidates)
+            collect = not first_page
+            for block, candidate, new_content in self.preview_node.iter_changes(intent, candidates, rev_id):
+                diff = self.preview_node.build_diff(block, candidate, new_content)
+                accumulator.add(diff, new_content)
+                if collect:
+                    first_page.append(diff)
+                if accumulator.total_changes > max_changes:
+                    raise ValueError(
+                        f"将影响超过 {max_changes} 处，超过限制，请缩小范围"
+                    )
+            if collect and first_page:
+                next_cursor = page_cursor
+
+        return BulkPreviewResult(
+            accumulator.to_preview(first_page),
+            accumulator.preview_hash,
+            next_cursor,
+            matched_blocks
+        )
+
+    def preview_page(
+        self,
+        intent: Intent,
+        doc_id: str,
+        rev_id: str,
+        cursor: Optional[int]
+    ) -> Tuple[List[DiffItem], Optional[int]]:
+        """
+        生成一页 diff（跳过没有实际修改的发现页）
+
+        Returns:
+            (diff 列表, 下一页游标)
+        """
+        while True:
+            candidates, next_cursor = self.discover_node.discover_page(intent, doc_id, rev_id, cursor)
+            diffs = [
+                self.preview_node.build_diff(block, candidate, new_content)
+                for block, candidate, new_content in self.preview_node.iter_changes(intent, candidates, rev_id)
+            ]
+            if diffs or next_cursor is None:
+                return diffs, next_cursor
+            cursor = next_cursor
+
+    def collect_changes(
+        self,
+        intent: Intent,
+        doc_id: str,
+        rev_id: str
+    ) -> Tuple[Dict[str, str], str]:
+        """
+        重新计算全部修改
+
+        Returns:
+            (block_id -> 新内容, preview_hash)
+        """
+        accumulator = PreviewAccumulator()
+        changes: Dict[str, str] = {}
+
+        for candidates, _ in self.discover_node.iter_pages(intent, doc_id, rev_id):
+            for block, candidate, new_content in self.preview_node.iter_changes(intent, candidates, rev_id):
+                accumulator.add(self.preview_node.build_diff(block, candidate, new_content), new_content)
+                changes[str(block.block_id)] = new_content
+
+        return changes, accumulator.preview_hash
+
+    def apply(
+        self,
+        intent: Intent,
+        doc_id: str,
+        active_rev_id: str,
+        active_version: int,
+        user_id: str,
+        preview_hash: str,
+        expected_changes: int,
+        trace_id: str = None
+    ) -> dict:
+        """
+        按预览应用批量修改（单个 revision）
+
+        纯机械替换优先在数据库内执行，其余情况在 Python 中重新计算；两条路径都校验 preview_hash。
+        数据库内替换与预览不一致时（正则语义差异等）回滚并改走 Python 路径。
+
+        Raises:
+            BulkPreviewMismatchError: 重新计算的修改与预览不一致
+        """
+        apply_node = BulkApplyNode(self.db)
+
+        if get_settings().BULK_IN_DATABASE_APPLY and BulkApplyNode.supports_in_database(intent):
+            try:
+                return apply_node.apply_in_database(
+                    intent,
+                    doc_id,
+                    active_rev_id,
+                    active_version,
+                    user_id=user_id,
+                    expected_changes=expected_changes,
+                    preview_hash=preview_hash,
+                    trace_id=trace_id
+                )
+            except BulkPreviewMismatchError as e:
+                print(f"数据库内替换与预览不一致，回退到 Python 应用: {e}")
+
+        changes, recomputed_hash = self.collect_changes(intent, doc_id, active_rev_id)
+        if recomputed_hash != preview_hash:
+            raise BulkPreviewMismatchError("预览内容已变更，请重新预览")
+
+        return apply_node.apply_bulk_changes(
+            changes,
+            doc_id,
+            active_rev_id,
+            active_version,
+            user_id=user_id,
+            trace_id=trace_id
+        )
@@ -0,0 +1,431 @@
+"""
+多文档批量修改任务
+
+一次请求在用户的多个文档上执行同一批量替换（如产品名 / 法人实体更名）：
+- 发现与预览按文档并发执行，每个文档生成独立的 confirm_token
+- 确认后在有界线程池中逐文档应用，每个文档各自 CAS 更新 active_rev
+- 任务状态保存在缓存中，通过任务状态接口查询进度；任务级状态迁移是原子的 compare-and-set，
+  文档进度按文档分别写入，多个 worker 并行更新时互不覆盖
+- 编排线程是进程内线程，执行期间定期写入 owner / 心跳；进程重启后心跳超时的
+  发现 / 应用中任务在查询时标记为 failed，未完成的文档标记为失败
+
+单个文档的预览 / 应用复用 BulkEditPipeline；文档级 token 以 job_id 作为 session_id 存储，
+因此也可以通过 /v1/chat/bulk-preview 分页查看单个文档的 diff（token 记录 job_id，
+不能通过单文档的 /v1/chat/bulk-confirm 应用）。
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+import os
+import socket
+import threading
+import time
+import uuid
+
+from app.config import get_settings
+from app.db.connection import SessionLocal
+from app.models import database as db_models
+from app.models.schemas import Intent
+from app.monitoring.metrics import bulk_job_documents
+from app.services.bulk_edit import (
+    BulkEditPipeline,
+    BulkPreviewMismatchError,
+    build_confirm_payload,
+    reindex_revision,
+)
+from app.services.cache import get_cache_manager
+
+
+# 文档状态
+DOC_PENDING = "pending"
+DOC_PREVIEWED = "previewed"
+DOC_NO_CHANGES = "no_changes"
+DOC_APPLYING = "applying"
+DOC_APPLIED = "applied"
+DOC_CONFLICT = "conflict"
+DOC_FAILED = "failed"
+DOC_CANCELLED = "cancelled"
+
+# 任务状态
+JOB_DISCOVERING = "discovering"
+JOB_AWAITING_CONFIRM = "awaiting_confirm"
+JOB_NO_CHANGES = "no_changes"
+JOB_APPLYING = "applying"
+JOB_COMPLETED = "completed"
+JOB_COMPLETED_WITH_ERRORS = "completed_with_errors"
+JOB_CANCELLED = "cancelled"
+JOB_FAILED = "failed"
+
+# 由进程内编排线程推进的任务状态（心跳超时说明执行进程已中断）
+JOB_RUNNING_STATUSES = (JOB_DISCOVERING, JOB_APPLYING)
+
+
+class BulkJob:
+    """多文档批量修改任务"""
+
+    def __init__(
+        self,
+        job_id: str,
+        user_id: str,
+        intent: dict,
+        documents: Dict[str, dict],
+        status: str = JOB_DISCOVERING,
+        created_at: Optional[float] = None,
+        updated_at: Optional[float] = None,
+        owner: str = "",
+        heartbeat_at: Optional[float] = None
+    ):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.intent = intent
+        # doc_id -> 文档进度（status / title / total_changes / confirm_token / error ...）
+        self.documents = documents
+        self.status = status
+        self.created_at = created_at or time.time()
+        self.updated_at = updated_at or self.created_at
+        # 执行任务的进程（host:pid）与最近一次心跳
+        self.owner = owner
+        self.heartbeat_at = heartbeat_at or self.updated_at
+
+    def progress(self) -> dict:
+        """按状态统计文档数与修改总数"""
+        counts: Dict[str, int] = {}
+        total_changes = 0
+        for entry in self.documents.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+            total_changes += entry.get("total_changes", 0) or 0
+        return {
+            "total_documents": len(self.documents),
+            "by_status": counts,
+            "total_changes": total_changes
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "user_id": self.user_id,
+            "intent": self.intent,
+            "documents": self.documents,
+            "status": self.status,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "owner": self.owner,
+            "heartbeat_at": self.heartbeat_at,
+            "progress": self.progress()
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BulkJob":
+        return cls(
+            job_id=data["job_id"],
+            user_id=data["user_id"],
+            intent=data["intent"],
+            documents=data["documents"],
+            status=data.get("status", JOB_DISCOVERING),
+            created_at=data.get("created_at"),
+            updated_at=data.get("updated_at"),
+            owner=data.get("owner", ""),
+            heartbeat_at=data.get("heartbeat_at")
+        )
+
+
+class BulkJobManager:
+    """多文档批量任务调度（有界线程池，每个文档使用独立的数据库会话）"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        settings = get_settings()
+        self.ttl = settings.BULK_JOB_TTL_SECONDS
+        self.heartbeat_interval = settings.BULK_JOB_HEARTBEAT_SECONDS
+        self.stale_seconds = settings.BULK_JOB_STALE_SECONDS
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.BULK_JOB_MAX_WORKERS,
+            thread_name_prefix="bulk-job"
+        )
+        self._lock = threading.Lock()
+        self.cache = get_cache_manager()
+
+    def create_job(self, user_id: str, intent: Intent, documents: List[db_models.Document]) -> BulkJob:
+        """创建任务并在后台并发发现 / 预览"""
+        job = BulkJob(
+            job_id=str(uuid.uuid4()),
+            user_id=user_id,
+            owner=self.owner,
+            intent=intent.model_dump(),
+            documents={
+                str(document.doc_id): {
+                    "doc_id": str(document.doc_id),
+                    "title": document.title,
+                    "status": DOC_PENDING
+                }
+                for document in documents
+            }
+        )
+        self._save(job)
+        self._start(self._run_discovery, job)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[BulkJob]:
+        """获取任务；执行中但心跳超时的任务（执行进程已中断）标记为 failed"""
+        data = self.cache.get_bulk_job(job_id)
+        if not data:
+            return None
+        job = BulkJob.from_dict(data)
+        if job.status in JOB_RUNNING_STATUSES and self._is_stalled(job):
+            return self._fail_stalled(job)
+        return job
+
+    def confirm(self, job_id: str, doc_ids: Optional[List[str]] = None) -> Optional[BulkJob]:
+        """
+        确认应用（可只应用部分文档），在后台逐文档应用
+        
+        Returns:
+            任务；任务不处于待确认状态（如已被并发请求确认或取消）时返回 None
+        """
+        if not self.cache.transition_bulk_job(job_id, [JOB_AWAITING_CONFIRM], JOB_APPLYING):
+            return None
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+
+        selected = [
+            doc_id for doc_id, entry in job.documents.items()
+            if entry["status"] == DOC_PREVIEWED and (doc_ids is None or doc_id in doc_ids)
+        ]
+        with self._lock:
+            changed = {}
+            for doc_id, entry in job.documents.items():
+                if entry["status"] != DOC_PREVIEWED:
+                    continue
+                if doc_id in selected:
+                    entry["status"] = DOC_APPLYING
+                else:
+                    entry["status"] = DOC_CANCELLED
+                    self._discard_token(job, entry)
+                changed[doc_id] = entry
+            self.cache.update_bulk_job_documents(job.job_id, changed)
+        self._start(self._run_apply, job, selected)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[BulkJob]:
+        """取消任务，作废所有文档级 token（任务不处于待确认状态时返回 None）"""
+        if not self.cache.transition_bulk_job(job_id, [JOB_AWAITING_CONFIRM], JOB_CANCELLED):
+            return None
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+
+        with self._lock:
+            changed = {}
+            for doc_id, entry in job.documents.items():
+                if entry["status"] == DOC_PREVIEWED:
+                    entry["status"] = DOC_CANCELLED
+                    self._discard_token(job, entry)
+                    changed[doc_id] = entry
+            self.cache.update_bulk_job_documents(job.job_id, changed)
+        return job
+
+    # ============ 后台执行 ============
+
+    def _start(self, target, *args):
+        """编排放在独立线程中，线程池只执行单文档任务，避免编排任务占满线程池"""
+        thread = threading.Thread(target=target, args=args, daemon=True, name=f"bulk-job-{args[0].job_id[:8]}")
+        thread.start()
+
+    def _run_discovery(self, job: BulkJob):
+        """并发发现 / 预览全部文档"""
+        futures = {
+            self._executor.submit(self._preview_document, job, doc_id): doc_id
+            for doc_id in job.documents
+        }
+        for future in self._as_completed(job, futures):
+            doc_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"status": DOC_FAILED, "error": str(e)}
+            bulk_job_documents.labels(stage="preview", status=result["status"]).inc()
+            self._update_document(job, doc_id, result)
+
+        has_changes = any(entry["status"] == DOC_PREVIEWED for entry in job.documents.values())
+        self._transition(job, JOB_DISCOVERING, JOB_AWAITING_CONFIRM if has_changes else JOB_NO_CHANGES)
+
+    def _run_apply(self, job: BulkJob, doc_ids: List[str]):
+        """在有界线程池中逐文档应用"""
+        futures = {
+            self._executor.submit(self._apply_document, job, doc_id): doc_id
+            for doc_id in doc_ids
+        }
+        for future in self._as_completed(job, futures):
+            doc_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"status": DOC_FAILED, "error": str(e)}
+            bulk_job_documents.labels(stage="apply", status=result["status"]).inc()
+            self._update_document(job, doc_id, result)
+
+        failed = any(
+            job.documents[doc_id]["status"] in (DOC_CONFLICT, DOC_FAILED)
+            for doc_id in doc_ids
+        )
+        self._transition(job, JOB_APPLYING, JOB_COMPLETED_WITH_ERRORS if failed else JOB_COMPLETED)
+
+    def _as_completed(self, job: BulkJob, futures):
+        """按完成顺序返回 future，等待期间定期写入心跳"""
+        pending = set(futures)
+        last_heartbeat = 0.0
+        while pending:
+            if time.time() - last_heartbeat >= self.heartbeat_interval:
+                self.cache.heartbeat_bulk_job(job.job_id, self.owner)
+                last_heartbeat = time.time()
+            done, pending = wait(pending, timeout=self.heartbeat_interval, return_when=FIRST_COMPLETED)
+            yield from done
+
+    def _preview_document(self, job: BulkJob, doc_id: str) -> dict:
+        """单文档发现 / 预览，生成文档级 confirm_token"""
+        db = SessionLocal()
+        try:
+            active_rev = db.query(db_models.DocumentActiveRevision).filter(
+                db_models.DocumentActiveRevision.doc_id == uuid.UUID(doc_id)
+            ).first()
+            if not active_rev:
+                return {"status": DOC_FAILED, "error": "文档不存在"}
+
+            intent = Intent(**job.intent)
+            result = BulkEditPipeline(db).preview(intent, doc_id, str(active_rev.rev_id))
+            if not result.preview.total_changes:
+                return {"status": DOC_NO_CHANGES, "total_changes": 0}
+
+            token_id = str(uuid.uuid4())
+            payload = build_confirm_payload(
+                token_id,
+                job.job_id,
+                job.user_id,
+                doc_id,
+                str(active_rev.rev_id),
+                active_rev.version,
+                intent,
+                result,
+                ttl=self.ttl,
+                job_id=job.job_id
+            )
+            self.cache.store_confirm_token(job.job_id, token_id, payload, ttl=self.ttl)
+
+            return {
+                "status": DOC_PREVIEWED,
+                "total_changes": result.preview.total_changes,
+                "estimated_impact": result.preview.estimated_impact,
+                "grouped_by_heading": result.preview.grouped_by_heading,
+                "confirm_token": token_id,
+                "preview_hash": result.preview_hash,
+                "next_cursor": result.next_cursor
+            }
+        except ValueError as e:
+            return {"status": DOC_FAILED, "error": str(e)}
+        finally:
+            db.close()
+
+    def _apply_document(self, job: BulkJob, doc_id: str) -> dict:
+        """单文档应用（独立会话、独立 CAS）"""
+        entry = job.documents[doc_id]
+        payload = self.cache.get_confirm_token(job.job_id, entry.get("confirm_token", ""))
+        if not payload:
+            return {"status": DOC_FAILED, "error": "确认令牌无效或已过期"}
+
+        db = SessionLocal()
+        try:
+            active_rev = db.query(db_models.DocumentActiveRevision).filter(
+                db_models.DocumentActiveRevision.doc_id == uuid.UUID(doc_id)
+            ).first()
+            if not active_rev:
+                return {"status": DOC_FAILED, "error": "文档不存在"}
+            if active_rev.version != payload.get("active_version"):
+                return {"status": DOC_CONFLICT, "error": "文档版本已变更，预览已失效"}
+
+            try:
+                result = BulkEditPipeline(db).apply(
+                    Intent(**payload["intent"]),
+                    doc_id,
+                    str(active_rev.rev_id),
+                    active_rev.version,
+                    user_id=job.user_id,
+                    preview_hash=payload.get("preview_hash"),
+                    expected_changes=payload.get("total_changes", 0),
+                    trace_id=job.job_id
+                )
+            except BulkPreviewMismatchError as e:
+                return {"status": DOC_CONFLICT, "error": str(e)}
+
+            reindex_revision(db, doc_id, result["new_rev_id"])
+            return {
+                "status": DOC_APPLIED,
+                "new_rev_id": result["new_rev_id"],
+                "new_rev_no": result["new_rev_no"],
+                "new_version": result["new_version"],
+                "changes_applied": result["changes_applied"]
+            }
+        finally:
+            self.cache.delete_confirm_token(job.job_id, entry.get("confirm_token", ""))
+            db.close()
+
+    # ============ 状态持久化 ============
+
+    def _update_document(self, job: BulkJob, doc_id: str, result: dict):
+        """只写入该文档的进度字段"""
+        with self._lock:
+            entry = job.documents[doc_id]
+            entry.update(result)
+            self.cache.update_bulk_job_documents(job.job_id, {doc_id: entry})
+
+    def _is_stalled(self, job: BulkJob) -> bool:
+        """心跳与进度都超过 stale_seconds 未更新（状态迁移 / 文档进度也说明进程仍在执行）"""
+        return time.time() - max(job.heartbeat_at, job.updated_at) > self.stale_seconds
+
+    def _fail_stalled(self, job: BulkJob) -> Optional[BulkJob]:
+        """将执行进程已中断的任务标记为 failed，未完成的文档标记为失败并作废其 token"""
+        if not self.cache.transition_bulk_job(job.job_id, [job.status], JOB_FAILED):
+            # 并发查询已处理，或执行进程恰好推进了状态
+            data = self.cache.get_bulk_job(job.job_id)
+            return BulkJob.from_dict(data) if data else None
+
+        with self._lock:
+            changed = {}
+            for doc_id, entry in job.documents.items():
+                if entry["status"] in (DOC_PENDING, DOC_APPLYING):
+                    entry["status"] = DOC_FAILED
+                    entry["error"] = f"执行任务的进程（{job.owner or '未知'}）已中断，请核对文档当前版本后重试"
+                elif entry["status"] == DOC_PREVIEWED:
+                    entry["status"] = DOC_CANCELLED
+                else:
+                    continue
+                self._discard_token(job, entry)
+                changed[doc_id] = entry
+            self.cache.update_bulk_job_documents(job.job_id, changed)
+        print(f"批量任务 {job.job_id} 心跳超时（owner={job.owner}），已标记为失败")
+        job.status = JOB_FAILED
+        return job
+
+    def _transition(self, job: BulkJob, from_status: str, to_status: str):
+        if self.cache.transition_bulk_job(job.job_id, [from_status], to_status):
+            job.status = to_status
+
+    def _discard_token(self, job: BulkJob, entry: dict):
+        if entry.get("confirm_token"):
+            self.cache.delete_confirm_token(job.job_id, entry["confirm_token"])
+
+    def _save(self, job: BulkJob):
+        job.updated_at = time.time()
+        job.heartbeat_at = job.updated_at
+        self.cache.set_bulk_job(job.job_id, job.to_dict(), ttl=self.ttl)
+
+
+# 全局实例
+_bulk_job_manager = None
+
+
+def get_bulk_job_manager() -> BulkJobManager:
+    """获取批量任务管理器单例"""
+    global _bulk_job_manager
+    if _bulk_job_manager is None:
+        _bulk_job_manager = BulkJobManager()
+    return _bulk_job_manager
@@ -1,23 +1,268 @@
 """
 多级缓存管理
 """
-from typing import Optional, Any
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from typing import Optional, Any, Iterable, Tuple
+import hashlib
 import redis
 import json
+import re
+import threading
+import time
+import uuid
 from functools import lru_cache
 from app.config import get_settings
+from app.db.redis_pool import get_redis_client
 from app.models import database as db_models
+from app.monitoring.metrics import cache_invalidations, local_cache_bytes
+from app.services.serialization import dumps_json, get_cache_serializer, loads_json
 
 settings = get_settings()
 
 
+def _normalize_query(query: str) -> str:
+    """查询归一化：小写并折叠空白（保留标点，避免不同查询被合并）"""
+    return re.sub(r"\s+", " ", (query or "").strip().lower())
+
+
+def build_search_cache_key(
+    doc_id: str,
+    rev_id: str,
+    query: str,
+    scope_hint: Any = None,
+    top_k: int = 10,
+    mode: str = "hybrid"
+) -> str:
+    """
+    构建检索结果缓存 key
+    
+    使用 sha256 摘要而非 hash()：hash() 按进程随机化，无法跨 worker 命中。
+    rev_id 不可变，因此同一 revision 内结果可安全复用。
+    """
+    if hasattr(scope_hint, "model_dump"):
+        scope_hint = scope_hint.model_dump()
+    payload = json.dumps(
+        {
+            "query": _normalize_query(query),
+            "scope_hint": scope_hint or None,
+            "top_k": top_k,
+            "mode": mode,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+    return f"search:{doc_id}:{rev_id}:{digest}"
+
+
+def build_llm_cache_key(
+    model: str,
+    messages: list,
+    temperature: float,
+    response_format: Any = None,
+    max_tokens: Optional[int] = None
+) -> str:
+    """
+    构建 LLM 响应缓存 key
+    
+    对 model / messages / temperature / response_format / max_tokens 做 sha256，
+    同一 prompt 在重试、追问时可跨 worker 命中。
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "response_format": response_format or None,
+            "max_tokens": max_tokens,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"llm:{digest}"
+
+
+# 跨 worker 的 L1 失效广播频道
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+# 失效标签：每个标签是一个 Redis ZSET（成员为 key，分数为 key 的过期时间），记录属于该文档 / 版本的 key，
+# 失效时只删除集合中的 key，不再 SCAN 整个 keyspace
+def _search_doc_tag(doc_id: str) -> str:
+    return f"tag:search:{doc_id}"
+
+
+def _search_rev_tag(doc_id: str, rev_id: str) -> str:
+    return f"tag:search:{doc_id}:{rev_id}"
+
+
+def _block_rev_tag(rev_id: str) -> str:
+    return f"tag:block:{rev_id}"
+
+
+# KEYS[1]: 缓存 key，KEYS[2..]: 标签集合；ARGV: ttl, value
+# 每次写入先移除标签中已过期的 key（按 Redis 服务器时间，不受各 worker 时钟偏差影响），
+# 热点文档的标签不会随过期 key 无限增长；
+# 标签集合的过期时间不短于其中任一 key，避免 key 仍在而标签已过期
+_SET_TAGGED_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+local now = tonumber(redis.call('TIME')[1])
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ttl)
+for i = 2, #KEYS do
+  redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', now)
+  redis.call('ZADD', KEYS[i], now + ttl, KEYS[1])
+  if redis.call('TTL', KEYS[i]) < ttl then
+    redis.call('EXPIRE', KEYS[i], ttl)
+  end
+end
+return 1
+"""
+
+# KEYS: 标签集合；删除集合中的全部 key 与标签本身，返回删除的 key 数
+_INVALIDATE_TAGS_SCRIPT = """
+local deleted = 0
+for i = 1, #KEYS do
+  local members = redis.call('ZRANGE', KEYS[i], 0, -1)
+  for j = 1, #members, 500 do
+    deleted = deleted + redis.call('UNLINK', unpack(members, j, math.min(j + 499, #members)))
+  end
+  redis.call('UNLINK', KEYS[i])
+end
+return deleted
+"""
+
+
+# KEYS[1]: 批量任务 hash；ARGV: field1, value1, ...
+# 任务已过期时不写入，避免只剩部分字段的任务
+_UPDATE_BULK_JOB_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+"""
+
+# KEYS[1]: 批量任务 hash；ARGV: 新状态, updated_at, 允许的当前状态...
+# 当前状态属于允许列表时才迁移（确认 / 取消的 compare-and-set）
+_TRANSITION_BULK_JOB_SCRIPT = """
+local status = redis.call('HGET', KEYS[1], 'status')
+if not status then
+  return 0
+end
+for i = 3, #ARGV do
+  if status == ARGV[i] then
+    redis.call('HSET', KEYS[1], 'status', ARGV[1], 'updated_at', ARGV[2])
+    return 1
+  end
+end
+return 0
+"""
+
+
+def _estimate_size(value: Any) -> int:
+    """估算缓存值占用的字节数（按 JSON 序列化长度）"""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    try:
+        return len(dumps_json(value))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class LocalCache:
+    """线程安全的进程内 LRU 缓存（每个条目带过期时间，按条目数和字节数淘汰）"""
+    
+    def __init__(self, max_entries: int, max_bytes: int, max_ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        # key -> (value, expires_at, nbytes)
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, nbytes: Optional[int] = None):
+        """
+        写入缓存
+        
+        Args:
+            ttl: 过期秒数（不超过 max_ttl；None 或非正数时使用 max_ttl）
+            nbytes: 已知的序列化大小，未提供时估算
+        """
+        if nbytes is None:
+            nbytes = _estimate_size(value)
+        if nbytes > self.max_bytes:
+            self.pop(key)
+            return
+        ttl = min(ttl, self.max_ttl) if ttl and ttl > 0 else self.max_ttl
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, nbytes)
+            self._total_bytes += nbytes
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+            local_cache_bytes.set(self._total_bytes)
+    
+    def pop(self, key: str):
+        with self._lock:
+            self._remove(key)
+            local_cache_bytes.set(self._total_bytes)
+    
+    def pop_matching(self, pattern: str) -> int:
+        """删除匹配 glob 模式的 key（与 Redis SCAN MATCH 语法一致）"""
+        with self._lock:
+            keys = [key for key in self._entries if fnmatchcase(key, pattern)]
+            for key in keys:
+                self._remove(key)
+            local_cache_bytes.set(self._total_bytes)
+            return len(keys)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            local_cache_bytes.set(0)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[2]
+
+
 class CacheManager:
     """缓存管理器（Redis + 本地 LRU）"""
     
-    def __init__(self, redis_url: str = None, local_cache_size: int = 1000):
+    def __init__(self, redis_url: str = None, local_cache_size: int = None):
         self.redis_url = redis_url or settings.REDIS_URL
         try:
-            self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
+            # 默认使用进程共享的连接池，只有显式指定其他地址时才单独建连接
+            if redis_url is None:
+                self.redis_client = get_redis_client()
+            else:
+                # 缓存值为二进制编码（见 app/services/serialization.py），不解码响应
+                self.redis_client = redis.from_url(redis_url)
             self.redis_available = True
             # 测试连接
             self.redis_client.ping()
@@ -26,157 +271,270 @@ class CacheManager:
             self.redis_client = None
             self.redis_available = False
         
-        self.local_cache_size = local_cache_size
-        self._local_cache = {}
-    
-    def get_block_version(self, block_id: str, rev_id: str) -> Optional[dict]:
-        """获取块版本（带缓存）"""
-        cache_key = f"block:{block_id}:{rev_id}"
+        self._local_cache = LocalCache(
+            max_entries=local_cache_size or settings.LOCAL_CACHE_MAX_ENTRIES,
+            max_bytes=settings.LOCAL_CACHE_MAX_MB * 1024 * 1024,
+            max_ttl=settings.LOCAL_CACHE_MAX_TTL_SECONDS
+        )
+        # Redis 不可用时批量任务状态的本进程兜底（不受 L1 TTL 与淘汰影响）
+        self._local_jobs = {}
+        self._local_jobs_lock = threading.Lock()
+        self._serializer = get_cache_serializer()
         
-        # L1: 本地缓存
-        if cache_key in self._local_cache:
-            return self._local_cache[cache_key]
+        self._set_tagged_script = None
+        self._invalidate_tags_script = None
+        self._update_bulk_job_script = None
+        self._transition_bulk_job_script = None
+        if self.redis_available:
+            self._set_tagged_script = self.redis_client.register_script(_SET_TAGGED_SCRIPT)
+            self._invalidate_tags_script = self.redis_client.register_script(_INVALIDATE_TAGS_SCRIPT)
+            self._update_bulk_job_script = self.redis_client.register_script(_UPDATE_BULK_JOB_SCRIPT)
+            self._transition_bulk_job_script = self.redis_client.register_script(_TRANSITION_BULK_JOB_SCRIPT)
+        
+        # 失效广播：本 worker 发出的消息带 origin，监听时跳过
+        self._instance_id = uuid.uuid4().hex
+        self._listener_thread = None
+        if self.redis_available and settings.ENABLE_CACHE_INVALIDATION_PUBSUB:
+            self._start_invalidation_listener()
+    
+    # ============ 本地缓存 / 失效广播 ============
+    
+    def _get_cached(self, cache_key: str) -> Optional[Any]:
+        """先读 L1，未命中再读 Redis 并按剩余 TTL 回填 L1"""
+        data = self._local_cache.get(cache_key)
+        if data is not None:
+            return data
         
-        # L2: Redis 缓存
         if self.redis_available:
             try:
-                cached = self.redis_client.get(cache_key)
+                pipe = self.redis_client.pipeline()
+                pipe.get(cache_key)
+                pipe.ttl(cache_key)
+                cached, ttl = pipe.execute()
                 if cached:
-                    data = json.loads(cached)
-                    self._local_cache[cache_key] = data
-                    self._trim_local_cache()
+                    data = self._serializer.loads(cached)
+                    self._local_cache.set(cache_key, data, ttl=ttl, nbytes=len(cached))
                     return data
             except Exception as e:
                 print(f"Redis 读取失败: {e}")
         
         return None
     
-    def set_block_version(self, block_id: str, rev_id: str, data: dict, ttl: int = 3600):
-        """设置块版本缓存"""
-        cache_key = f"block:{block_id}:{rev_id}"
+    def _set_cached(
+        self,
+        cache_key: str,
+        data: Any,
+        ttl: int,
+        publish: bool = False,
+        tags: Iterable[str] = ()
+    ) -> bool:
+        """
+        写入 L1 与 Redis
         
-        # 写入本地缓存
-        self._local_cache[cache_key] = data
-        self._trim_local_cache()
+        publish=True 用于可变的 key（如 active_rev），通知其他 worker 丢弃旧值。
+        tags 为失效标签，key 会被登记到对应集合中（同一次脚本调用，无额外往返）。
+        """
+        serialized = self._serializer.dumps(data)
+        self._local_cache.set(cache_key, data, ttl=ttl, nbytes=len(serialized))
         
-        # 写入 Redis
         if self.redis_available:
             try:
-                self.redis_client.setex(
-                    cache_key,
-                    ttl,
-                    json.dumps(data)
-                )
+                tags = list(tags)
+                if tags:
+                    self._set_tagged_script(keys=[cache_key, *tags], args=[ttl, serialized])
+                else:
+                    self.redis_client.setex(cache_key, ttl, serialized)
             except Exception as e:
                 print(f"Redis 写入失败: {e}")
+                return False
+            if publish:
+                self._publish_invalidation(keys=[cache_key])
+        return True
     
-    def get_active_revision(self, doc_id: str) -> Optional[dict]:
-        """获取当前活跃版本"""
-        cache_key = f"active_rev:{doc_id}"
-        
-        # L1: 本地缓存（短 TTL）
-        if cache_key in self._local_cache:
-            return self._local_cache[cache_key]
-        
-        # L2: Redis 缓存
-        if self.redis_available:
+    def _invalidate_tags(self, tags: Iterable[str]):
+        """删除标签集合中登记的全部 Redis key（O(该文档 / 版本的 key 数)）"""
+        if not self.redis_available:
+            return
+        try:
+            self._invalidate_tags_script(keys=list(tags))
+        except Exception as e:
+            print(f"Redis 删除失败: {e}")
+    
+    def _invalidate(self, keys: Iterable[str] = (), patterns: Iterable[str] = ()):
+        """丢弃本 worker 的 L1 条目并广播给其他 worker"""
+        keys, patterns = list(keys), list(patterns)
+        self._invalidate_local(keys, patterns)
+        cache_invalidations.labels(source="local").inc()
+        self._publish_invalidation(keys, patterns)
+    
+    def _invalidate_local(self, keys: Iterable[str], patterns: Iterable[str]):
+        for key in keys:
+            self._local_cache.pop(key)
+        for pattern in patterns:
+            self._local_cache.pop_matching(pattern)
+    
+    def invalidate_vector_matrices(self, rev_ids: Iterable[str] = (), doc_ids: Iterable[str] = ()):
+        """
+        丢弃所有 worker 进程内的向量矩阵
+
+        rev_ids: embedding 发生变化的 revision；doc_ids: 产生了新 revision 的文档
+        """
+        rev_ids, doc_ids = [str(r) for r in rev_ids], [str(d) for d in doc_ids]
+        self._invalidate_vector_local(rev_ids, doc_ids)
+        self._publish_invalidation(vector_revs=rev_ids, vector_docs=doc_ids)
+    
+    @staticmethod
+    def _invalidate_vector_local(rev_ids: Iterable[str], doc_ids: Iterable[str]):
+        from app.services.vector_cache import get_vector_cache
+
+        vector_cache = get_vector_cache()
+        for rev_id in rev_ids:
+            vector_cache.invalidate(rev_id)
+        for doc_id in doc_ids:
+            vector_cache.invalidate_document(doc_id)
+    
+    def _publish_invalidation(
+        self,
+        keys: Iterable[str] = (),
+        patterns: Iterable[str] = (),
+        vector_revs: Iterable[str] = (),
+        vector_docs: Iterable[str] = ()
+    ):
+        if not (self.redis_available and settings.ENABLE_CACHE_INVALIDATION_PUBSUB):
+            return
+        message = dumps_json({
+            "origin": self._instance_id,
+            "keys": list(keys),
+            "patterns": list(patterns),
+            "vector_revs": list(vector_revs),
+            "vector_docs": list(vector_docs),
+        })
+        try:
+            self.redis_client.publish(INVALIDATION_CHANNEL, message)
+        except Exception as e:
+            print(f"缓存失效广播失败: {e}")
+    
+    def _start_invalidation_listener(self):
+        self._listener_thread = threading.Thread(
+            target=self._listen_invalidations,
+            daemon=True,
+            name="cache-invalidation"
+        )
+        self._listener_thread.start()
+    
+    def _listen_invalidations(self):
+        """订阅失效频道；断线重连后清空 L1（断线期间可能错过失效消息）"""
+        connected_before = False
+        while True:
+            pubsub = None
             try:
-                cached = self.redis_client.get(cache_key)
-                if cached:
-                    data = json.loads(cached)
-                    self._local_cache[cache_key] = data
-                    return data
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                if connected_before:
+                    from app.services.vector_cache import get_vector_cache
+
+                    self._local_cache.clear()
+                    get_vector_cache().clear()
+                    cache_invalidations.labels(source="resync").inc()
+                connected_before = True
+                for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        payload = loads_json(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    if payload.get("origin") == self._instance_id:
+                        continue
+                    self._invalidate_local(payload.get("keys", []), payload.get("patterns", []))
+                    if payload.get("vector_revs") or payload.get("vector_docs"):
+                        self._invalidate_vector_local(payload.get("vector_revs", []), payload.get("vector_docs", []))
+                    cache_invalidations.labels(source="remote").inc()
             except Exception as e:
-                print(f"Redis 读取失败: {e}")
-        
-        return None
+                print(f"缓存失效订阅中断，1 秒后重连: {e}")
+                time.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+    
+    def get_block_version(self, block_id: str, rev_id: str) -> Optional[dict]:
+        """获取块版本（带缓存）"""
+        return self._get_cached(f"block:{block_id}:{rev_id}")
+    
+    def set_block_version(self, block_id: str, rev_id: str, data: dict, ttl: int = 3600):
+        """设置块版本缓存（block_id + rev_id 对应的内容不变，无需广播）"""
+        self._set_cached(f"block:{block_id}:{rev_id}", data, ttl, tags=[_block_rev_tag(rev_id)])
+    
+    def get_active_revision(self, doc_id: str) -> Optional[dict]:
+        """获取当前活跃版本"""
+        # L1 条目按 Redis 剩余 TTL 过期
+        return self._get_cached(f"active_rev:{doc_id}")
     
     def set_active_revision(self, doc_id: str, data: dict, ttl: int = 300):
-        """设置当前活跃版本缓存（5分钟 TTL）"""
-        cache_key = f"active_rev:{doc_id}"
-        
-        # 写入本地缓存
-        self._local_cache[cache_key] = data
-        self._trim_local_cache()
-        
-        # 写入 Redis
-        if self.redis_available:
-            try:
-                self.redis_client.setex(
-                    cache_key,
-                    ttl,
-                    json.dumps(data)
-                )
-            except Exception as e:
-                print(f"Redis 写入失败: {e}")
+        """设置当前活跃版本缓存（5分钟 TTL，值会变化，通知其他 worker）"""
+        self._set_cached(f"active_rev:{doc_id}", data, ttl, publish=True)
     
     def invalidate_revision(self, rev_id: str):
         """失效某个版本的所有缓存"""
-        # 清空本地缓存（简化处理）
-        self._local_cache.clear()
+        self._invalidate(patterns=[f"block:*:{rev_id}"])
         
         # 删除 Redis 中该 revision 的所有 blocks
-        if self.redis_available:
-            try:
-                pattern = f"block:*:{rev_id}"
-                keys = []
-                for key in self.redis_client.scan_iter(match=pattern):
-                    keys.append(key)
-                
-                if keys:
-                    self.redis_client.delete(*keys)
-            except Exception as e:
-                print(f"Redis 删除失败: {e}")
+        self._invalidate_tags([_block_rev_tag(rev_id)])
     
     def invalidate_document(self, doc_id: str):
         """失效某个文档的所有缓存"""
-        # 清空本地缓存
-        self._local_cache.clear()
+        self._invalidate(keys=[f"active_rev:{doc_id}"], patterns=[f"search:{doc_id}:*"])
         
         # 删除 Redis 中该文档的缓存
         if self.redis_available:
             try:
                 # 删除 active_revision
                 self.redis_client.delete(f"active_rev:{doc_id}")
-                
-                # 删除搜索结果缓存
-                pattern = f"search:{doc_id}:*"
-                keys = []
-                for key in self.redis_client.scan_iter(match=pattern):
-                    keys.append(key)
-                
-                if keys:
-                    self.redis_client.delete(*keys)
             except Exception as e:
                 print(f"Redis 删除失败: {e}")
+            
+            # 删除搜索结果缓存
+            self._invalidate_tags([_search_doc_tag(doc_id)])
     
-    def get_search_results(self, doc_id: str, query: str, rev_id: str) -> Optional[list]:
-        """获取搜索结果缓存"""
-        cache_key = f"search:{doc_id}:{rev_id}:{hash(query)}"
-        
-        if self.redis_available:
-            try:
-                cached = self.redis_client.get(cache_key)
-                if cached:
-                    return json.loads(cached)
-            except Exception as e:
-                print(f"Redis 读取失败: {e}")
-        
-        return None
+    def get_search_results(
+        self,
+        doc_id: str,
+        rev_id: str,
+        query: str,
+        scope_hint: Any = None,
+        top_k: int = 10,
+        mode: str = "hybrid"
+    ) -> Optional[list]:
+        """获取检索结果缓存"""
+        return self._get_cached(build_search_cache_key(doc_id, rev_id, query, scope_hint, top_k, mode))
     
-    def set_search_results(self, doc_id: str, query: str, rev_id: str, results: list, ttl: int = 600):
-        """设置搜索结果缓存（10分钟 TTL）"""
-        cache_key = f"search:{doc_id}:{rev_id}:{hash(query)}"
-        
-        if self.redis_available:
-            try:
-                self.redis_client.setex(
-                    cache_key,
-                    ttl,
-                    json.dumps(results)
-                )
-            except Exception as e:
-                print(f"Redis 写入失败: {e}")
+    def set_search_results(
+        self,
+        doc_id: str,
+        rev_id: str,
+        query: str,
+        results: list,
+        scope_hint: Any = None,
+        top_k: int = 10,
+        mode: str = "hybrid",
+        ttl: int = 600
+    ):
+        """设置检索结果缓存（默认 10 分钟 TTL）"""
+        cache_key = build_search_cache_key(doc_id, rev_id, query, scope_hint, top_k, mode)
+        self._set_cached(
+            cache_key,
+            results,
+            ttl,
+            tags=[_search_doc_tag(doc_id), _search_rev_tag(doc_id, rev_id)]
+        )
+    
+    def invalidate_search_results(self, doc_id: str, rev_id: str):
+        """失效某个版本的检索结果缓存（如该版本 embedding 生成完成后）"""
+        self._invalidate(patterns=[f"search:{doc_id}:{rev_id}:*"])
+        self._invalidate_tags([_search_rev_tag(doc_id, rev_id)])
     
     def store_confirm_token(self, session_id: str, token_id: str, payload: dict, ttl: int = 900):
         """存储确认 token（15分钟 TTL）"""
@@ -187,7 +545,7 @@ class CacheManager:
                 self.redis_client.setex(
                     cache_key,
                     ttl,
-                    json.dumps(payload)
+                    self._serializer.dumps(payload)
                 )
                 return True
             except Exception as e:
@@ -204,7 +562,7 @@ class CacheManager:
             try:
                 cached = self.redis_client.get(cache_key)
                 if cached:
-                    return json.loads(cached)
+                    return self._serializer.loads(cached)
             except Exception as e:
                 print(f"Redis 读取失败: {e}")
         
@@ -220,51 +578,231 @@ class CacheManager:
             except Exception as e:
                 print(f"Redis 删除失败: {e}")
 
-    def get_working_memory(self, session_id: str) -> Optional[dict]:
-        """获取会话工作记忆"""
-        cache_key = f"working_memory:{session_id}"
-
-        if cache_key in self._local_cache:
-            return self._local_cache[cache_key]
-
+    def store_workflow_checkpoint(self, session_id: str, payload: dict, ttl: int = 900) -> bool:
+        """保存工作流检查点（跨 worker 恢复，只写 Redis）"""
+        cache_key = f"workflow_checkpoint:{session_id}"
+        
+        if self.redis_available:
+            try:
+                self.redis_client.setex(cache_key, ttl, self._serializer.dumps(payload))
+                return True
+            except Exception as e:
+                print(f"Redis 写入失败: {e}")
+        
+        return False
+    
+    def pop_workflow_checkpoint(self, session_id: str) -> Optional[dict]:
+        """取出并删除工作流检查点（一次性使用）"""
+        cache_key = f"workflow_checkpoint:{session_id}"
+        
+        if self.redis_available:
+            try:
+                pipe = self.redis_client.pipeline()
+                pipe.get(cache_key)
+                pipe.delete(cache_key)
+                cached, _ = pipe.execute()
+                if cached:
+                    return self._serializer.loads(cached)
+            except Exception as e:
+                print(f"Redis 读取失败: {e}")
+        
+        return None
+    
+    def get_export(self, rev_id: str) -> Optional[str]:
+        """获取 revision 导出的 Markdown（revision 不可变，无需失效）"""
+        cache_key = f"export:{rev_id}"
+        
         if self.redis_available:
             try:
                 cached = self.redis_client.get(cache_key)
                 if cached:
-                    data = json.loads(cached)
-                    self._local_cache[cache_key] = data
-                    self._trim_local_cache()
-                    return data
+                    return self._serializer.loads(cached, text=True)
             except Exception as e:
                 print(f"Redis 读取失败: {e}")
-
+        
         return None
+    
+    def set_export(self, rev_id: str, content: str, ttl: int = 3600):
+        """缓存 revision 导出的 Markdown（只写 Redis，避免大文档占用本地缓存；大文档会被压缩）"""
+        cache_key = f"export:{rev_id}"
+        
+        if self.redis_available:
+            try:
+                self.redis_client.setex(cache_key, ttl, self._serializer.dumps(content))
+            except Exception as e:
+                print(f"Redis 写入失败: {e}")
+    
+    def set_bulk_job(self, job_id: str, payload: dict, ttl: int = 86400) -> bool:
+        """
+        保存批量任务（Redis 不可用时仅保存在本进程）
+        
+        任务以 hash 存储：status / updated_at 为独立字段（状态迁移用 CAS 脚本），
+        owner / heartbeat_at 记录执行任务的进程与心跳，
+        任务信息存入 meta，每个文档的进度存入 doc:{doc_id}，并行的 worker 只更新各自文档的字段。
+        """
+        cache_key = f"bulk_job:{job_id}"
+        payload = {key: value for key, value in payload.items() if key != "progress"}
+        documents = payload.pop("documents", {})
+        status = payload.pop("status")
+        updated_at = payload.pop("updated_at", time.time())
+        owner = payload.pop("owner", "")
+        heartbeat_at = payload.pop("heartbeat_at", updated_at)
 
-    def set_working_memory(self, session_id: str, payload: dict, ttl: int = 86400) -> bool:
-        """设置会话工作记忆"""
-        cache_key = f"working_memory:{session_id}"
+        if self.redis_available:
+            fields = {
+                "status": status,
+                "updated_at": repr(updated_at),
+                "owner": owner,
+                "heartbeat_at": repr(heartbeat_at),
+                "meta": self._serializer.dumps(payload),
+            }
+            for doc_id, entry in documents.items():
+                fields[f"doc:{doc_id}"] = self._serializer.dumps(entry)
+            try:
+                pipe = self.redis_client.pipeline()
+                pipe.delete(cache_key)
+                pipe.hset(cache_key, mapping=fields)
+                pipe.expire(cache_key, ttl)
+                pipe.execute()
+                self._local_jobs.pop(cache_key, None)
+                return True
+            except Exception as e:
+                print(f"Redis 写入失败: {e}")
+
+        with self._local_jobs_lock:
+            self._local_jobs[cache_key] = {
+                **payload,
+                "status": status,
+                "updated_at": updated_at,
+                "owner": owner,
+                "heartbeat_at": heartbeat_at,
+                "documents": {doc_id: dict(entry) for doc_id, entry in documents.items()},
+            }
+        return not self.redis_available
 
-        self._local_cache[cache_key] = payload
-        self._trim_local_cache()
+    def update_bulk_job_documents(self, job_id: str, documents: dict) -> bool:
+        """只更新指定文档的进度字段（不覆盖其他 worker 写入的文档进度）"""
+        cache_key = f"bulk_job:{job_id}"
+        updated_at = time.time()
+
+        with self._local_jobs_lock:
+            local = self._local_jobs.get(cache_key)
+            if local is not None:
+                for doc_id, entry in documents.items():
+                    local["documents"][doc_id] = dict(entry)
+                local["updated_at"] = updated_at
+                return True
 
         if self.redis_available:
+            fields = {f"doc:{doc_id}": self._serializer.dumps(entry) for doc_id, entry in documents.items()}
+            fields["updated_at"] = repr(updated_at)
             try:
-                self.redis_client.setex(
-                    cache_key,
-                    ttl,
-                    json.dumps(payload)
-                )
+                self._update_bulk_job_script(keys=[cache_key], args=self._flatten(fields))
                 return True
             except Exception as e:
                 print(f"Redis 写入失败: {e}")
-                return False
 
-        return True
+        return False
+
+    def heartbeat_bulk_job(self, job_id: str, owner: str) -> bool:
+        """写入执行任务的进程标识与心跳时间（任务已过期时不写入）"""
+        cache_key = f"bulk_job:{job_id}"
+        heartbeat_at = time.time()
+
+        with self._local_jobs_lock:
+            local = self._local_jobs.get(cache_key)
+            if local is not None:
+                local["owner"] = owner
+                local["heartbeat_at"] = heartbeat_at
+                return True
+
+        if self.redis_available:
+            fields = {"owner": owner, "heartbeat_at": repr(heartbeat_at)}
+            try:
+                return bool(self._update_bulk_job_script(keys=[cache_key], args=self._flatten(fields)))
+            except Exception as e:
+                print(f"Redis 写入失败: {e}")
+
+        return False
+
+    def transition_bulk_job(self, job_id: str, from_statuses: Iterable[str], to_status: str) -> bool:
+        """
+        原子地迁移批量任务状态（当前状态属于 from_statuses 时才更新）
+        
+        Returns:
+            是否迁移成功；并发确认 / 取消时只有一个请求成功
+        """
+        cache_key = f"bulk_job:{job_id}"
+        from_statuses = list(from_statuses)
+        updated_at = time.time()
+
+        with self._local_jobs_lock:
+            local = self._local_jobs.get(cache_key)
+            if local is not None:
+                if local["status"] not in from_statuses:
+                    return False
+                local["status"] = to_status
+                local["updated_at"] = updated_at
+                return True
+
+        if self.redis_available:
+            try:
+                return bool(self._transition_bulk_job_script(
+                    keys=[cache_key],
+                    args=[to_status, repr(updated_at), *from_statuses]
+                ))
+            except Exception as e:
+                print(f"Redis 写入失败: {e}")
+
+        return False
+
+    def get_bulk_job(self, job_id: str) -> Optional[dict]:
+        """获取批量任务状态（优先读 Redis，其他 worker 的进度也可见）"""
+        cache_key = f"bulk_job:{job_id}"
+
+        if self.redis_available:
+            try:
+                fields = self.redis_client.hgetall(cache_key)
+                if fields:
+                    data = self._serializer.loads(fields[b"meta"])
+                    data["status"] = fields[b"status"].decode("utf-8")
+                    data["updated_at"] = float(fields[b"updated_at"])
+                    data["owner"] = fields.get(b"owner", b"").decode("utf-8")
+                    data["heartbeat_at"] = float(fields.get(b"heartbeat_at", fields[b"updated_at"]))
+                    data["documents"] = {
+                        key[len(b"doc:"):].decode("utf-8"): self._serializer.loads(value)
+                        for key, value in fields.items()
+                        if key.startswith(b"doc:")
+                    }
+                    return data
+            except Exception as e:
+                print(f"Redis 读取失败: {e}")
+
+        with self._local_jobs_lock:
+            local = self._local_jobs.get(cache_key)
+            if local is None:
+                return None
+            return {
+                **local,
+                "documents": {doc_id: dict(entry) for doc_id, entry in local["documents"].items()},
+            }
+
+    @staticmethod
+    def _flatten(fields: dict) -> list:
+        return [item for pair in fields.items() for item in pair]
+
+    def get_working_memory(self, session_id: str) -> Optional[dict]:
+        """获取会话工作记忆"""
+        return self._get_cached(f"working_memory:{session_id}")
+
+    def set_working_memory(self, session_id: str, payload: dict, ttl: int = 86400) -> bool:
+        """设置会话工作记忆（通知其他 worker 丢弃旧值）"""
+        return self._set_cached(f"working_memory:{session_id}", payload, ttl, publish=True)
 
     def delete_working_memory(self, session_id: str):
         """删除会话工作记忆"""
         cache_key = f"working_memory:{session_id}"
-        self._local_cache.pop(cache_key, None)
+        self._invalidate(keys=[cache_key])
 
         if self.redis_available:
             try:
@@ -272,22 +810,51 @@ class CacheManager:
             except Exception as e:
                 print(f"Redis 删除失败: {e}")
     
-    def _trim_local_cache(self):
-        """修剪本地缓存"""
-        if len(self._local_cache) > self.local_cache_size:
-            # 简单的 FIFO 策略
-            keys_to_remove = list(self._local_cache.keys())[:len(self._local_cache) - self.local_cache_size]
-            for key in keys_to_remove:
-                del self._local_cache[key]
+    def get_llm_response(self, cache_key: str) -> Optional[str]:
+        """获取 LLM 响应缓存"""
+        # L1: 本地缓存（key 由 prompt 摘要决定，内容不变，无需广播失效）
+        content = self._local_cache.get(cache_key)
+        if content is not None:
+            return content
+        
+        # L2: Redis 缓存
+        if self.redis_available:
+            try:
+                pipe = self.redis_client.pipeline()
+                pipe.get(cache_key)
+                pipe.ttl(cache_key)
+                cached, ttl = pipe.execute()
+                if cached is not None:
+                    content = self._serializer.loads(cached, text=True)
+                    self._local_cache.set(cache_key, content, ttl=ttl, nbytes=len(cached))
+                    return content
+            except Exception as e:
+                print(f"Redis 读取失败: {e}")
+        
+        return None
+    
+    def set_llm_response(self, cache_key: str, content: str, ttl: int = 3600):
+        """设置 LLM 响应缓存"""
+        serialized = self._serializer.dumps(content)
+        self._local_cache.set(cache_key, content, ttl=ttl, nbytes=len(serialized))
+        
+        if self.redis_available:
+            try:
+                self.redis_client.setex(cache_key, ttl, serialized)
+            except Exception as e:
+                print(f"Redis 写入失败: {e}")
 
 
 # 全局实例
 _cache_manager = None
+_cache_manager_lock = threading.Lock()
 
 
 def get_cache_manager() -> CacheManager:
     """获取缓存管理器单例"""
     global _cache_manager
     if _cache_manager is None:
-        _cache_manager = CacheManager()
+        with _cache_manager_lock:
+            if _cache_manager is None:
+                _cache_manager = CacheManager()
     return _cache_manager
@@ -2,7 +2,6 @@
 协同编辑服务
 使用 Redis + WebSocket 实现多人实时协同编辑
 """
-import json
 import time
 from typing import Dict, Set, Optional, Any
 from datetime import datetime
@@ -10,6 +9,8 @@ import redis.asyncio as redis
 from fastapi import WebSocket
 import logging
 
+from app.services.serialization import dumps_json, loads_json
+
 logger = logging.getLogger(__name__)
 
 
@@ -110,16 +111,17 @@ class CollaborationManager:
         message: Dict[str, Any],
         exclude: Optional[WebSocket] = None
     ):
-        """向文档的所有连接广播消息"""
+        """向文档的所有连接广播消息（只编码一次，所有连接复用同一文本帧）"""
         if doc_id not in self.active_connections:
             return
         
+        payload = dumps_json(message).decode("utf-8")
         disconnected = []
         for connection in self.active_connections[doc_id]:
             if connection == exclude:
                 continue
             try:
-                await connection.send_json(message)
+                await connection.send_text(payload)
             except Exception as e:
                 logger.error(f"Error broadcasting to connection: {e}")
                 disconnected.append(connection)
@@ -170,7 +172,7 @@ class CollaborationManager:
         
         users = []
         for user_id, data in users_data.items():
-            user_info = json.loads(data)
+            user_info = loads_json(data)
             users.append(user_info)
         
         return users
@@ -178,7 +180,7 @@ class CollaborationManager:
     async def _add_online_user(self, doc_id: str, user_id: str, username: str):
         """在 Redis 中添加在线用户"""
         key = f"doc:{doc_id}:online_users"
-        user_data = json.dumps({
+        user_data = dumps_json({
             "user_id": user_id,
             "username": username,
             "connected_at": datetime.utcnow().isoformat()
@@ -194,7 +196,7 @@ class CollaborationManager:
     async def _store_edit_event(self, doc_id: str, event: Dict[str, Any]):
         """存储编辑事件到 Redis（用于离线同步）"""
         key = f"doc:{doc_id}:edit_events"
-        await self.redis.lpush(key, json.dumps(event))
+        await self.redis.lpush(key, dumps_json(event))
         await self.redis.ltrim(key, 0, 99)  # 只保留最近 100 个事件
         await self.redis.expire(key, 3600)  # 1 小时过期
     
@@ -205,7 +207,7 @@ class CollaborationManager:
         
         events = []
         for data in events_data:
-            events.append(json.loads(data))
+            events.append(loads_json(data))
         
         return events
     
@@ -231,11 +233,11 @@ class CollaborationManager:
         key = f"doc:{doc_id}:block:{block_id}:lock"
         # 只有锁的持有者才能释放
         current_owner = await self.redis.get(key)
-        if current_owner and current_owner.decode() == user_id:
+        if current_owner and current_owner == user_id:
             await self.redis.delete(key)
     
     async def get_edit_lock_owner(self, doc_id: str, block_id: str) -> Optional[str]:
         """获取块编辑锁的持有者"""
         key = f"doc:{doc_id}:block:{block_id}:lock"
         owner = await self.redis.get(key)
-        return owner.decode() if owner else None
+        return owner if owner else None
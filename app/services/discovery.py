@@ -0,0 +1,233 @@
+"""
+数据库侧批量发现
+
+在 revision 的完整 plain_text 上执行 LIKE / 正则匹配（pg_trgm GIN 索引加速），
+一次查询返回匹配块及父级标题，匹配位置在 Python 中对命中块计算。
+按 order_index 游标分页，批量修改的匹配数量不受单次查询大小限制。
+"""
+from typing import List, Optional, Tuple
+import re
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.schemas import BlockCandidate
+from app.monitoring.metrics import db_query_duration, track_time
+from app.services.scope_filter import ResolvedScope
+
+
+def _escape_like(value: str) -> str:
+    """转义 LIKE 通配符"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Python re 与 PostgreSQL（ARE）语义不一致的写法：(?...) 扩展语法、字母 / 数字转义
+# （\b 在 ARE 中是退格，括号表达式中的 \d 含义不同）、POSIX 字符类、{,n} 与非贪婪量词
+_NON_PORTABLE_REGEX = re.compile(r"\(\?|\\[A-Za-z0-9]|\[\[:|\{,|[*+?}]\?")
+
+
+def is_portable_regex(pattern: str) -> bool:
+    """
+    正则在 Python re 与 PostgreSQL ~ / regexp_replace 中是否语义一致
+
+    除 _NON_PORTABLE_REGEX 外，还拒绝与换行相关的写法：ARE 中 . 和取反字符类 [^...] 匹配换行，
+    Python 默认不匹配；^ / $ 的锚定规则也不同。
+    """
+    if not pattern or _NON_PORTABLE_REGEX.search(pattern):
+        return False
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if in_class:
+            if char == "]":
+                in_class = False
+        elif char == "[":
+            in_class = True
+            if pattern[i + 1:i + 2] == "^":
+                return False
+            if pattern[i + 1:i + 2] == "]":
+                # 紧跟 [ 的 ] 是字面字符
+                i += 1
+        elif char in ".^$":
+            return False
+        i += 1
+    return True
+
+
+class DiscoveryMatch:
+    """单个匹配块"""
+
+    def __init__(
+        self,
+        block_id: str,
+        order_index: int,
+        block_type: str,
+        plain_text: str,
+        heading_context: Optional[str],
+        offsets: List[Tuple[int, int]]
+    ):
+        self.block_id = block_id
+        self.order_index = order_index
+        self.block_type = block_type
+        self.plain_text = plain_text
+        self.heading_context = heading_context
+        self.offsets = offsets
+
+    def to_candidate(self, snippet_length: int = 200) -> BlockCandidate:
+        """转换为 BlockCandidate，snippet 以第一处匹配为中心"""
+        start = 0
+        if self.offsets:
+            start = max(0, self.offsets[0][0] - snippet_length // 4)
+        return BlockCandidate(
+            block_id=self.block_id,
+            snippet=self.plain_text[start:start + snippet_length],
+            heading_context=self.heading_context or "（无标题）",
+            order_index=self.order_index,
+            score=1.0,
+            block_type=self.block_type
+        )
+
+
+class DiscoveryPage:
+    """一页匹配结果"""
+
+    def __init__(self, matches: List[DiscoveryMatch], next_cursor: Optional[int] = None):
+        self.matches = matches
+        # 下一页的起点（本页最后一行的 order_index），None 表示已到末尾
+        self.next_cursor = next_cursor
+
+
+class DiscoveryEngine:
+    """数据库侧发现引擎"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def find_exact(
+        self,
+        rev_id: str,
+        term: str,
+        scope: Optional[ResolvedScope] = None,
+        after_order_index: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> DiscoveryPage:
+        """精确词匹配（LIKE，pg_trgm 索引）"""
+        if not term:
+            return DiscoveryPage([])
+        rows = self._query(
+            rev_id,
+            "bv.plain_text LIKE :like_pattern ESCAPE '\\'",
+            {"like_pattern": f"%{_escape_like(term)}%"},
+            scope,
+            after_order_index,
+            limit
+        )
+        pattern = re.compile(re.escape(term))
+        return self._to_page(rows, pattern, limit)
+
+    def find_regex(
+        self,
+        rev_id: str,
+        pattern_str: str,
+        scope: Optional[ResolvedScope] = None,
+        after_order_index: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> DiscoveryPage:
+        """
+        正则匹配（PostgreSQL ~，pg_trgm 索引）
+
+        数据库按 POSIX 正则预筛，再用 Python re 计算位置并复核，
+        与预览/应用阶段使用的 Python 正则语义保持一致。
+        两者语义可能不同的模式不下推（预筛会漏掉 Python 能匹配的块），直接在 Python 中扫描范围内的块。
+        """
+        if not pattern_str:
+            return DiscoveryPage([])
+        try:
+            pattern = re.compile(pattern_str)
+        except re.error as e:
+            print(f"正则表达式错误: {e}")
+            return DiscoveryPage([])
+
+        if not is_portable_regex(pattern_str):
+            rows = self._query(rev_id, "TRUE", {}, scope, after_order_index, limit)
+            return self._to_page(rows, pattern, limit)
+
+        try:
+            rows = self._query(
+                rev_id, "bv.plain_text ~ :regex", {"regex": pattern_str}, scope, after_order_index, limit
+            )
+        except Exception as e:
+            # PostgreSQL 不支持的正则语法：回退为拉取范围内全部块，在 Python 中匹配
+            print(f"数据库正则匹配失败，回退到 Python 匹配: {e}")
+            self.db.rollback()
+            rows = self._query(rev_id, "TRUE", {}, scope, after_order_index, limit)
+        return self._to_page(rows, pattern, limit)
+
+    @track_time(db_query_duration, {"operation": "bulk_discovery"})
+    def _query(
+        self,
+        rev_id: str,
+        condition: str,
+        params: dict,
+        scope: Optional[ResolvedScope],
+        after_order_index: Optional[int] = None,
+        limit: Optional[int] = None
+    ):
+        """一次查询取回匹配块及父级标题"""
+        scope_conditions = scope.sql_conditions("bv") if scope else ""
+        params = {"rev_id": uuid.UUID(rev_id), **params}
+        cursor_condition = ""
+        if after_order_index is not None:
+            cursor_condition = "AND bv.order_index > :after_order_index"
+            params["after_order_index"] = after_order_index
+        limit_clause = ""
+        if limit:
+            limit_clause = "LIMIT :limit"
+            params["limit"] = limit
+        sql = f"""
+            SELECT
+                bv.block_id,
+                bv.order_index,
+                bv.block_type,
+                bv.plain_text,
+                parent.plain_text AS parent_heading
+            FROM block_versions bv
+            LEFT JOIN block_versions parent
+                ON parent.block_id = bv.parent_heading_block_id
+                AND parent.rev_id = bv.rev_id
+            WHERE bv.rev_id = :rev_id
+                AND {condition}
+                {scope_conditions}
+                {cursor_condition}
+            ORDER BY bv.order_index
+            {limit_clause}
+        """
+        return self.db.execute(text(sql), params).fetchall()
+
+    def _to_page(self, rows, pattern: "re.Pattern", limit: Optional[int]) -> DiscoveryPage:
+        """组装分页结果（游标取自数据库行，不受 Python 复核丢弃的影响）"""
+        next_cursor = rows[-1].order_index if limit and len(rows) >= limit else None
+        return DiscoveryPage(self._with_offsets(rows, pattern), next_cursor)
+
+    def _with_offsets(self, rows, pattern: "re.Pattern") -> List[DiscoveryMatch]:
+        """计算匹配位置，丢弃 Python 正则复核未命中的块"""
+        matches = []
+        for row in rows:
+            plain_text = row.plain_text or ""
+            offsets = [(m.start(), m.end()) for m in pattern.finditer(plain_text) if m.end() > m.start()]
+            if not offsets:
+                continue
+            matches.append(DiscoveryMatch(
+                block_id=str(row.block_id),
+                order_index=row.order_index,
+                block_type=row.block_type,
+                plain_text=plain_text,
+                heading_context=row.parent_heading,
+                offsets=offsets
+            ))
+        return matches
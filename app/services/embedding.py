@@ -4,6 +4,7 @@ Embedding 生成服务
 from typing import List
 from openai import OpenAI
 from app.config import get_settings
+from app.services.rate_limiter import get_rate_limiter
 
 settings = get_settings()
 
@@ -25,10 +26,11 @@ class EmbeddingService:
         text = self._truncate_text(text, max_length=8000)
         
         try:
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=text
-            )
+            with get_rate_limiter().acquire(self.model):
+                response = self.client.embeddings.create(
+                    model=self.model,
+                    input=text
+                )
             return response.data[0].embedding
         except Exception as e:
             print(f"Embedding 生成失败: {e}")
@@ -48,10 +50,11 @@ class EmbeddingService:
             batch = [self._truncate_text(t, max_length=8000) for t in batch]
             
             try:
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=batch
-                )
+                with get_rate_limiter().acquire(self.model):
+                    response = self.client.embeddings.create(
+                        model=self.model,
+                        input=batch
+                    )
                 batch_embeddings = [data.embedding for data in response.data]
                 embeddings.extend(batch_embeddings)
             except Exception as e:
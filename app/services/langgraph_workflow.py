@@ -4,7 +4,9 @@ LangGraph 工作流 - 基于 LangGraph 的文档编辑工作流
 from typing import Dict, Any, TypedDict, Literal, Optional, List
 from langgraph.graph import StateGraph, END
 from sqlalchemy.orm import Session
+from app.db.connection import bind_session, request_session
 from app.monitoring.metrics import workflow_duration, workflow_runs_total
+import threading
 import time
 
 from app.agents.retrieval_agent import create_retrieval_agent
@@ -62,13 +64,43 @@ class WorkflowState(TypedDict, total=False):
 
 
 
+# ============ Node Components ============
+
+# 智能体与节点进程内只构建一次，db 使用 request_session（执行时通过 bind_session 绑定本次请求的会话）
+_components: Optional[Dict[str, Any]] = None
+_components_lock = threading.Lock()
+
+
+def _get_components() -> Dict[str, Any]:
+    """获取进程内共享的智能体与编辑节点"""
+    global _components
+    if _components is None:
+        with _components_lock:
+            if _components is None:
+                from app.agents.intent_agent import create_intent_agent
+                from app.agents.router_agent import create_router_agent
+                from app.agents.clarify_agent import create_clarify_agent
+                from app.nodes.planner import EditPlannerNode
+                from app.nodes.preview import PreviewGeneratorNode
+                from app.nodes.apply import ApplyEditsNode
+
+                _components = {
+                    "intent_agent": create_intent_agent(request_session),
+                    "router_agent": create_router_agent(request_session),
+                    "clarify_agent": create_clarify_agent(request_session),
+                    "retrieval_agent": create_retrieval_agent(request_session),
+                    "planner": EditPlannerNode(request_session),
+                    "preview_generator": PreviewGeneratorNode(request_session, None),
+                    "apply_node": ApplyEditsNode(request_session),
+                }
+    return _components
+
+
 # ============ Node Functions ============
 
-def intent_node(state: WorkflowState, db: Session) -> WorkflowState:
+def intent_node(state: WorkflowState) -> WorkflowState:
     """意图解析节点"""
-    from app.agents.intent_agent import create_intent_agent
-    
-    agent = create_intent_agent(db)
+    agent = _get_components()["intent_agent"]
     result = agent.invoke(state)
     
     # 更新状态而不是替换
@@ -76,11 +108,9 @@ def intent_node(state: WorkflowState, db: Session) -> WorkflowState:
     return state
 
 
-def router_node(state: WorkflowState, db: Session) -> WorkflowState:
+def router_node(state: WorkflowState) -> WorkflowState:
     """路由决策节点"""
-    from app.agents.router_agent import create_router_agent
-    
-    agent = create_router_agent(db)
+    agent = _get_components()["router_agent"]
     result = agent.invoke(state)
     
     # 更新状态而不是替换
@@ -88,11 +118,9 @@ def router_node(state: WorkflowState, db: Session) -> WorkflowState:
     return state
 
 
-def clarify_node(state: WorkflowState, db: Session) -> WorkflowState:
+def clarify_node(state: WorkflowState) -> WorkflowState:
     """澄清确认节点"""
-    from app.agents.clarify_agent import create_clarify_agent
-    
-    agent = create_clarify_agent(db)
+    agent = _get_components()["clarify_agent"]
     result = agent.invoke(state)
     
     # 更新状态而不是替换
@@ -100,9 +128,9 @@ def clarify_node(state: WorkflowState, db: Session) -> WorkflowState:
     return state
 
 
-def retrieval_node(state: WorkflowState, db: Session) -> WorkflowState:
+def retrieval_node(state: WorkflowState) -> WorkflowState:
     """检索定位节点"""
-    agent = create_retrieval_agent(db)
+    agent = _get_components()["retrieval_agent"]
     result = agent.invoke(state)
     
     # 调试：打印结果
@@ -121,11 +149,9 @@ def retrieval_node(state: WorkflowState, db: Session) -> WorkflowState:
     return state
 
 
-def edit_node(state: WorkflowState, db: Session) -> WorkflowState:
+def edit_node(state: WorkflowState) -> WorkflowState:
     """编辑执行节点"""
-    from app.nodes.planner import EditPlannerNode
-    from app.nodes.preview import PreviewGeneratorNode
-    from app.nodes.apply import ApplyEditsNode
+    components = _get_components()
     
     # 调试：打印进入edit_node时的状态
     print(f"DEBUG edit_node state keys: {state.keys()}")
@@ -146,7 +172,7 @@ def edit_node(state: WorkflowState, db: Session) -> WorkflowState:
     print("DEBUG: selected_target exists, proceeding with edit")
     
     # 1. 生成编辑计划
-    planner = EditPlannerNode(db)
+    planner = components["planner"]
     state = planner(state)
     
     # Check if planner added errors
@@ -158,7 +184,7 @@ def edit_node(state: WorkflowState, db: Session) -> WorkflowState:
     print(f"DEBUG: edit_plan generated: {state.get('edit_plan') is not None}")
     
     # 2. 生成预览
-    preview_gen = PreviewGeneratorNode(db, None)
+    preview_gen = components["preview_generator"]
     state = preview_gen(state)
     
     # Check if preview generator added errors
@@ -176,7 +202,7 @@ def edit_node(state: WorkflowState, db: Session) -> WorkflowState:
         return state
     
     # 4. 执行修改
-    apply_node = ApplyEditsNode(db)
+    apply_node = components["apply_node"]
     state = apply_node(state)
     
     # Check if apply node added errors
@@ -211,18 +237,18 @@ def route_decision(state: WorkflowState) -> str:
 
 # ============ Workflow Creation ============
 
-def create_workflow(db: Session):
-    """创建 LangGraph 工作流"""
+def create_workflow():
+    """创建 LangGraph 工作流（节点通过 request_session 访问本次请求的 db）"""
     
     # 创建状态图
     workflow = StateGraph(WorkflowState)
     
-    # 添加节点（使用 lambda 传递 db）
-    workflow.add_node("parse_intent", lambda state: intent_node(state, db))
-    workflow.add_node("route_decision", lambda state: router_node(state, db))
-    workflow.add_node("clarify_user", lambda state: clarify_node(state, db))
-    workflow.add_node("retrieve_target", lambda state: retrieval_node(state, db))
-    workflow.add_node("execute_edit", lambda state: edit_node(state, db))
+    # 添加节点
+    workflow.add_node("parse_intent", intent_node)
+    workflow.add_node("route_decision", router_node)
+    workflow.add_node("clarify_user", clarify_node)
+    workflow.add_node("retrieve_target", retrieval_node)
+    workflow.add_node("execute_edit", edit_node)
     
     # 设置入口点
     workflow.set_entry_point("parse_intent")
@@ -249,6 +275,20 @@ def create_workflow(db: Session):
     return workflow.compile()
 
 
+_compiled_workflow = None
+_compiled_workflow_lock = threading.Lock()
+
+
+def get_compiled_workflow():
+    """获取编译后的工作流单例（图结构与请求无关，只编译一次）"""
+    global _compiled_workflow
+    if _compiled_workflow is None:
+        with _compiled_workflow_lock:
+            if _compiled_workflow is None:
+                _compiled_workflow = create_workflow()
+    return _compiled_workflow
+
+
 # ============ Workflow Executor ============
 
 class LangGraphWorkflowExecutor:
@@ -256,7 +296,7 @@ class LangGraphWorkflowExecutor:
     
     def __init__(self, db: Session):
         self.db = db
-        self.workflow = create_workflow(db)
+        self.workflow = get_compiled_workflow()
     
     def execute(
         self,
@@ -330,7 +370,8 @@ class LangGraphWorkflowExecutor:
         try:
             # 执行工作流
             print(f"DEBUG: Starting workflow execution")
-            result = self.workflow.invoke(initial_state)
+            with bind_session(self.db):
+                result = self.workflow.invoke(initial_state)
             print(f"DEBUG: Workflow completed, result keys: {result.keys() if isinstance(result, dict) else 'not a dict'}")
             
             # 格式化返回结果
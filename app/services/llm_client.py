@@ -1,7 +1,10 @@
 from openai import OpenAI
-from typing import Optional, Dict, Any
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional, Tuple
 from app.config import get_settings
-from app.monitoring.metrics import llm_call_duration, llm_calls_total, llm_tokens_used
+from app.monitoring.metrics import llm_cache_requests, llm_call_duration, llm_calls_total, llm_tokens_used
+from app.services.cache import build_llm_cache_key, get_cache_manager
+from app.services.rate_limiter import get_rate_limiter
 import time
 import logging
 
@@ -19,16 +22,14 @@ class QwenClient:
         )
         self.model = settings.QWEN_MODEL
     
-    def chat_completion(
+    def _build_kwargs(
         self,
         messages: list,
-        temperature: float = 0.7,
-        max_tokens: Optional[int] = None,
-        response_format: Optional[Dict[str, Any]] = None,
-        trace_id: Optional[str] = None,
-        span_name: Optional[str] = None
-    ) -> str:
-        """调用 Qwen API 进行对话（支持 Langfuse 追踪）"""
+        temperature: float,
+        max_tokens: Optional[int],
+        response_format: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """构建请求参数"""
         kwargs = {
             "model": self.model,
             "messages": messages,
@@ -41,7 +42,125 @@ class QwenClient:
         if response_format:
             kwargs["response_format"] = response_format
         
+        return kwargs
+    
+    def _cache_policy(self, kwargs: Dict[str, Any], operation: str) -> Tuple[Optional[str], int]:
+        """
+        响应缓存策略：只缓存低温度调用，TTL 按 span_name 配置
+        
+        Returns:
+            (缓存 key, TTL)，不缓存时 key 为 None
+        """
+        if not settings.ENABLE_LLM_CACHE or kwargs["temperature"] > settings.LLM_CACHE_MAX_TEMPERATURE:
+            return None, 0
+        
+        ttl = settings.LLM_CACHE_SPAN_TTLS.get(operation, settings.LLM_CACHE_TTL_SECONDS)
+        if ttl <= 0:
+            return None, 0
+        
+        cache_key = build_llm_cache_key(
+            kwargs["model"],
+            kwargs["messages"],
+            kwargs["temperature"],
+            kwargs.get("response_format"),
+            kwargs.get("max_tokens")
+        )
+        return cache_key, ttl
+    
+    def _get_cached(self, cache_key: str, operation: str) -> Optional[str]:
+        """读取响应缓存（失败视为未命中）"""
+        try:
+            content = get_cache_manager().get_llm_response(cache_key)
+        except Exception as e:
+            logger.warning(f"LLM 缓存读取失败: {e}")
+            content = None
+        
+        llm_cache_requests.labels(
+            operation=operation,
+            result="hit" if content is not None else "miss"
+        ).inc()
+        return content
+    
+    def _set_cached(self, cache_key: str, content: Optional[str], ttl: int):
+        """写入响应缓存（失败不影响主流程）"""
+        if not content:
+            return
+        try:
+            get_cache_manager().set_llm_response(cache_key, content, ttl=ttl)
+        except Exception as e:
+            logger.warning(f"LLM 缓存写入失败: {e}")
+    
+    def _record_response(
+        self,
+        response,
+        content: str,
+        messages: list,
+        temperature: float,
+        max_tokens: Optional[int],
+        duration: float,
+        trace_id: Optional[str],
+        span_name: Optional[str]
+    ):
+        """记录 token 使用与 Langfuse 追踪"""
+        # 记录 token 使用
+        if response.usage:
+            llm_tokens_used.labels(model=self.model, token_type="prompt").inc(
+                response.usage.prompt_tokens or 0
+            )
+            llm_tokens_used.labels(model=self.model, token_type="completion").inc(
+                response.usage.completion_tokens or 0
+            )
+        
+        # 记录到 Langfuse
+        if trace_id and settings.ENABLE_LANGFUSE:
+            try:
+                from app.services.langfuse_client import log_generation
+                
+                usage = {
+                    "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
+                    "completion_tokens": response.usage.completion_tokens if response.usage else 0,
+                    "total_tokens": response.usage.total_tokens if response.usage else 0
+                }
+                
+                log_generation(
+                    trace_id=trace_id,
+                    name=span_name or "llm_call",
+                    model=self.model,
+                    input=messages,
+                    output=content,
+                    metadata={
+                        "temperature": temperature,
+                        "max_tokens": max_tokens,
+                        "duration_seconds": duration
+                    },
+                    usage=usage
+                )
+            except Exception as e:
+                logger.warning(f"Langfuse 记录失败: {e}")
+    
+    def chat_completion(
+        self,
+        messages: list,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+        trace_id: Optional[str] = None,
+        span_name: Optional[str] = None
+    ) -> str:
+        """调用 Qwen API 进行对话（支持 Langfuse 追踪）"""
+        kwargs = self._build_kwargs(messages, temperature, max_tokens, response_format)
+        
         operation = span_name or ("chat_completion_json" if response_format else "chat_completion")
+        
+        # 低温度调用先查响应缓存（重试 / 追问时 prompt 往往完全相同）
+        cache_key, cache_ttl = self._cache_policy(kwargs, operation)
+        if cache_key:
+            cached = self._get_cached(cache_key, operation)
+            if cached is not None:
+                return cached
+        
+        # 跨 worker 限流（排队时间不计入调用耗时）
+        lease = get_rate_limiter().acquire(self.model)
         start_time = time.time()
         status = "success"
         
@@ -49,44 +168,13 @@ class QwenClient:
             response = self.client.chat.completions.create(**kwargs)
             content = response.choices[0].message.content
             
-            # 计算耗时
-            duration = time.time() - start_time
-
-            # 记录 token 使用
-            if response.usage:
-                llm_tokens_used.labels(model=self.model, token_type="prompt").inc(
-                    response.usage.prompt_tokens or 0
-                )
-                llm_tokens_used.labels(model=self.model, token_type="completion").inc(
-                    response.usage.completion_tokens or 0
-                )
+            if cache_key:
+                self._set_cached(cache_key, content, cache_ttl)
             
-            # 记录到 Langfuse
-            if trace_id and settings.ENABLE_LANGFUSE:
-                try:
-                    from app.services.langfuse_client import log_generation
-                    
-                    usage = {
-                        "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
-                        "completion_tokens": response.usage.completion_tokens if response.usage else 0,
-                        "total_tokens": response.usage.total_tokens if response.usage else 0
-                    }
-                    
-                    log_generation(
-                        trace_id=trace_id,
-                        name=span_name or "llm_call",
-                        model=self.model,
-                        input=messages,
-                        output=content,
-                        metadata={
-                            "temperature": temperature,
-                            "max_tokens": max_tokens,
-                            "duration_seconds": duration
-                        },
-                        usage=usage
-                    )
-                except Exception as e:
-                    logger.warning(f"Langfuse 记录失败: {e}")
+            self._record_response(
+                response, content, messages, temperature, max_tokens,
+                time.time() - start_time, trace_id, span_name
+            )
             
             return content
             
@@ -95,10 +183,83 @@ class QwenClient:
             logger.error(f"LLM API 调用失败: {e}")
             raise
         finally:
+            lease.release()
+            duration = time.time() - start_time
+            llm_call_duration.labels(model=self.model, operation=operation).observe(duration)
+            llm_calls_total.labels(model=self.model, operation=operation, status=status).inc()
+    
+    def chat_completion_stream(
+        self,
+        messages: list,
+        on_token: Callable[[str], None],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+        trace_id: Optional[str] = None,
+        span_name: Optional[str] = None
+    ) -> str:
+        """
+        流式调用 Qwen API，每收到一段输出调用一次 on_token，返回完整内容
+        
+        on_token 抛出的异常会被忽略，不影响生成。
+        """
+        kwargs = self._build_kwargs(messages, temperature, max_tokens, response_format)
+        
+        operation = span_name or ("chat_completion_json" if response_format else "chat_completion")
+        
+        cache_key, cache_ttl = self._cache_policy(kwargs, operation)
+        if cache_key:
+            cached = self._get_cached(cache_key, operation)
+            if cached is not None:
+                self._emit_token(on_token, cached)
+                return cached
+        
+        lease = get_rate_limiter().acquire(self.model)
+        start_time = time.time()
+        status = "success"
+        
+        try:
+            # openai==1.10.0 不支持 stream_options；部分服务端仍会在最后一个 chunk 附带 usage
+            stream = self.client.chat.completions.create(**kwargs, stream=True)
+            parts = []
+            usage = None
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    self._emit_token(on_token, delta)
+            content = "".join(parts)
+            
+            if cache_key:
+                self._set_cached(cache_key, content, cache_ttl)
+            
+            self._record_response(
+                SimpleNamespace(usage=usage), content, messages, temperature, max_tokens,
+                time.time() - start_time, trace_id, span_name
+            )
+            
+            return content
+            
+        except Exception as e:
+            status = "error"
+            logger.error(f"LLM API 流式调用失败: {e}")
+            raise
+        finally:
+            lease.release()
             duration = time.time() - start_time
             llm_call_duration.labels(model=self.model, operation=operation).observe(duration)
             llm_calls_total.labels(model=self.model, operation=operation, status=status).inc()
     
+    @staticmethod
+    def _emit_token(on_token: Callable[[str], None], text: str):
+        try:
+            on_token(text)
+        except Exception as e:
+            logger.warning(f"流式输出回调失败: {e}")
+    
     def chat_completion_json(
         self,
         messages: list,
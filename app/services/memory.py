@@ -51,7 +51,20 @@ def _extract_keywords(text: str) -> List[str]:
     return list(dict.fromkeys(keywords))
 
 
-def _cosine_similarity(vec1: Optional[List[float]], vec2: Optional[List[float]]) -> float:
+def _as_float_list(vec: Any) -> Optional[List[float]]:
+    # pgvector returns HalfVector for halfvec columns and ndarray for vector columns
+    if vec is None:
+        return None
+    if hasattr(vec, "to_list"):
+        return vec.to_list()
+    if hasattr(vec, "tolist"):
+        return vec.tolist()
+    return list(vec)
+
+
+def _cosine_similarity(vec1: Any, vec2: Any) -> float:
+    vec1 = _as_float_list(vec1)
+    vec2 = _as_float_list(vec2)
     if not vec1 or not vec2 or len(vec1) != len(vec2):
         return 0.0
     dot = 0.0
@@ -640,7 +653,10 @@ class MemoryService:
             last_reinforced_at=now,
             min_keep_until=min_keep_until,
             max_keep_until=max_keep_until,
-            embedding=self._generate_embedding_safe(" ".join(filter(None, [retrieval_text, title, summary, content]))),
+            embedding=self._generate_embedding_safe(
+                " ".join(filter(None, [retrieval_text, title, summary, content])),
+                background=True,
+            ),
         )
         self.db.add(created)
         self.db.flush()
@@ -1041,13 +1057,19 @@ class MemoryService:
             item.stability = min(180.0, max(item.stability or 7.0, 3.0) * 1.18)
             item.retention_score = min(1.0, item.memory_strength)
 
-    def _generate_embedding_safe(self, text: str) -> Optional[List[float]]:
+    def _generate_embedding_safe(self, text: str, background: bool = False) -> Optional[List[float]]:
         if not settings.ENABLE_VECTOR_SEARCH:
             return None
         try:
             from app.services.embedding import get_embedding_service
-
-            embedding = get_embedding_service().generate_embedding(text)
+            from app.services.rate_limiter import PRIORITY_BACKGROUND, llm_priority
+
+            # 写入记忆时为后台优先级，让出配额给交互式编辑；检索记忆（search_memories）沿用调用方优先级
+            if background:
+                with llm_priority(PRIORITY_BACKGROUND):
+                    embedding = get_embedding_service().generate_embedding(text)
+            else:
+                embedding = get_embedding_service().generate_embedding(text)
             if not embedding or not any(abs(value) > 1e-12 for value in embedding):
                 return None
             return embedding
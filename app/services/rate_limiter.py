@@ -0,0 +1,234 @@
+"""
+LLM / Embedding 调用限流（Redis 令牌桶 + 并发闸门，跨 worker / 节点共享）
+
+- 按模型配置每分钟请求数（令牌桶）、突发容量与最大并发
+- 优先级：交互式编辑（interactive）优先于后台任务（background，如记忆提取、
+  上传 / 编辑 / 批量修改后的重建索引 embedding）
+  后台调用只能在令牌桶保留一部分容量、并发低于后台上限时获得许可，交互式调用始终可用全部容量
+- 排队等待时间导出为直方图；Redis 不可用时放行（不限流）
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+import random
+import threading
+import time
+import uuid
+
+from app.config import get_settings
+from app.monitoring.metrics import llm_rate_limit_requests, llm_rate_limit_wait_seconds
+
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+
+_current_priority: ContextVar[str] = ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: str) -> Iterator[None]:
+    """在当前上下文中设置 LLM 调用优先级（run_blocking 会保留 contextvars）"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class LLMRateLimitTimeout(RuntimeError):
+    """等待限流许可超时"""
+
+
+# KEYS[1]: 令牌桶 hash，KEYS[2]: 在途请求 zset（score 为租约到期时间）
+# ARGV: rate(令牌/秒), capacity, min_tokens, max_inflight, lease_seconds, member
+# 返回 {1, 0} 表示获得许可，{0, wait_ms} 表示需等待
+_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local min_tokens = tonumber(ARGV[3])
+local max_inflight = tonumber(ARGV[4])
+local lease = tonumber(ARGV[5])
+
+if max_inflight > 0 then
+  redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+  if redis.call('ZCARD', KEYS[2]) >= max_inflight then
+    return {0, 50}
+  end
+end
+
+if rate > 0 then
+  local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+  local tokens = tonumber(state[1]) or capacity
+  local ts = tonumber(state[2]) or now
+  tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+  local ttl = math.ceil(capacity / rate) + 60
+  if tokens < min_tokens then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], ttl)
+    return {0, math.ceil((min_tokens - tokens) / rate * 1000)}
+  end
+  redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'ts', tostring(now))
+  redis.call('EXPIRE', KEYS[1], ttl)
+end
+
+if max_inflight > 0 then
+  redis.call('ZADD', KEYS[2], now + lease, ARGV[6])
+  redis.call('EXPIRE', KEYS[2], math.ceil(lease) + 60)
+end
+return {1, 0}
+"""
+
+
+class RateLimitLease:
+    """限流许可（调用结束后释放并发名额，可作为上下文管理器使用）"""
+
+    def __init__(self, limiter: Optional["LLMRateLimiter"] = None, model: str = "", member: Optional[str] = None):
+        self._limiter = limiter
+        self._model = model
+        self._member = member
+
+    def release(self):
+        if self._limiter and self._member:
+            self._limiter._release(self._model, self._member)
+        self._member = None
+
+    def __enter__(self) -> "RateLimitLease":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class LLMRateLimiter:
+    """跨 worker 的模型调用限流器"""
+
+    def __init__(self, redis_client=None):
+        self.settings = get_settings()
+        if redis_client is None:
+            try:
+                from app.services.cache import get_cache_manager
+                cache = get_cache_manager()
+                redis_client = cache.redis_client if cache.redis_available else None
+            except Exception as e:
+                print(f"限流器 Redis 初始化失败，不限流: {e}")
+                redis_client = None
+        self.redis_client = redis_client
+        self._script = redis_client.register_script(_ACQUIRE_SCRIPT) if redis_client else None
+
+    def limits_for(self, model: str) -> Dict[str, float]:
+        """模型限额（LLM_RATE_LIMITS 中的配置覆盖默认值）"""
+        limits = {
+            "rpm": self.settings.LLM_RATE_LIMIT_DEFAULT_RPM,
+            "burst": self.settings.LLM_RATE_LIMIT_DEFAULT_BURST,
+            "concurrency": self.settings.LLM_RATE_LIMIT_DEFAULT_CONCURRENCY,
+        }
+        limits.update(self.settings.LLM_RATE_LIMITS.get(model, {}))
+        return limits
+
+    def acquire(self, model: str, priority: Optional[str] = None) -> RateLimitLease:
+        """
+        阻塞等待限流许可
+
+        Raises:
+            LLMRateLimitTimeout: 超过最大等待时间仍未获得许可
+        """
+        priority = priority or _current_priority.get()
+        if not self._enabled():
+            return RateLimitLease()
+
+        member = uuid.uuid4().hex
+        started = time.perf_counter()
+        deadline = started + self._max_wait(priority)
+        while True:
+            granted, wait_seconds = self._try_acquire(model, priority, member)
+            if granted is None:
+                return self._bypass(model, priority)
+            if granted:
+                return self._granted(model, priority, member, started)
+            if time.perf_counter() + wait_seconds > deadline:
+                return self._timeout(model, priority, started)
+            time.sleep(wait_seconds)
+
+    # ============ 内部实现 ============
+
+    def _enabled(self) -> bool:
+        return self.settings.ENABLE_LLM_RATE_LIMIT and self._script is not None
+
+    def _max_wait(self, priority: str) -> float:
+        if priority == PRIORITY_BACKGROUND:
+            return self.settings.LLM_RATE_LIMIT_BACKGROUND_MAX_WAIT_SECONDS
+        return self.settings.LLM_RATE_LIMIT_MAX_WAIT_SECONDS
+
+    def _try_acquire(self, model: str, priority: str, member: str) -> Tuple[Optional[bool], float]:
+        """
+        尝试获取一次许可
+
+        Returns:
+            (是否获得许可, 建议等待秒数)；Redis 出错时返回 (None, 0)
+        """
+        limits = self.limits_for(model)
+        capacity = max(float(limits["burst"]), 1.0)
+        concurrency = int(limits["concurrency"])
+        min_tokens = 1.0
+        if priority == PRIORITY_BACKGROUND:
+            # 后台调用为交互式调用保留一部分令牌和并发名额（在途请求总数低于后台上限时才放行）
+            min_tokens = max(1.0, capacity * self.settings.LLM_RATE_LIMIT_BACKGROUND_RESERVE_RATIO)
+            if concurrency > 0:
+                concurrency = max(1, int(concurrency * self.settings.LLM_RATE_LIMIT_BACKGROUND_CONCURRENCY_RATIO))
+
+        try:
+            granted, wait_ms = self._script(
+                keys=[f"ratelimit:{model}:bucket", f"ratelimit:{model}:inflight"],
+                args=[
+                    float(limits["rpm"]) / 60.0,
+                    capacity,
+                    min_tokens,
+                    concurrency,
+                    self.settings.LLM_RATE_LIMIT_LEASE_SECONDS,
+                    member,
+                ],
+            )
+        except Exception as e:
+            print(f"限流器 Redis 调用失败，本次放行: {e}")
+            return None, 0.0
+
+        # 加入少量抖动，避免多个 worker 同时重试
+        wait_seconds = min(max(int(wait_ms), 10) / 1000.0, 1.0) * random.uniform(1.0, 1.5)
+        return bool(int(granted)), wait_seconds
+
+    def _release(self, model: str, member: str):
+        try:
+            self.redis_client.zrem(f"ratelimit:{model}:inflight", member)
+        except Exception as e:
+            print(f"限流器释放失败（租约到期后自动回收）: {e}")
+
+    def _granted(self, model: str, priority: str, member: str, started: float) -> RateLimitLease:
+        llm_rate_limit_wait_seconds.labels(model=model, priority=priority).observe(time.perf_counter() - started)
+        llm_rate_limit_requests.labels(model=model, priority=priority, outcome="granted").inc()
+        return RateLimitLease(self, model, member)
+
+    def _bypass(self, model: str, priority: str) -> RateLimitLease:
+        llm_rate_limit_requests.labels(model=model, priority=priority, outcome="bypass").inc()
+        return RateLimitLease()
+
+    def _timeout(self, model: str, priority: str, started: float) -> RateLimitLease:
+        llm_rate_limit_wait_seconds.labels(model=model, priority=priority).observe(time.perf_counter() - started)
+        llm_rate_limit_requests.labels(model=model, priority=priority, outcome="timeout").inc()
+        raise LLMRateLimitTimeout(f"模型 {model} 调用排队超时，请稍后重试")
+
+
+# 全局实例
+_rate_limiter: Optional[LLMRateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> LLMRateLimiter:
+    """获取限流器单例"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = LLMRateLimiter()
+    return _rate_limiter
@@ -0,0 +1,190 @@
+"""
+本地确定性重排（LLM 选择前的短路判断）
+
+按关键词重合度、引用原文命中、章节匹配和检索分数对候选打分，
+第一名与第二名的分差（margin）足够大时直接选定目标，不再调用 LLM。
+"""
+from typing import Any, List, Optional, Tuple
+import math
+import re
+
+from app.config import get_settings
+from app.models.schemas import EvidenceQuote
+from app.monitoring.metrics import rerank_decisions, rerank_llm_agreement
+from app.services.bm25_index import tokenize
+from app.utils.intent_helper import get_intent_attr
+
+
+# 各特征权重（合计 1.0）
+KEYWORD_WEIGHT = 0.35
+EVIDENCE_WEIGHT = 0.30
+HEADING_WEIGHT = 0.15
+RETRIEVAL_WEIGHT = 0.20
+
+_QUOTE_PATTERN = re.compile(r"[“\"「『‘']([^”\"」』’']{2,80})[”\"」』’']")
+_REPLACE_PATTERN = re.compile(r"(?:把|将)(.{2,40}?)(?:改成|改为|替换为|换成)")
+
+
+def _field(candidate: Any, name: str, default: Any = None) -> Any:
+    """兼容 BlockCandidate 与 dict 形式的候选"""
+    if isinstance(candidate, dict):
+        return candidate.get(name, default)
+    return getattr(candidate, name, default)
+
+
+def extract_quoted_phrases(text: str) -> List[str]:
+    """提取用户消息中引用的原文（引号内容、“把 X 改成”中的 X）"""
+    if not text:
+        return []
+    phrases = [match.strip() for match in _QUOTE_PATTERN.findall(text)]
+    phrases.extend(match.strip(" “”\"'「」") for match in _REPLACE_PATTERN.findall(text))
+    return [phrase for phrase in dict.fromkeys(phrases) if len(phrase) >= 2]
+
+
+class RerankResult:
+    """重排结果"""
+
+    def __init__(
+        self,
+        ranked: List[Tuple[Any, float]],
+        margin: float,
+        confidence: float,
+        threshold: float,
+        phrases: Optional[List[str]] = None
+    ):
+        self.ranked = ranked
+        self.margin = margin
+        self.confidence = confidence
+        self.threshold = threshold
+        self.phrases = phrases or []
+
+    @property
+    def top(self) -> Optional[Any]:
+        return self.ranked[0][0] if self.ranked else None
+
+    @property
+    def is_confident(self) -> bool:
+        """分差达到阈值，可跳过 LLM（只有一个候选时没有可比的分差，不能跳过相关性校验）"""
+        return len(self.ranked) >= 2 and self.margin >= self.threshold
+
+    def evidence_for(self, candidate: Any) -> EvidenceQuote:
+        """优先使用命中的引用原文作为证据，否则截取片段开头"""
+        snippet = _field(candidate, "snippet", "") or ""
+        for phrase in self.phrases:
+            start = snippet.find(phrase)
+            if start >= 0:
+                return EvidenceQuote(text=phrase, start=start, end=start + len(phrase))
+        text = snippet[:50]
+        return EvidenceQuote(text=text, start=0, end=len(text))
+
+
+class LocalReranker:
+    """确定性本地重排器"""
+
+    def __init__(self, margin_threshold: Optional[float] = None):
+        settings = get_settings()
+        self.margin_threshold = (
+            margin_threshold if margin_threshold is not None else settings.RERANK_MARGIN_THRESHOLD
+        )
+
+    def rerank(self, intent: Any, candidates: List[Any], user_message: Optional[str] = None) -> RerankResult:
+        """
+        对候选重排
+
+        Args:
+            intent: Intent 对象或字典
+            candidates: BlockCandidate 或 dict 列表
+            user_message: 原始用户消息（intent 中没有时使用）
+
+        Returns:
+            RerankResult
+        """
+        message = user_message or get_intent_attr(intent, "user_message", "") or ""
+        scope_hint = get_intent_attr(intent, "scope_hint", None)
+        scope_filter = get_intent_attr(intent, "scope_filter", None) or {}
+
+        heading = None
+        keywords: List[str] = []
+        if scope_hint:
+            if isinstance(scope_hint, dict):
+                heading = scope_hint.get("heading")
+                keywords = scope_hint.get("keywords", []) or []
+            else:
+                heading = getattr(scope_hint, "heading", None)
+                keywords = getattr(scope_hint, "keywords", []) or []
+
+        phrases = extract_quoted_phrases(message)
+        if isinstance(scope_filter, dict) and scope_filter.get("term"):
+            phrases.insert(0, scope_filter["term"])
+
+        query_tokens = set(tokenize(" ".join([message] + list(keywords))))
+        max_retrieval_score = max((_field(c, "score", 0.0) or 0.0 for c in candidates), default=0.0)
+
+        scored = []
+        for candidate in candidates:
+            snippet = _field(candidate, "snippet", "") or ""
+            heading_context = _field(candidate, "heading_context", "") or ""
+
+            # 1. 关键词重合度
+            keyword_score = 0.0
+            if query_tokens:
+                candidate_tokens = set(tokenize(f"{heading_context} {snippet}"))
+                keyword_score = len(query_tokens & candidate_tokens) / len(query_tokens)
+
+            # 2. 引用原文命中
+            evidence_score = 0.0
+            if phrases:
+                evidence_score = sum(1 for phrase in phrases if phrase in snippet) / len(phrases)
+
+            # 3. 章节匹配
+            heading_score = 1.0 if heading and heading.lower() in heading_context.lower() else 0.0
+
+            # 4. 检索分数（相对第一名归一化，保留 RRF 的分差）
+            retrieval_score = (_field(candidate, "score", 0.0) or 0.0) / max_retrieval_score if max_retrieval_score > 0 else 0.0
+
+            score = (
+                KEYWORD_WEIGHT * keyword_score
+                + EVIDENCE_WEIGHT * evidence_score
+                + HEADING_WEIGHT * heading_score
+                + RETRIEVAL_WEIGHT * retrieval_score
+            )
+            scored.append((candidate, score))
+
+        scored.sort(key=lambda item: item[1], reverse=True)
+
+        if not scored:
+            margin = 0.0
+        elif len(scored) == 1:
+            margin = scored[0][1]
+        else:
+            margin = scored[0][1] - scored[1][1]
+
+        # 分差映射到 0.5-1.0 的置信度：margin == threshold 时约 0.82
+        confidence = 0.5 + 0.5 * (1 - math.exp(-margin / max(self.margin_threshold, 1e-6)))
+
+        return RerankResult(scored, margin, round(min(confidence, 0.99), 3), self.margin_threshold, phrases)
+
+
+def record_rerank_decision(component: str, skipped_llm: bool):
+    """记录是否跳过 LLM（跳过率 = skipped / 总数）"""
+    rerank_decisions.labels(component=component, decision="skipped_llm" if skipped_llm else "called_llm").inc()
+
+
+def record_llm_agreement(component: str, local_block_id: Optional[str], llm_block_id: Optional[str]):
+    """LLM 被调用时，记录其选择是否与本地重排第一名一致"""
+    if not local_block_id or not llm_block_id:
+        return
+    agreement = "agree" if str(local_block_id) == str(llm_block_id) else "disagree"
+    rerank_llm_agreement.labels(component=component, agreement=agreement).inc()
+
+
+# 全局实例
+_reranker = None
+
+
+def get_reranker() -> LocalReranker:
+    """获取本地重排器单例"""
+    global _reranker
+    if _reranker is None:
+        _reranker = LocalReranker()
+    return _reranker
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.models.schemas import BlockCandidate, ScopeHint
@@ -7,18 +7,101 @@ from app.utils.markdown import normalize_text
 from app.utils.intent_helper import get_intent_attr
 from app.services.search_indexer import get_indexer
 from app.services.embedding import get_embedding_service
+from app.services.vector_cache import get_vector_cache
+from app.services.bm25_index import get_bm25_index_cache, tokenize
+from app.services.scope_filter import ResolvedScope, resolve_scope
+from app.db.vector import apply_hnsw_search_params, to_vector_literal, vector_sql_type
+from app.services.cache import get_cache_manager
 from app.monitoring.metrics import (
+    cache_hits,
+    cache_misses,
     meilisearch_query_duration,
     retrieval_duration,
+    retrieval_leg_results,
+    speculative_recall,
     retrieval_requests,
     search_results_count,
     searches_performed,
     vector_search_duration,
 )
+from app.config import get_settings
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import threading
 import time
 import uuid
 
 
+# 检索依赖（Meilisearch 索引器 / embedding 服务）初始化失败后的重试间隔（秒）
+_DEPENDENCY_RETRY_SECONDS = 5.0
+
+_recall_executor: Optional[ThreadPoolExecutor] = None
+_recall_executor_lock = threading.Lock()
+
+
+def _get_recall_executor() -> ThreadPoolExecutor:
+    """
+    获取混合检索召回线程池（进程内共享）
+
+    工作线程不继承 bind_session() 绑定的会话（ContextVar 不会传给 submit 的任务），
+    提交的任务只能访问 Meilisearch / embedding 服务，不能访问 self.db。
+    """
+    global _recall_executor
+    if _recall_executor is None:
+        with _recall_executor_lock:
+            if _recall_executor is None:
+                _recall_executor = ThreadPoolExecutor(
+                    max_workers=get_settings().RETRIEVAL_MAX_WORKERS,
+                    thread_name_prefix="hybrid-recall",
+                )
+    return _recall_executor
+
+
+class SpeculativeRecall:
+    """
+    与意图解析并行提前发起的召回（基于原始 user_message，不访问数据库）
+
+    - embedding_future: 查询向量，与 scope_hint 无关，可直接复用
+    - bm25_future: 未加过滤的 Meilisearch 原始命中；scope 没有下推过滤时复用并按 scope_hint 重新打分，
+      否则带过滤条件重新召回
+    """
+
+    def __init__(
+        self,
+        query: str,
+        doc_id: str,
+        rev_id: str,
+        limit: int,
+        bm25_future: Future,
+        embedding_future: Future
+    ):
+        self.query = query
+        self.doc_id = doc_id
+        self.rev_id = rev_id
+        self.limit = limit
+        self.bm25_future = bm25_future
+        self.embedding_future = embedding_future
+        self.consumed = False
+
+    def matches(self, query: str, doc_id: str, rev_id: str, limit: int) -> bool:
+        return (
+            not self.consumed
+            and self.query == query
+            and self.doc_id == doc_id
+            and self.rev_id == rev_id
+            and limit <= self.limit
+        )
+
+    def discard(self):
+        """未被使用时丢弃（已在执行的召回无法中断，结果直接忽略）"""
+        if self.consumed:
+            return
+        self.consumed = True
+        for leg, future in (("bm25", self.bm25_future), ("vector", self.embedding_future)):
+            future.cancel()
+            speculative_recall.labels(leg=leg, outcome="unused").inc()
+
+
 class HybridRetriever:
     """混合检索器（BM25 + 向量检索 + RRF 融合）"""
     
@@ -26,24 +109,64 @@ class HybridRetriever:
         self.db = db
         self.use_meilisearch = use_meilisearch
         self.use_vector = use_vector
+        # 依赖服务在使用时解析：共享检索器只构建一次，初始化失败（如 Meilisearch 暂时不可用）
+        # 不能永久关闭对应的召回，间隔 _DEPENDENCY_RETRY_SECONDS 后重试
+        self._dependency_retry_at = {"indexer": 0.0, "embedding_service": 0.0}
+    
+    def _resolve_dependency(self, name: str, factory):
+        if time.monotonic() < self._dependency_retry_at[name]:
+            return None
+        try:
+            return factory()
+        except Exception as e:
+            self._dependency_retry_at[name] = time.monotonic() + _DEPENDENCY_RETRY_SECONDS
+            print(f"检索依赖 {name} 初始化失败，{_DEPENDENCY_RETRY_SECONDS:.0f} 秒后重试: {e}")
+            return None
+    
+    @property
+    def indexer(self):
+        """Meilisearch 索引器（未启用或暂不可用时为 None）"""
+        return self._resolve_dependency("indexer", get_indexer) if self.use_meilisearch else None
+    
+    @property
+    def embedding_service(self):
+        """Embedding 服务（未启用或暂不可用时为 None）"""
+        return self._resolve_dependency("embedding_service", get_embedding_service) if self.use_vector else None
+    
+    @property
+    def mode(self) -> str:
+        """当前配置下的首选检索模式"""
+        if self.use_meilisearch and self.use_vector and self.indexer and self.embedding_service:
+            return "hybrid"
+        if self.use_meilisearch and self.indexer:
+            return "meilisearch"
+        return "simple"
+    
+    def start_speculative(
+        self,
+        query: str,
+        doc_id: str,
+        rev_id: str,
+        top_k: int = 10
+    ) -> Optional[SpeculativeRecall]:
+        """
+        提前发起 BM25 召回与查询向量生成（仅混合检索模式）
         
-        if use_meilisearch:
-            try:
-                self.indexer = get_indexer()
-            except:
-                self.use_meilisearch = False
-                self.indexer = None
-        else:
-            self.indexer = None
+        在意图解析期间执行，检索阶段通过 search(speculative=...) 复用，省去一次召回往返。
+        """
+        if self.mode != "hybrid":
+            return None
         
-        if use_vector:
-            try:
-                self.embedding_service = get_embedding_service()
-            except:
-                self.use_vector = False
-                self.embedding_service = None
-        else:
-            self.embedding_service = None
+        executor = _get_recall_executor()
+        limit = top_k * 2
+        return SpeculativeRecall(
+            query,
+            doc_id,
+            rev_id,
+            limit,
+            bm25_future=executor.submit(self._fetch_meilisearch_hits, query, doc_id, rev_id, {}, limit * 2),
+            embedding_future=executor.submit(self.embedding_service.generate_embedding, query)
+        )
     
     def search(
         self,
@@ -51,24 +174,82 @@ class HybridRetriever:
         doc_id: str,
         rev_id: str,
         scope_hint: Optional[ScopeHint] = None,
-        top_k: int = 10
+        top_k: int = 10,
+        speculative: Optional[SpeculativeRecall] = None
     ) -> List[BlockCandidate]:
         """
         混合检索（BM25 + 向量 + RRF 融合）
         优先使用混合检索，失败则降级
+        
+        结果按 (doc_id, rev_id, 归一化 query, scope_hint, top_k, mode) 缓存，
+        澄清/消歧的后续轮次可直接复用，跳过 BM25、向量和 embedding 调用。
+        speculative 为 start_speculative 提前发起的召回，命中缓存或未被使用时丢弃。
+        """
+        settings = get_settings()
+        mode = self.mode
+        cache_manager = get_cache_manager() if settings.ENABLE_RETRIEVAL_CACHE else None
+        
+        if cache_manager:
+            cached = cache_manager.get_search_results(doc_id, rev_id, query, scope_hint, top_k, mode)
+            if cached is not None:
+                cache_hits.labels(cache_type="retrieval").inc()
+                if speculative:
+                    speculative.discard()
+                return [BlockCandidate(**item) for item in cached]
+            cache_misses.labels(cache_type="retrieval").inc()
+        
+        try:
+            results, served_mode = self._search_uncached(query, doc_id, rev_id, scope_hint, top_k, speculative)
+        finally:
+            if speculative:
+                speculative.discard()
+        
+        # 只缓存首选模式的非空结果，降级结果不缓存，避免依赖恢复后仍返回降级结果
+        if cache_manager and results and served_mode == mode:
+            cache_manager.set_search_results(
+                doc_id,
+                rev_id,
+                query,
+                [candidate.model_dump() for candidate in results],
+                scope_hint=scope_hint,
+                top_k=top_k,
+                mode=mode,
+                ttl=settings.RETRIEVAL_CACHE_TTL_SECONDS
+            )
+        
+        return results
+    
+    def _search_uncached(
+        self,
+        query: str,
+        doc_id: str,
+        rev_id: str,
+        scope_hint: Optional[ScopeHint],
+        top_k: int,
+        speculative: Optional[SpeculativeRecall] = None
+    ) -> Tuple[List[BlockCandidate], str]:
+        """
+        按 hybrid → meilisearch → simple 顺序检索，返回 (结果, 实际使用的模式)
+        
+        混合检索有一路超时或失败、只用单路结果时，模式为 hybrid_degraded（不缓存）。
         """
         search_start = time.time()
+        
+        # scope_hint 过滤条件只解析一次，下推到各路召回
+        scope = self._resolve_scope(rev_id, scope_hint)
 
         # 尝试混合检索（BM25 + 向量）
         if self.use_meilisearch and self.use_vector and self.indexer and self.embedding_service:
             try:
-                results = self._hybrid_search(query, doc_id, rev_id, scope_hint, top_k)
+                results, degraded = self._hybrid_search(
+                    query, doc_id, rev_id, scope_hint, top_k, scope=scope, speculative=speculative
+                )
                 if results:
                     searches_performed.labels(search_type="hybrid", status="success").inc()
                     search_results_count.observe(len(results))
                     retrieval_duration.labels(mode="hybrid").observe(time.time() - search_start)
                     retrieval_requests.labels(mode="hybrid", status="success").inc()
-                    return results
+                    return results, "hybrid_degraded" if degraded else "hybrid"
                 searches_performed.labels(search_type="hybrid", status="empty").inc()
                 print("混合检索返回空结果，尝试 Meilisearch 搜索")
             except Exception as e:
@@ -78,13 +259,13 @@ class HybridRetriever:
         # 降级到 Meilisearch
         if self.use_meilisearch and self.indexer:
             try:
-                results = self._meilisearch_search(query, doc_id, rev_id, scope_hint, top_k)
+                results = self._meilisearch_search(query, doc_id, rev_id, scope_hint, top_k, scope=scope)
                 if results:
                     searches_performed.labels(search_type="meilisearch", status="success").inc()
                     search_results_count.observe(len(results))
                     retrieval_duration.labels(mode="meilisearch").observe(time.time() - search_start)
                     retrieval_requests.labels(mode="meilisearch", status="success").inc()
-                    return results
+                    return results, "meilisearch"
                 searches_performed.labels(search_type="meilisearch", status="empty").inc()
                 print("Meilisearch 返回空结果，尝试简单搜索")
             except Exception as e:
@@ -93,18 +274,18 @@ class HybridRetriever:
         
         # 最终降级到简单搜索
         try:
-            results = self._simple_search(query, doc_id, rev_id, scope_hint, top_k)
+            results = self._simple_search(query, doc_id, rev_id, scope_hint, top_k, scope=scope)
             final_status = "success" if results else "empty"
             searches_performed.labels(search_type="simple", status=final_status).inc()
             search_results_count.observe(len(results))
             retrieval_duration.labels(mode="simple").observe(time.time() - search_start)
             retrieval_requests.labels(mode="simple", status=final_status).inc()
-            return results
+            return results, "simple"
         except Exception:
             searches_performed.labels(search_type="simple", status="error").inc()
             retrieval_duration.labels(mode="simple").observe(time.time() - search_start)
             retrieval_requests.labels(mode="simple", status="error").inc()
-            return []
+            return [], "simple"
     
     def _hybrid_search(
         self,
@@ -112,22 +293,125 @@ class HybridRetriever:
         doc_id: str,
         rev_id: str,
         scope_hint: Optional[ScopeHint],
-        top_k: int
-    ) -> List[BlockCandidate]:
-        """混合检索：BM25 + 向量 + RRF 融合"""
-        # 1. BM25 召回
-        bm25_results = self._meilisearch_search(query, doc_id, rev_id, scope_hint, top_k * 2)
+        top_k: int,
+        scope: Optional[ResolvedScope] = None,
+        speculative: Optional[SpeculativeRecall] = None
+    ) -> Tuple[List[BlockCandidate], bool]:
+        """
+        混合检索：BM25 + 向量 + RRF 融合
+        
+        两路召回并发执行，总耗时取决于较慢的一路而非两者之和。
+        Meilisearch 查询与查询向量生成（embedding API）在线程池中执行；
+        pgvector 查询仍在当前线程使用 self.db（Session 非线程安全）。
+        任一路超时或失败时，只用另一路结果做单路 RRF。
+        提供 speculative 时复用提前发起的查询向量，BM25 无下推过滤时复用原始命中。
         
-        # 2. 向量召回
-        vector_results = self._vector_search(query, doc_id, rev_id, scope_hint, top_k * 2)
+        Returns:
+            (结果, 是否有一路超时或失败被丢弃)
+        """
+        settings = get_settings()
+        executor = _get_recall_executor()
         
-        # 3. RRF 融合
-        combined = self._reciprocal_rank_fusion(
-            [bm25_results, vector_results],
-            k=60
+        # 范围在当前线程解析，工作线程不访问 self.db
+        if scope is None:
+            scope = self._resolve_scope(rev_id, scope_hint)
+        
+        start_time = time.time()
+        
+        # 1. 同时发起 BM25 召回和查询向量生成（可复用提前发起的召回）
+        speculative_hits = None
+        if speculative and speculative.matches(query, doc_id, rev_id, top_k * 2):
+            speculative.consumed = True
+            embedding_future = speculative.embedding_future
+            speculative_recall.labels(leg="vector", outcome="reused").inc()
+            if scope.meilisearch_filters():
+                # 范围过滤需要下推到 Meilisearch，带过滤条件重新召回
+                speculative_recall.labels(leg="bm25", outcome="refined").inc()
+                speculative.bm25_future.cancel()
+                bm25_future = executor.submit(
+                    self._meilisearch_search, query, doc_id, rev_id, scope_hint, top_k * 2, scope
+                )
+            else:
+                speculative_recall.labels(leg="bm25", outcome="reused").inc()
+                speculative_hits = speculative.bm25_future
+        else:
+            bm25_future = executor.submit(
+                self._meilisearch_search, query, doc_id, rev_id, scope_hint, top_k * 2, scope
+            )
+            embedding_future = executor.submit(self.embedding_service.generate_embedding, query)
+        
+        # 2. 等待 BM25 召回
+        if speculative_hits is not None:
+            hits = self._collect_leg(
+                "bm25", speculative_hits, start_time + settings.HYBRID_BM25_TIMEOUT_SECONDS
+            )
+            bm25_results = self._score_meilisearch_hits(hits, scope_hint, top_k * 2) if hits else None
+        else:
+            bm25_results = self._collect_leg(
+                "bm25", bm25_future, start_time + settings.HYBRID_BM25_TIMEOUT_SECONDS
+            )
+        
+        # 3. 等待查询向量，然后执行向量召回
+        vector_results = []
+        query_embedding = self._collect_leg(
+            "vector", embedding_future, start_time + settings.HYBRID_VECTOR_TIMEOUT_SECONDS
+        )
+        if query_embedding:
+            vector_results = self._vector_search_by_embedding(
+                query_embedding, doc_id, rev_id, scope_hint, top_k * 2, scope=scope
+            )
+            retrieval_leg_results.labels(
+                leg="vector", status="success" if vector_results else "empty"
+            ).inc()
+        
+        # 4. RRF 融合（某一路缺失时退化为单路）
+        # 范围过滤下推到 Meilisearch 后 BM25 为空，也可能是旧索引缺少 section_ids（未运行
+        # scripts/backfill_meilisearch_scope.py），同样视为降级，不缓存
+        degraded = (
+            bm25_results is None
+            or query_embedding is None
+            or (not bm25_results and bool(scope.section_ids))
         )
+        result_lists = [results for results in (bm25_results, vector_results) if results]
+        if not result_lists:
+            return [], degraded
+        
+        combined = self._reciprocal_rank_fusion(result_lists, k=60)
+        
+        return combined[:top_k], degraded
+    
+    def _collect_leg(self, leg: str, future: Future, deadline: float):
+        """在截止时间前获取单路召回结果，超时或失败返回 None"""
+        try:
+            result = future.result(timeout=max(deadline - time.time(), 0))
+        except FutureTimeoutError:
+            future.cancel()
+            retrieval_leg_results.labels(leg=leg, status="timeout").inc()
+            print(f"{leg} 召回超时，降级为单路检索")
+            return None
+        except Exception as e:
+            retrieval_leg_results.labels(leg=leg, status="error").inc()
+            print(f"{leg} 召回失败，降级为单路检索: {e}")
+            return None
         
-        return combined[:top_k]
+        if leg == "bm25":
+            retrieval_leg_results.labels(leg=leg, status="success" if result else "empty").inc()
+        return result
+    
+    def _resolve_scope(self, rev_id: str, scope_hint) -> ResolvedScope:
+        """
+        解析 scope_hint 为下推过滤条件
+        
+        heading 未匹配到任何章节时不做章节过滤（heading 仍用于加权），避免误过滤目标块
+        """
+        if not scope_hint:
+            return ResolvedScope()
+        try:
+            scope = resolve_scope(self.db, rev_id, scope_hint)
+        except Exception as e:
+            print(f"范围过滤解析失败，不下推过滤: {e}")
+            return ResolvedScope()
+        return scope.without_heading() if scope.is_empty else scope
     
     def _vector_search(
         self,
@@ -135,31 +419,70 @@ class HybridRetriever:
         doc_id: str,
         rev_id: str,
         scope_hint: Optional[ScopeHint],
-        top_k: int
+        top_k: int,
+        scope: Optional[ResolvedScope] = None
     ) -> List[BlockCandidate]:
         """向量相似度搜索"""
-        start_time = time.time()
         try:
             # 生成查询向量
             query_embedding = self.embedding_service.generate_embedding(query)
+        except Exception as e:
+            print(f"向量检索失败: {e}")
+            return []
+        
+        return self._vector_search_by_embedding(query_embedding, doc_id, rev_id, scope_hint, top_k, scope=scope)
+    
+    def _vector_search_by_embedding(
+        self,
+        query_embedding: List[float],
+        doc_id: str,
+        rev_id: str,
+        scope_hint: Optional[ScopeHint],
+        top_k: int,
+        scope: Optional[ResolvedScope] = None
+    ) -> List[BlockCandidate]:
+        """使用已生成的查询向量做相似度搜索"""
+        start_time = time.time()
+        try:
+            if scope is None:
+                scope = self._resolve_scope(rev_id, scope_hint)
+            
+            # 小文档：进程内向量矩阵精确检索
+            if get_settings().ENABLE_VECTOR_MATRIX_CACHE:
+                revision_matrix = get_vector_cache().get(self.db, doc_id, rev_id)
+                if revision_matrix is not None:
+                    return [
+                        self._build_vector_candidate(
+                            block_id=revision_matrix.block_ids[i],
+                            plain_text=revision_matrix.plain_texts[i],
+                            order_index=revision_matrix.order_indexes[i],
+                            block_type=revision_matrix.block_types[i],
+                            distance=distance,
+                            parent_heading=revision_matrix.parent_headings[i],
+                            scope_hint=scope_hint
+                        )
+                        for i, distance in revision_matrix.search(query_embedding, top_k, scope=scope)
+                    ]
             
             # 构建 SQL 查询
             rev_uuid = uuid.UUID(rev_id)
             
             # 将向量转换为字符串格式
-            embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
+            embedding_str = to_vector_literal(query_embedding)
             
-            # 使用余弦距离搜索 - 使用 format 构建 SQL
+            # 查询向量 cast 成列类型（halfvec/vector），否则无法命中 HNSW 索引
+            apply_hnsw_search_params(self.db)
             sql_query = f"""
                 SELECT 
                     bv.block_id,
                     bv.plain_text,
                     bv.order_index,
                     bv.block_type,
-                    bv.embedding <=> '{embedding_str}'::vector AS distance
+                    bv.embedding <=> '{embedding_str}'::{vector_sql_type()} AS distance
                 FROM block_versions bv
                 WHERE bv.rev_id = '{str(rev_uuid)}'::uuid
                     AND bv.embedding IS NOT NULL
+                    {scope.sql_conditions("bv")}
                 ORDER BY distance
                 LIMIT {top_k}
             """
@@ -167,46 +490,18 @@ class HybridRetriever:
             results = self.db.execute(text(sql_query)).fetchall()
             
             # 转换为 BlockCandidate
-            candidates = []
-            for row in results:
-                # 距离转换为分数（0-1）
-                score = 1.0 / (1.0 + row.distance)
-                
-                # 获取父级标题
-                parent_heading = self._get_parent_heading_by_id(str(row.block_id), rev_id)
-                
-                # 应用 scope_hint 加权
-                if scope_hint:
-                    heading = None
-                    if isinstance(scope_hint, dict):
-                        heading = scope_hint.get("heading")
-                    else:
-                        heading = getattr(scope_hint, "heading", None)
-                    
-                    if heading and parent_heading:
-                        if heading.lower() in parent_heading.lower():
-                            score += 0.3
-                    
-                    keywords = []
-                    if isinstance(scope_hint, dict):
-                        keywords = scope_hint.get("keywords", [])
-                    else:
-                        keywords = getattr(scope_hint, "keywords", [])
-                    
-                    for keyword in keywords:
-                        if normalize_text(keyword) in normalize_text(row.plain_text):
-                            score += 0.2
-                
-                candidates.append(BlockCandidate(
+            return [
+                self._build_vector_candidate(
                     block_id=str(row.block_id),
-                    snippet=row.plain_text[:200] if row.plain_text else '',
-                    heading_context=parent_heading or "（无标题）",
+                    plain_text=row.plain_text,
                     order_index=row.order_index,
-                    score=min(score, 1.0),
-                    block_type=row.block_type
-                ))
-            
-            return candidates
+                    block_type=row.block_type,
+                    distance=row.distance,
+                    parent_heading=self._get_parent_heading_by_id(str(row.block_id), rev_id),
+                    scope_hint=scope_hint
+                )
+                for row in results
+            ]
             
         except Exception as e:
             print(f"向量检索失败: {e}")
@@ -214,6 +509,51 @@ class HybridRetriever:
         finally:
             vector_search_duration.observe(time.time() - start_time)
     
+    def _build_vector_candidate(
+        self,
+        block_id: str,
+        plain_text: Optional[str],
+        order_index: int,
+        block_type: str,
+        distance: float,
+        parent_heading: Optional[str],
+        scope_hint: Optional[ScopeHint]
+    ) -> BlockCandidate:
+        """向量命中转换为 BlockCandidate（含 scope_hint 加权）"""
+        # 距离转换为分数（0-1）
+        score = 1.0 / (1.0 + distance)
+        
+        # 应用 scope_hint 加权
+        if scope_hint:
+            heading = None
+            if isinstance(scope_hint, dict):
+                heading = scope_hint.get("heading")
+            else:
+                heading = getattr(scope_hint, "heading", None)
+            
+            if heading and parent_heading:
+                if heading.lower() in parent_heading.lower():
+                    score += 0.3
+            
+            keywords = []
+            if isinstance(scope_hint, dict):
+                keywords = scope_hint.get("keywords", [])
+            else:
+                keywords = getattr(scope_hint, "keywords", [])
+            
+            for keyword in keywords:
+                if normalize_text(keyword) in normalize_text(plain_text or ""):
+                    score += 0.2
+        
+        return BlockCandidate(
+            block_id=block_id,
+            snippet=plain_text[:200] if plain_text else '',
+            heading_context=parent_heading or "（无标题）",
+            order_index=order_index,
+            score=min(score, 1.0),
+            block_type=block_type
+        )
+    
     def _reciprocal_rank_fusion(
         self,
         result_lists: List[List[BlockCandidate]],
@@ -263,115 +603,44 @@ class HybridRetriever:
         doc_id: str,
         rev_id: str,
         scope_hint: Optional[ScopeHint],
-        top_k: int
+        top_k: int,
+        scope: Optional[ResolvedScope] = None
     ) -> List[BlockCandidate]:
         """使用 Meilisearch 搜索"""
+        # 构建过滤器（block_type / heading_level / 章节范围下推到 Meilisearch）
+        if scope is None:
+            scope = self._resolve_scope(rev_id, scope_hint)
+        
+        results = self._fetch_meilisearch_hits(query, doc_id, rev_id, scope.meilisearch_filters(), top_k * 2)
+        return self._score_meilisearch_hits(results, scope_hint, top_k)
+    
+    def _fetch_meilisearch_hits(
+        self,
+        query: str,
+        doc_id: str,
+        rev_id: str,
+        filters: dict,
+        limit: int
+    ) -> List[dict]:
+        """Meilisearch 原始命中（不访问 self.db，可在线程池中执行）"""
         start_time = time.time()
         try:
-            # 构建过滤器
-            filters = {}
-            if scope_hint:
-                block_type = None
-                if isinstance(scope_hint, dict):
-                    block_type = scope_hint.get("block_type")
-                else:
-                    block_type = getattr(scope_hint, "block_type", None)
-                
-                if block_type:
-                    filters['block_type'] = block_type
-            
-            # 搜索
-            results = self.indexer.search(query, doc_id, rev_id, filters, top_k * 2)
-            
-            # 转换为 BlockCandidate
-            candidates = []
-            for result in results:
-                # 计算分数（Meilisearch 不直接返回分数，使用排名）
-                score = 1.0 / (results.index(result) + 1)
-                
-                # 如果有 heading 提示，增加权重
-                if scope_hint:
-                    heading = None
-                    if isinstance(scope_hint, dict):
-                        heading = scope_hint.get("heading")
-                    else:
-                        heading = getattr(scope_hint, "heading", None)
-                    
-                    if heading and heading.lower() in result.get('parent_heading_text', '').lower():
-                        score += 0.3
-                
-                # 如果有关键词提示，检查是否包含
-                if scope_hint:
-                    keywords = []
-                    if isinstance(scope_hint, dict):
-                        keywords = scope_hint.get("keywords", [])
-                    else:
-                        keywords = getattr(scope_hint, "keywords", [])
-                    
-                    for keyword in keywords:
-                        if normalize_text(keyword) in normalize_text(result.get('plain_text', '')):
-                            score += 0.2
-                
-                candidates.append(BlockCandidate(
-                    block_id=result['block_id'],
-                    snippet=result.get('plain_text', '')[:200],
-                    heading_context=result.get('parent_heading_text', '（无标题）'),
-                    order_index=result.get('order_index', 0),
-                    score=min(score, 1.0),
-                    block_type=result.get('block_type', 'paragraph')
-                ))
-            
-            # 按分数排序
-            candidates.sort(key=lambda x: x.score, reverse=True)
-            return candidates[:top_k]
+            return self.indexer.search(query, doc_id, rev_id, filters, limit)
         finally:
             meilisearch_query_duration.observe(time.time() - start_time)
-
-    def _simple_search(
+    
+    def _score_meilisearch_hits(
         self,
-        query: str,
-        doc_id: str,
-        rev_id: str,
+        results: List[dict],
         scope_hint: Optional[ScopeHint],
         top_k: int
     ) -> List[BlockCandidate]:
-        """简单的关键词匹配搜索（降级方案）"""
-        doc_uuid = uuid.UUID(doc_id)
-        rev_uuid = uuid.UUID(rev_id)
-        
-        # 获取所有块
-        blocks_query = self.db.query(db_models.BlockVersion).filter(
-            db_models.BlockVersion.rev_id == rev_uuid
-        )
-        
-        # 应用 scope_hint 过滤
-        if scope_hint:
-            block_type = None
-            if isinstance(scope_hint, dict):
-                block_type = scope_hint.get("block_type")
-            else:
-                block_type = getattr(scope_hint, "block_type", None)
-            
-            if block_type:
-                blocks_query = blocks_query.filter(
-                    db_models.BlockVersion.block_type == block_type
-                )
-        
-        blocks = blocks_query.order_by(db_models.BlockVersion.order_index).all()
-        
-        # 简单的关键词匹配评分
+        """Meilisearch 命中按排名打分并应用 scope_hint 加权"""
+        # 转换为 BlockCandidate
         candidates = []
-        query_normalized = normalize_text(query)
-        query_keywords = set(query_normalized.split())
-        
-        for block in blocks:
-            # 计算相关性分数
-            block_normalized = normalize_text(block.plain_text)
-            block_keywords = set(block_normalized.split())
-            
-            # 计算关键词重叠度
-            overlap = len(query_keywords & block_keywords)
-            score = overlap / max(len(query_keywords), 1)
+        for result in results:
+            # 计算分数（Meilisearch 不直接返回分数，使用排名）
+            score = 1.0 / (results.index(result) + 1)
             
             # 如果有 heading 提示，增加权重
             if scope_hint:
@@ -381,11 +650,8 @@ class HybridRetriever:
                 else:
                     heading = getattr(scope_hint, "heading", None)
                 
-                if heading:
-                    # 获取父级 heading
-                    parent_heading = self._get_parent_heading(block)
-                    if parent_heading and heading.lower() in parent_heading.lower():
-                        score += 0.3
+                if heading and heading.lower() in result.get('parent_heading_text', '').lower():
+                    score += 0.3
             
             # 如果有关键词提示，检查是否包含
             if scope_hint:
@@ -396,23 +662,91 @@ class HybridRetriever:
                     keywords = getattr(scope_hint, "keywords", [])
                 
                 for keyword in keywords:
-                    if normalize_text(keyword) in block_normalized:
+                    if normalize_text(keyword) in normalize_text(result.get('plain_text', '')):
                         score += 0.2
             
-            if score > 0:
-                candidates.append(BlockCandidate(
-                    block_id=str(block.block_id),
-                    snippet=block.plain_text[:200],
-                    heading_context=self._get_parent_heading(block) or "（无标题）",
-                    order_index=block.order_index,
-                    score=min(score, 1.0),
-                    block_type=block.block_type
-                ))
+            candidates.append(BlockCandidate(
+                block_id=result['block_id'],
+                snippet=result.get('plain_text', '')[:200],
+                heading_context=result.get('parent_heading_text', '（无标题）'),
+                order_index=result.get('order_index', 0),
+                score=min(score, 1.0),
+                block_type=result.get('block_type', 'paragraph')
+            ))
         
         # 按分数排序
         candidates.sort(key=lambda x: x.score, reverse=True)
-        
         return candidates[:top_k]
+
+    def _simple_search(
+        self,
+        query: str,
+        doc_id: str,
+        rev_id: str,
+        scope_hint: Optional[ScopeHint],
+        top_k: int,
+        scope: Optional[ResolvedScope] = None
+    ) -> List[BlockCandidate]:
+        """进程内 BM25 检索（降级方案，Meilisearch 不可用时使用）"""
+        index = get_bm25_index_cache().get(self.db, rev_id)
+        if scope is None:
+            scope = self._resolve_scope(rev_id, scope_hint)
+        
+        heading = None
+        keywords = []
+        if scope_hint:
+            if isinstance(scope_hint, dict):
+                heading = scope_hint.get("heading")
+                keywords = scope_hint.get("keywords", []) or []
+            else:
+                heading = getattr(scope_hint, "heading", None)
+                keywords = getattr(scope_hint, "keywords", []) or []
+        
+        # BM25 打分（只对范围内的块），归一化到 0-1
+        bm25_scores = index.search(query, scope=scope)
+        max_score = max(bm25_scores.values()) if bm25_scores else 0.0
+        scores = {
+            doc_index: score / max_score
+            for doc_index, score in bm25_scores.items()
+        } if max_score > 0 else {}
+        
+        # 如果有 heading 提示，增加权重
+        if heading:
+            heading_lower = heading.lower()
+            for doc_index, parent_heading in enumerate(index.parent_headings):
+                if not index.in_scope(doc_index, scope):
+                    continue
+                if parent_heading and heading_lower in parent_heading.lower():
+                    scores[doc_index] = scores.get(doc_index, 0.0) + 0.3
+        
+        # 如果有关键词提示，检查是否包含
+        for keyword in keywords:
+            keyword_tokens = tokenize(keyword)
+            for doc_index in list(scores):
+                if index.matches_all(doc_index, keyword_tokens):
+                    scores[doc_index] += 0.2
+        
+        # 按分数排序（同分时 BM25 原始分高者在前），只为 top_k 构建候选
+        ranked = sorted(
+            (
+                (min(score, 1.0), bm25_scores.get(doc_index, 0.0), doc_index)
+                for doc_index, score in scores.items()
+                if score > 0
+            ),
+            reverse=True
+        )[:top_k]
+        
+        return [
+            BlockCandidate(
+                block_id=index.block_ids[doc_index],
+                snippet=index.snippets[doc_index],
+                heading_context=index.parent_headings[doc_index] or "（无标题）",
+                order_index=index.order_indexes[doc_index],
+                score=score,
+                block_type=index.block_types[doc_index]
+            )
+            for score, _, doc_index in ranked
+        ]
     
     def _get_parent_heading_by_id(self, block_id: str, rev_id: str) -> Optional[str]:
         """通过 block_id 获取父级标题"""
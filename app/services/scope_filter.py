@@ -0,0 +1,167 @@
+"""
+scope_hint 过滤下推
+
+把 scope_hint 中的 heading / block_type / heading_level 解析成可下推的过滤条件，
+供 Meilisearch filter 字符串和 SQL WHERE 子句使用，避免先取回全部候选再在 Python 中过滤。
+
+heading 是模糊的章节名称，先在该 revision 的标题块中匹配，再展开为章节 id 集合
+（匹配到的标题及其所有子标题），按 parent_heading_block_id / section_ids 过滤。
+"""
+from typing import Any, Dict, List, Optional, Set
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.models import database as db_models
+
+
+def _hint_attr(scope_hint: Any, name: str):
+    """兼容 ScopeHint / dict / str（str 视为 heading）"""
+    if scope_hint is None:
+        return None
+    if isinstance(scope_hint, str):
+        return scope_hint if name == "heading" else None
+    if isinstance(scope_hint, dict):
+        return scope_hint.get(name)
+    return getattr(scope_hint, name, None)
+
+
+class ResolvedScope:
+    """解析后的范围过滤条件"""
+
+    def __init__(
+        self,
+        block_type: Optional[str] = None,
+        heading_level: Optional[int] = None,
+        section_ids: Optional[List[str]] = None,
+        subsection_ids: Optional[List[str]] = None
+    ):
+        self.block_type = block_type
+        self.heading_level = heading_level
+        # 匹配到的章节标题 id；None 表示没有 heading 约束，[] 表示 heading 未匹配任何章节
+        self.section_ids = section_ids
+        # 匹配章节及其所有子章节的标题 id（用于 parent_heading_block_id 过滤）
+        self.subsection_ids = subsection_ids
+        self._subsection_set: Set[str] = set(subsection_ids or [])
+
+    @property
+    def is_empty(self) -> bool:
+        """heading 约束存在但没有匹配章节，范围内必然没有块"""
+        return self.section_ids is not None and not self.section_ids
+
+    def without_heading(self) -> "ResolvedScope":
+        """去掉 heading 约束（heading 未匹配任何章节时，检索降级为只做加权）"""
+        return ResolvedScope(block_type=self.block_type, heading_level=self.heading_level)
+
+    def meilisearch_filters(self) -> Dict[str, Any]:
+        """转换为 MeilisearchIndexer.search 的 filters 参数"""
+        filters: Dict[str, Any] = {}
+        if self.block_type:
+            filters["block_type"] = self.block_type
+        if self.heading_level:
+            filters["heading_level"] = self.heading_level
+        if self.section_ids:
+            filters["section_ids"] = self.section_ids
+        return filters
+
+    def apply_to_query(self, query):
+        """应用到 BlockVersion 的 ORM 查询"""
+        BlockVersion = db_models.BlockVersion
+        if self.block_type:
+            query = query.filter(BlockVersion.block_type == self.block_type)
+        if self.heading_level:
+            query = query.filter(BlockVersion.heading_level == self.heading_level)
+        if self.subsection_ids:
+            query = query.filter(
+                BlockVersion.parent_heading_block_id.in_([uuid.UUID(i) for i in self.subsection_ids])
+            )
+        return query
+
+    def sql_conditions(self, alias: str = "bv") -> str:
+        """转换为原生 SQL 的 WHERE 条件（以 AND 开头，值已校验/转义）"""
+        conditions = []
+        if self.block_type:
+            block_type = self.block_type.replace("'", "''")
+            conditions.append(f"AND {alias}.block_type = '{block_type}'")
+        if self.heading_level:
+            conditions.append(f"AND {alias}.heading_level = {int(self.heading_level)}")
+        if self.subsection_ids:
+            ids = ", ".join(f"'{uuid.UUID(i)}'::uuid" for i in self.subsection_ids)
+            conditions.append(f"AND {alias}.parent_heading_block_id IN ({ids})")
+        return "\n".join(conditions)
+
+    def matches(
+        self,
+        block_type: Optional[str],
+        heading_level: Optional[int],
+        parent_heading_block_id: Optional[str]
+    ) -> bool:
+        """内存中的同等过滤（进程内索引使用）"""
+        if self.block_type and block_type != self.block_type:
+            return False
+        if self.heading_level and heading_level != self.heading_level:
+            return False
+        if self.subsection_ids is not None:
+            return parent_heading_block_id is not None and str(parent_heading_block_id) in self._subsection_set
+        return True
+
+
+def resolve_scope(db: Session, rev_id: str, scope_hint: Any) -> ResolvedScope:
+    """
+    解析 scope_hint 为可下推的过滤条件
+
+    Args:
+        db: 数据库会话
+        rev_id: 版本 ID
+        scope_hint: ScopeHint / dict / str
+
+    Returns:
+        ResolvedScope
+    """
+    block_type = _hint_attr(scope_hint, "block_type")
+    heading_level = _hint_attr(scope_hint, "heading_level")
+    heading = _hint_attr(scope_hint, "heading")
+
+    if not heading:
+        return ResolvedScope(block_type=block_type, heading_level=heading_level)
+
+    # 一次查询取出该 revision 的全部标题块（数量远小于块总数）
+    BlockVersion = db_models.BlockVersion
+    headings = db.query(
+        BlockVersion.block_id,
+        BlockVersion.parent_heading_block_id,
+        BlockVersion.plain_text
+    ).filter(
+        BlockVersion.rev_id == uuid.UUID(rev_id),
+        BlockVersion.block_type == "heading"
+    ).all()
+
+    heading_lower = heading.lower()
+    section_ids = [
+        str(row.block_id) for row in headings
+        if row.plain_text and heading_lower in row.plain_text.lower()
+    ]
+
+    # 展开子章节
+    children: Dict[str, List[str]] = {}
+    for row in headings:
+        if row.parent_heading_block_id:
+            children.setdefault(str(row.parent_heading_block_id), []).append(str(row.block_id))
+
+    subsection_ids: List[str] = []
+    seen: Set[str] = set()
+    stack = list(section_ids)
+    while stack:
+        block_id = stack.pop()
+        if block_id in seen:
+            continue
+        seen.add(block_id)
+        subsection_ids.append(block_id)
+        stack.extend(children.get(block_id, []))
+
+    return ResolvedScope(
+        block_type=block_type,
+        heading_level=heading_level,
+        section_ids=section_ids,
+        subsection_ids=subsection_ids
+    )
@@ -1,13 +1,16 @@
 """
 Meilisearch 索引管理 + Embedding 生成
 """
-from typing import List, Set
+from typing import List, Set, Tuple
 import meilisearch
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.models import database as db_models
 from app.config import get_settings
 from app.services.embedding import get_embedding_service
+from app.services.cache import get_cache_manager
+from app.services.rate_limiter import PRIORITY_BACKGROUND, llm_priority
+from app.db.vector import to_vector_literal, vector_sql_type
 import uuid
 
 settings = get_settings()
@@ -40,7 +43,8 @@ class MeilisearchIndexer:
             'rev_id',
             'block_type',
             'heading_level',
-            'char_count'
+            'char_count',
+            'section_ids'
         ])
         
         index.update_sortable_attributes([
@@ -82,7 +86,7 @@ class MeilisearchIndexer:
         for block in blocks:
             # 获取父级标题
             parent_heading_text = self._get_parent_heading(block, db)
-            heading_path = self._get_heading_path(block, db)
+            heading_path, section_ids = self._get_heading_ancestors(block, db)
             
             doc = {
                 'id': f"{block.block_id}_{rev_id}",
@@ -94,6 +98,8 @@ class MeilisearchIndexer:
                 'heading_level': block.heading_level,
                 'parent_heading_text': parent_heading_text or '',
                 'heading_path': heading_path,
+                'parent_heading_block_id': str(block.parent_heading_block_id) if block.parent_heading_block_id else None,
+                'section_ids': section_ids,
                 'plain_text': block.plain_text or '',
                 'content_md': block.content_md or '',
                 'char_count': len(block.plain_text or ''),
@@ -114,20 +120,25 @@ class MeilisearchIndexer:
         # 批量生成 embeddings 并存储到数据库
         if texts_for_embedding:
             try:
-                embeddings = self.embedding_service.generate_embeddings_batch(texts_for_embedding)
+                # 上传 / 批量修改后的重建索引均为后台优先级，不挤占交互式编辑的 embedding 配额
+                with llm_priority(PRIORITY_BACKGROUND):
+                    embeddings = self.embedding_service.generate_embeddings_batch(texts_for_embedding)
                 
                 # 批量更新数据库
                 for block_version_id, embedding in zip(block_version_ids, embeddings):
                     # 将向量转换为字符串格式
-                    embedding_str = '[' + ','.join(map(str, embedding)) + ']'
+                    embedding_str = to_vector_literal(embedding)
                     # 使用原生SQL，避免参数绑定问题
                     sql = f"""
                         UPDATE block_versions 
-                        SET embedding = '{embedding_str}'::vector
+                        SET embedding = '{embedding_str}'::{vector_sql_type()}
                         WHERE block_version_id = '{str(block_version_id)}'::uuid
                     """
                     db.execute(text(sql))
                 db.commit()
+                # embedding 已变化，丢弃该 revision 的向量矩阵和检索结果缓存
+                get_cache_manager().invalidate_vector_matrices(rev_ids=[rev_id])
+                get_cache_manager().invalidate_search_results(str(doc_id), str(rev_id))
                 print(f"✅ 成功生成并存储 {len(embeddings)} 个 embeddings")
             except Exception as e:
                 print(f"⚠️ Embedding 生成失败（不影响主流程）: {e}")
@@ -147,6 +158,9 @@ class MeilisearchIndexer:
         doc_uuid = uuid.UUID(doc_id)
         new_rev_uuid = uuid.UUID(new_rev_id)
         
+        # 新 revision 生成，旧 revision 的向量矩阵不再需要
+        get_cache_manager().invalidate_vector_matrices(doc_ids=[doc_id])
+        
         # 获取所有块数量
         total_blocks = db.query(db_models.BlockVersion).filter(
             db_models.BlockVersion.rev_id == new_rev_uuid
@@ -170,7 +184,7 @@ class MeilisearchIndexer:
         documents = []
         for block in changed_blocks:
             parent_heading_text = self._get_parent_heading(block, db)
-            heading_path = self._get_heading_path(block, db)
+            heading_path, section_ids = self._get_heading_ancestors(block, db)
             
             doc = {
                 'id': f"{block.block_id}_{new_rev_id}",
@@ -182,6 +196,8 @@ class MeilisearchIndexer:
                 'heading_level': block.heading_level,
                 'parent_heading_text': parent_heading_text or '',
                 'heading_path': heading_path,
+                'parent_heading_block_id': str(block.parent_heading_block_id) if block.parent_heading_block_id else None,
+                'section_ids': section_ids,
                 'plain_text': block.plain_text or '',
                 'content_md': block.content_md or '',
                 'char_count': len(block.plain_text or ''),
@@ -223,13 +239,41 @@ class MeilisearchIndexer:
         index = self.client.get_index(self.index_name)
         index.delete_documents({'filter': f'doc_id = {doc_id}'})
     
+    def backfill_scope_fields(self, doc_id: str, rev_id: str, db: Session) -> int:
+        """
+        为已索引的块补写范围过滤字段（parent_heading_block_id / section_ids）
+
+        只做部分更新，不重新生成 embedding；用于范围过滤下推之前索引的文档。
+
+        Returns:
+            更新的块数
+        """
+        blocks = db.query(db_models.BlockVersion).filter(
+            db_models.BlockVersion.rev_id == uuid.UUID(rev_id)
+        ).all()
+        
+        documents = []
+        for block in blocks:
+            _, section_ids = self._get_heading_ancestors(block, db)
+            documents.append({
+                'id': f"{block.block_id}_{rev_id}",
+                'parent_heading_block_id': str(block.parent_heading_block_id) if block.parent_heading_block_id else None,
+                'section_ids': section_ids,
+            })
+        
+        if documents:
+            index = self.client.get_index(self.index_name)
+            index.update_documents(documents)
+        return len(documents)
+    
     def search(
         self,
         query: str,
         doc_id: str,
         rev_id: str,
         filters: dict = None,
-        limit: int = 20
+        limit: int = 20,
+        offset: int = 0
     ) -> List[dict]:
         """搜索"""
         index = self.client.get_index(self.index_name)
@@ -238,9 +282,12 @@ class MeilisearchIndexer:
         filter_str = f'doc_id = {doc_id} AND rev_id = {rev_id}'
         if filters:
             if filters.get('block_type'):
-                filter_str += f' AND block_type = {filters["block_type"]}'
+                filter_str += f' AND block_type = {self._quote(filters["block_type"])}'
             if filters.get('heading_level'):
-                filter_str += f' AND heading_level = {filters["heading_level"]}'
+                filter_str += f' AND heading_level = {int(filters["heading_level"])}'
+            if filters.get('section_ids'):
+                section_ids = ", ".join(self._quote(section_id) for section_id in filters['section_ids'])
+                filter_str += f' AND section_ids IN [{section_ids}]'
         
         # 搜索
         results = index.search(
@@ -248,12 +295,19 @@ class MeilisearchIndexer:
             {
                 'filter': filter_str,
                 'limit': limit,
+                'offset': offset,
                 'attributesToRetrieve': ['*']
             }
         )
         
         return results['hits']
     
+    @staticmethod
+    def _quote(value) -> str:
+        """Meilisearch filter 字符串值转义"""
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        return f'"{escaped}"'
+    
     def _get_parent_heading(self, block: db_models.BlockVersion, db: Session) -> str:
         """获取父级标题"""
         if not block.parent_heading_block_id:
@@ -266,9 +320,10 @@ class MeilisearchIndexer:
         
         return parent.plain_text if parent else None
     
-    def _get_heading_path(self, block: db_models.BlockVersion, db: Session) -> List[str]:
-        """获取标题路径"""
+    def _get_heading_ancestors(self, block: db_models.BlockVersion, db: Session) -> Tuple[List[str], List[str]]:
+        """获取标题路径及对应的章节 id（由外到内）"""
         path = []
+        section_ids = []
         current_block = block
         
         while current_block and current_block.parent_heading_block_id:
@@ -279,11 +334,12 @@ class MeilisearchIndexer:
             
             if parent:
                 path.insert(0, parent.plain_text)
+                section_ids.insert(0, str(parent.block_id))
                 current_block = parent
             else:
                 break
         
-        return path
+        return path, section_ids
 
 
 # 全局实例
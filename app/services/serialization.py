@@ -0,0 +1,166 @@
+"""
+序列化层（缓存值 / 协同事件 / API 响应）
+
+- JSON：安装了 orjson 时使用 orjson（比标准库快数倍，直接输出 UTF-8 bytes），否则回退到 json
+- 缓存值：按 CACHE_SERIALIZER 选择 msgpack 或 JSON，超过 CACHE_COMPRESSION_MIN_BYTES 时用 zstd 压缩
+- 缓存值首字节为格式头，读取时按头部解码，切换编码或升级期间旧格式（无头部的 JSON 文本）仍可读取
+
+orjson / msgpack / zstandard 均为可选依赖，未安装时自动回退（JSON、不压缩）。
+"""
+from typing import Any, Optional, Union
+import json
+import threading
+
+from app.config import get_settings
+from app.monitoring.metrics import cache_serialized_bytes
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# 格式头：低 4 位为编码，最高位表示 zstd 压缩。
+# 0x01 / 0x02 / 0x81 / 0x82 都不是合法 JSON 文本的首字节，因此可以与旧格式区分
+_CODEC_JSON = 0x01
+_CODEC_MSGPACK = 0x02
+_FLAG_ZSTD = 0x80
+_CODEC_NAMES = {_CODEC_JSON: "json", _CODEC_MSGPACK: "msgpack"}
+
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson is not None else 0
+
+
+def dumps_json(value: Any) -> bytes:
+    """序列化为 UTF-8 JSON（无法序列化的对象转为 str，与 json.dumps(default=str) 一致）"""
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=_ORJSON_OPTIONS)
+    return json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def loads_json(data: Union[bytes, str]) -> Any:
+    """解析 JSON（bytes 或 str）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class CacheSerializer:
+    """缓存值编解码（msgpack / JSON + 可选 zstd 压缩）"""
+
+    def __init__(self, codec: str = "msgpack", compress_min_bytes: int = 4096, compression_level: int = 3):
+        """
+        Args:
+            codec: msgpack 或 json（未安装 msgpack 时回退到 json）
+            compress_min_bytes: 编码后超过该大小才压缩（0 表示不压缩，未安装 zstandard 时不压缩）
+            compression_level: zstd 压缩级别
+        """
+        if codec == "msgpack" and msgpack is None:
+            print("未安装 msgpack，缓存值使用 JSON 编码")
+            codec = "json"
+        self.codec = _CODEC_MSGPACK if codec == "msgpack" else _CODEC_JSON
+        self.compress_min_bytes = compress_min_bytes if zstandard is not None else 0
+        self.compression_level = compression_level
+        # ZstdCompressor / ZstdDecompressor 不能被多个线程同时使用，每个线程各持一份
+        self._local = threading.local()
+
+    def dumps(self, value: Any) -> bytes:
+        """编码为带格式头的 bytes"""
+        if self.codec == _CODEC_MSGPACK:
+            body = msgpack.packb(value, default=str, use_bin_type=True)
+        else:
+            body = dumps_json(value)
+
+        header = self.codec
+        if self.compress_min_bytes and len(body) >= self.compress_min_bytes:
+            compressed = self._compressor().compress(body)
+            # 压缩收益太小（如已压缩过的内容）时保留原文，省去读取时的解压
+            if len(compressed) < len(body) * 0.9:
+                body = compressed
+                header |= _FLAG_ZSTD
+
+        name = _CODEC_NAMES[self.codec] + ("+zstd" if header & _FLAG_ZSTD else "")
+        cache_serialized_bytes.labels(codec=name).observe(len(body) + 1)
+        return bytes((header,)) + body
+
+    def loads(self, data: Union[bytes, str], text: bool = False) -> Any:
+        """
+        解码缓存值
+
+        Args:
+            text: 无格式头的旧值按纯文本返回（用于 LLM 响应、导出等原本直接存字符串的 key），
+                否则按 JSON 解析
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not data:
+            return data.decode("utf-8") if text else None
+
+        header = data[0]
+        codec = header & ~_FLAG_ZSTD
+        if codec not in _CODEC_NAMES:
+            return data.decode("utf-8") if text else loads_json(data)
+
+        body = memoryview(data)[1:]
+        if header & _FLAG_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("缓存值使用 zstd 压缩，但未安装 zstandard")
+            body = self._decompressor().decompress(body)
+
+        if codec == _CODEC_MSGPACK:
+            if msgpack is None:
+                raise RuntimeError("缓存值使用 msgpack 编码，但未安装 msgpack")
+            return msgpack.unpackb(body, raw=False, strict_map_key=False)
+        return loads_json(bytes(body))
+
+    def _compressor(self):
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = zstandard.ZstdCompressor(level=self.compression_level)
+            self._local.compressor = compressor
+        return compressor
+
+    def _decompressor(self):
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = zstandard.ZstdDecompressor()
+            self._local.decompressor = decompressor
+        return decompressor
+
+
+def default_response_class():
+    """FastAPI 默认响应类：安装了 orjson 时使用 ORJSONResponse"""
+    from fastapi.responses import JSONResponse, ORJSONResponse
+
+    if orjson is not None and get_settings().ENABLE_ORJSON_RESPONSE:
+        return ORJSONResponse
+    return JSONResponse
+
+
+# 全局实例
+_cache_serializer: Optional[CacheSerializer] = None
+_cache_serializer_lock = threading.Lock()
+
+
+def get_cache_serializer() -> CacheSerializer:
+    """获取缓存序列化器单例"""
+    global _cache_serializer
+    if _cache_serializer is None:
+        with _cache_serializer_lock:
+            if _cache_serializer is None:
+                settings = get_settings()
+                _cache_serializer = CacheSerializer(
+                    codec=settings.CACHE_SERIALIZER,
+                    compress_min_bytes=settings.CACHE_COMPRESSION_MIN_BYTES,
+                    compression_level=settings.CACHE_COMPRESSION_LEVEL
+                )
+    return _cache_serializer
@@ -0,0 +1,292 @@
+"""
+进程内按 revision 缓存的向量矩阵
+
+小文档（块数不超过 VECTOR_MATRIX_CACHE_MAX_BLOCKS）按 rev_id 缓存一个
+L2 归一化的 float32 矩阵和块元数据，top-k 只需一次矩阵乘法，
+不再对 pgvector 做按 rev_id 过滤的扫描，也不再按命中逐条查询父级标题。
+缓存按字节数做 LRU 淘汰；revision 的 embedding 写入或文档产生新 revision 时失效
+（通过 CacheManager 的失效频道广播给所有 worker），并设有最长缓存时间兜底。
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+import uuid
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import database as db_models
+from app.monitoring.metrics import cache_hits, cache_misses, vector_matrix_cache_bytes
+
+
+# 没有 embedding 的 revision 的负缓存有效期：本进程写入 embedding 时会主动失效，
+# 其他 worker 写入时靠过期重新加载
+_EMPTY_ENTRY_TTL_SECONDS = 30.0
+
+def _to_array(embedding) -> np.ndarray:
+    """pgvector 返回值（ndarray / HalfVector / list）转 float32 数组"""
+    if hasattr(embedding, "to_numpy"):
+        embedding = embedding.to_numpy()
+    return np.asarray(embedding, dtype=np.float32)
+
+
+class RevisionVectorMatrix:
+    """单个 revision 的向量矩阵与块元数据"""
+
+    def __init__(
+        self,
+        doc_id: str,
+        rev_id: str,
+        matrix: np.ndarray,
+        block_ids: List[str],
+        plain_texts: List[str],
+        order_indexes: List[int],
+        block_types: List[str],
+        parent_headings: List[Optional[str]],
+        heading_levels: List[Optional[int]],
+        parent_heading_block_ids: List[Optional[str]],
+    ):
+        self.doc_id = doc_id
+        self.rev_id = rev_id
+        self.matrix = matrix
+        self.block_ids = block_ids
+        self.plain_texts = plain_texts
+        self.order_indexes = order_indexes
+        self.block_types = block_types
+        self.parent_headings = parent_headings
+        self.heading_levels = heading_levels
+        self.parent_heading_block_ids = parent_heading_block_ids
+        self.loaded_at = time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        # 元数据按文本长度粗略估算
+        text_bytes = sum(len(text or "") for text in self.plain_texts) * 3
+        return int(self.matrix.nbytes) + text_bytes
+
+    def search(self, query_embedding: List[float], top_k: int, scope=None) -> List[Tuple[int, float]]:
+        """
+        精确 top-k 检索
+
+        Args:
+            scope: ResolvedScope，只在范围内的块中检索
+
+        Returns:
+            [(行号, 余弦距离)]，距离定义与 pgvector `<=>` 一致（1 - 余弦相似度）
+        """
+        if not len(self.block_ids) or top_k <= 0:
+            return []
+
+        query = _to_array(query_embedding)
+        norm = float(np.linalg.norm(query))
+        if norm == 0.0:
+            return []
+
+        similarities = self.matrix @ (query / norm)
+        if scope is not None:
+            in_scope = np.fromiter(
+                (
+                    scope.matches(self.block_types[i], self.heading_levels[i], self.parent_heading_block_ids[i])
+                    for i in range(len(self.block_ids))
+                ),
+                dtype=bool,
+                count=len(self.block_ids)
+            )
+            candidate_indexes = np.flatnonzero(in_scope)
+            if not len(candidate_indexes):
+                return []
+        else:
+            candidate_indexes = np.arange(similarities.shape[0])
+
+        candidate_similarities = similarities[candidate_indexes]
+        k = min(top_k, candidate_similarities.shape[0])
+        if k < candidate_similarities.shape[0]:
+            top_positions = np.argpartition(-candidate_similarities, k - 1)[:k]
+        else:
+            top_positions = np.arange(candidate_similarities.shape[0])
+        top_positions = top_positions[np.argsort(-candidate_similarities[top_positions])]
+
+        return [
+            (int(candidate_indexes[p]), float(1.0 - candidate_similarities[p]))
+            for p in top_positions
+        ]
+
+
+class RevisionVectorCache:
+    """按 rev_id 缓存向量矩阵，按字节数做 LRU 淘汰"""
+
+    def __init__(self, max_bytes: int, max_blocks: int, ttl_seconds: float = 600):
+        self.max_bytes = max_bytes
+        self.max_blocks = max_blocks
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, RevisionVectorMatrix]" = OrderedDict()
+        self._oversized: Dict[str, str] = {}  # rev_id -> doc_id，超过块数阈值，不缓存
+        self._empty: Dict[str, Tuple[str, float]] = {}  # rev_id -> (doc_id, 过期时间)，尚无 embedding
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, doc_id: str, rev_id: str) -> Optional[RevisionVectorMatrix]:
+        """获取 revision 的向量矩阵，未缓存时加载；文档过大或没有 embedding 时返回 None"""
+        with self._lock:
+            entry = self._entries.get(rev_id)
+            if entry is not None and time.monotonic() - entry.loaded_at > self.ttl_seconds:
+                # 超过最长缓存时间（可能错过了其他 worker 写入 embedding 的失效广播），重新加载
+                self._total_bytes -= self._entries.pop(rev_id).nbytes
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(rev_id)
+                cache_hits.labels(cache_type="vector_matrix").inc()
+                return entry
+            if rev_id in self._oversized:
+                return None
+            empty = self._empty.get(rev_id)
+            if empty is not None:
+                if empty[1] > time.monotonic():
+                    return None
+                del self._empty[rev_id]
+
+        cache_misses.labels(cache_type="vector_matrix").inc()
+        entry = self._load(db, doc_id, rev_id)
+        if entry is None:
+            return None
+
+        with self._lock:
+            previous = self._entries.pop(rev_id, None)
+            if previous is not None:
+                self._total_bytes -= previous.nbytes
+            self._entries[rev_id] = entry
+            self._total_bytes += entry.nbytes
+            self._evict()
+
+        return entry
+
+    def invalidate(self, rev_id: str):
+        """revision 的 embedding 发生变化时调用"""
+        with self._lock:
+            entry = self._entries.pop(rev_id, None)
+            if entry is not None:
+                self._total_bytes -= entry.nbytes
+            self._oversized.pop(rev_id, None)
+            self._empty.pop(rev_id, None)
+            vector_matrix_cache_bytes.set(self._total_bytes)
+
+    def invalidate_document(self, doc_id: str):
+        """文档产生新 revision 时丢弃该文档所有旧 revision 的矩阵"""
+        with self._lock:
+            stale = [rev_id for rev_id, entry in self._entries.items() if entry.doc_id == doc_id]
+            for rev_id in stale:
+                self._total_bytes -= self._entries.pop(rev_id).nbytes
+            for rev_id in [r for r, d in self._oversized.items() if d == doc_id]:
+                del self._oversized[rev_id]
+            for rev_id in [r for r, (d, _) in self._empty.items() if d == doc_id]:
+                del self._empty[rev_id]
+            vector_matrix_cache_bytes.set(self._total_bytes)
+
+    def clear(self):
+        """丢弃全部条目（失效订阅断线重连后调用，断线期间可能错过失效消息）"""
+        with self._lock:
+            self._entries.clear()
+            self._oversized.clear()
+            self._empty.clear()
+            self._total_bytes = 0
+            vector_matrix_cache_bytes.set(0)
+
+    def _evict(self):
+        """超出字节上限时淘汰最久未使用的矩阵（调用方持有锁）"""
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.nbytes
+        vector_matrix_cache_bytes.set(self._total_bytes)
+
+    def _load(self, db: Session, doc_id: str, rev_id: str) -> Optional[RevisionVectorMatrix]:
+        """一次查询加载 revision 的全部块，父级标题在内存中解析"""
+        rev_uuid = uuid.UUID(rev_id)
+        BlockVersion = db_models.BlockVersion
+
+        block_count = db.query(BlockVersion).filter(BlockVersion.rev_id == rev_uuid).count()
+        if block_count > self.max_blocks:
+            with self._lock:
+                self._oversized[rev_id] = doc_id
+            return None
+
+        rows = db.query(
+            BlockVersion.block_id,
+            BlockVersion.plain_text,
+            BlockVersion.order_index,
+            BlockVersion.block_type,
+            BlockVersion.heading_level,
+            BlockVersion.parent_heading_block_id,
+            BlockVersion.embedding,
+        ).filter(
+            BlockVersion.rev_id == rev_uuid
+        ).order_by(BlockVersion.order_index).all()
+
+        heading_texts = {row.block_id: row.plain_text for row in rows}
+        vectors = []
+        block_ids, plain_texts, order_indexes, block_types, parent_headings = [], [], [], [], []
+        heading_levels, parent_heading_block_ids = [], []
+
+        for row in rows:
+            if row.embedding is None:
+                continue
+            vectors.append(_to_array(row.embedding))
+            block_ids.append(str(row.block_id))
+            plain_texts.append(row.plain_text or "")
+            order_indexes.append(row.order_index)
+            block_types.append(row.block_type)
+            parent_headings.append(
+                heading_texts.get(row.parent_heading_block_id) if row.parent_heading_block_id else None
+            )
+            heading_levels.append(row.heading_level)
+            parent_heading_block_ids.append(
+                str(row.parent_heading_block_id) if row.parent_heading_block_id else None
+            )
+
+        if not vectors:
+            # embedding 尚未生成（或生成失败），记录负缓存，避免每次检索都重新加载整个 revision
+            now = time.monotonic()
+            with self._lock:
+                for stale_rev_id in [r for r, (_, expires_at) in self._empty.items() if expires_at <= now]:
+                    del self._empty[stale_rev_id]
+                self._empty[rev_id] = (doc_id, now + _EMPTY_ENTRY_TTL_SECONDS)
+            return None
+
+        matrix = np.vstack(vectors).astype(np.float32, copy=False)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+
+        return RevisionVectorMatrix(
+            doc_id=doc_id,
+            rev_id=rev_id,
+            matrix=matrix,
+            block_ids=block_ids,
+            plain_texts=plain_texts,
+            order_indexes=order_indexes,
+            block_types=block_types,
+            parent_headings=parent_headings,
+            heading_levels=heading_levels,
+            parent_heading_block_ids=parent_heading_block_ids,
+        )
+
+
+# 全局实例
+_vector_cache: Optional[RevisionVectorCache] = None
+_vector_cache_lock = threading.Lock()
+
+
+def get_vector_cache() -> RevisionVectorCache:
+    """获取向量矩阵缓存单例"""
+    global _vector_cache
+    if _vector_cache is None:
+        with _vector_cache_lock:
+            if _vector_cache is None:
+                settings = get_settings()
+                _vector_cache = RevisionVectorCache(
+                    max_bytes=settings.VECTOR_MATRIX_CACHE_MAX_MB * 1024 * 1024,
+                    max_blocks=settings.VECTOR_MATRIX_CACHE_MAX_BLOCKS,
+                    ttl_seconds=settings.VECTOR_MATRIX_CACHE_TTL_SECONDS,
+                )
+    return _vector_cache
@@ -1,23 +1,59 @@
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
 import time
 import uuid
 
 from sqlalchemy.orm import Session
 
-from app.agents.edit_workflow_agents import create_edit_workflow_agents
-from app.agents.runtime import ensure_workflow_trace, get_trace_metadata
+from app.agents.edit_workflow_agents import get_shared_edit_workflow_agents
+from app.agents.runtime import (
+    emit_workflow_event,
+    ensure_workflow_trace,
+    get_trace_metadata,
+    set_event_listener,
+)
+from app.config import get_settings
+from app.db.connection import bind_session
 from app.models import database as db_models
-from app.models.schemas import CandidateResponse, ChatEditResponse
+from app.models.schemas import BlockCandidate, CandidateResponse, ChatEditResponse, Intent
 from app.monitoring.metrics import (
     edit_request_duration,
     edits_applied,
     edits_failed,
     edits_requested,
     workflow_duration,
+    workflow_checkpoints,
     workflow_runs_total,
 )
 from app.services.memory import MemoryService
-from app.skills.document_edit import DocumentEditSkillBundle
+from app.skills.document_edit import get_shared_skill_bundle
+
+
+# 没有选项的澄清（大范围修改 / 删除确认）只接受这些 user_selection 作为确认
+CLARIFICATION_CONFIRM_SELECTIONS = {"confirm", "yes", "ok", "确认", "继续", "是"}
+
+
+def export_revision(db: Session, rev_id: str, cache_manager=None) -> Optional[str]:
+    """
+    导出 revision 的 Markdown（按 rev_id 缓存，revision 创建后不再变化）
+
+    Returns:
+        Markdown 文本；revision 没有块时返回 None
+    """
+    if cache_manager:
+        cached = cache_manager.get_export(rev_id)
+        if cached is not None:
+            return cached
+
+    blocks = db.query(db_models.BlockVersion.content_md).filter(
+        db_models.BlockVersion.rev_id == uuid.UUID(rev_id)
+    ).order_by(db_models.BlockVersion.order_index).all()
+    if not blocks:
+        return None
+
+    markdown = "\n\n".join(block.content_md for block in blocks)
+    if cache_manager:
+        cache_manager.set_export(rev_id, markdown, ttl=get_settings().EXPORT_CACHE_TTL_SECONDS)
+    return markdown
 
 
 class EditWorkflow:
@@ -35,8 +71,9 @@ class EditWorkflow:
             except Exception:
                 self.cache = None
 
-        self.skill_bundle = DocumentEditSkillBundle(db, self.cache)
-        self.workflow_agents = create_edit_workflow_agents(self.skill_bundle)
+        # 技能 / 智能体进程内只构建一次，本次请求的 db 在 execute 中通过上下文绑定
+        self.skill_bundle = get_shared_skill_bundle()
+        self.workflow_agents = get_shared_edit_workflow_agents()
         self.memory_service = MemoryService(db, self.cache)
         self.last_trace: Dict[str, Any] = {
             "agents_used": [],
@@ -53,21 +90,38 @@ class EditWorkflow:
         user_id: str,
         user_message: str,
         user_selection: Optional[str] = None,
+        event_callback: Optional[Callable[[str, Any], None]] = None,
+    ) -> ChatEditResponse:
+        """
+        执行编辑工作流（集成 Langfuse 追踪）
+
+        event_callback 用于流式接口：按 (event, data) 推送阶段事件、检索候选和计划生成的 token。
+        """
+        with bind_session(self.db):
+            return self._execute(
+                doc_id,
+                session_id,
+                user_id,
+                user_message,
+                user_selection,
+                event_callback,
+            )
+
+    def _execute(
+        self,
+        doc_id: str,
+        session_id: str,
+        user_id: str,
+        user_message: str,
+        user_selection: Optional[str],
+        event_callback: Optional[Callable[[str, Any], None]],
     ) -> ChatEditResponse:
-        """执行编辑工作流（集成 Langfuse 追踪）"""
         workflow_name = "edit_workflow"
         started_at = time.time()
         operation_type = "unknown"
         terminal_status = "failed"
         request_recorded = False
         state: Dict[str, Any] = {}
-        memory_context = self.memory_service.build_memory_context(
-            user_id=user_id,
-            doc_id=doc_id,
-            session_id=session_id,
-            user_message=user_message,
-        )
-        self.last_memory_context = memory_context
 
         def ensure_edit_request_recorded() -> None:
             nonlocal request_recorded
@@ -128,6 +182,26 @@ class EditWorkflow:
                 error={"code": "doc_not_found", "message": "文档不存在"},
             )
 
+        # 澄清 / 消歧后的选择轮：从检查点恢复意图、记忆上下文和候选，跳过已完成的阶段
+        checkpoint = self._pop_checkpoint(session_id, doc_id, user_id, str(active_rev.rev_id), user_selection)
+        if checkpoint:
+            user_message = checkpoint["user_message"]
+            memory_context = {
+                "preferences": [],
+                "document_preferences": [],
+                "editing_rules": [],
+                "retrieved_memories": [],
+                **checkpoint["memory_context"],
+            }
+        else:
+            memory_context = self.memory_service.build_memory_context(
+                user_id=user_id,
+                doc_id=doc_id,
+                session_id=session_id,
+                user_message=user_message,
+            )
+        self.last_memory_context = memory_context
+
         state = {
             "doc_id": doc_id,
             "session_id": session_id,
@@ -148,20 +222,32 @@ class EditWorkflow:
             "memory_summary": memory_context["summary"],
         }
         ensure_workflow_trace(state)
+        set_event_listener(state, event_callback)
 
         try:
-            state = self.workflow_agents["intent_agent"].invoke(state)
-            operation_type = self._extract_operation_type(state)
-            ensure_edit_request_recorded()
-            if state.get("error"):
-                record_edit_failed(self._extract_error_type(state.get("error"), "intent_parse_error"))
-                terminal_status = "failed"
-                return self._handle_error(state)
+            resume_stage = checkpoint["stage"] if checkpoint else None
+            if resume_stage:
+                self._restore_checkpoint(state, checkpoint)
+                operation_type = self._extract_operation_type(state)
+                ensure_edit_request_recorded()
+            else:
+                if get_settings().ENABLE_SPECULATIVE_RETRIEVAL:
+                    self.skill_bundle.start_speculative_retrieval(state)
+
+                state = self.workflow_agents["intent_agent"].invoke(state)
+                operation_type = self._extract_operation_type(state)
+                ensure_edit_request_recorded()
+                if state.get("error"):
+                    record_edit_failed(self._extract_error_type(state.get("error"), "intent_parse_error"))
+                    terminal_status = "failed"
+                    return self._handle_error(state)
+
+                state = self.workflow_agents["clarify_agent"].invoke(state)
 
-            state = self.workflow_agents["clarify_agent"].invoke(state)
             if state.get("needs_clarification"):
                 clarification = state["clarification"]
                 terminal_status = "need_clarification"
+                self._save_checkpoint(state, "clarification")
                 self._sync_working_memory_snapshot(
                     session_id=session_id,
                     user_id=user_id,
@@ -182,9 +268,18 @@ class EditWorkflow:
                     },
                 )
 
-            state = self.workflow_agents["retrieval_agent"].invoke(state)
+            if resume_stage == "disambiguation":
+                # 候选已在上一轮检索，只需按用户选择确定目标（不调用 LLM）
+                retrieval_agent = self.workflow_agents["retrieval_agent"]
+                state = retrieval_agent.skills["verify_targets"].execute(state)
+            else:
+                state = self.workflow_agents["retrieval_agent"].invoke(state)
             candidates = state.get("candidates", [])
             selection = state.get("selection")
+            if event_callback:
+                emit_workflow_event(state, "candidates", [
+                    self._candidate_response(c).model_dump() for c in candidates
+                ])
 
             if not candidates:
                 record_edit_failed("no_candidates")
@@ -206,6 +301,7 @@ class EditWorkflow:
 
             if selection and selection.need_user_disambiguation:
                 terminal_status = "need_disambiguation"
+                self._save_checkpoint(state, "disambiguation")
                 self._sync_working_memory_snapshot(
                     session_id=session_id,
                     user_id=user_id,
@@ -221,12 +317,7 @@ class EditWorkflow:
                     status="need_disambiguation",
                     session_id=session_id,
                     candidates=[
-                        CandidateResponse(
-                            block_id=c.block_id,
-                            snippet=c.snippet,
-                            heading_context=c.heading_context,
-                            order_index=c.order_index,
-                        )
+                        self._candidate_response(c)
                         for c in selection.candidates_for_user
                     ],
                     message="找到多个可能的位置，请选择要修改的段落",
@@ -268,7 +359,7 @@ class EditWorkflow:
                 if warnings:
                     warning_msgs = []
                     for warning in warnings:
-                        if warning["type"] == "semantic_conflict":
+                        if warning["type"] in ("semantic_conflict", "conflict_check_incomplete"):
                             warning_msgs.append(f"⚠️ {warning['message']}")
                     if warning_msgs:
                         message += "\n\n" + "\n".join(warning_msgs)
@@ -357,6 +448,9 @@ class EditWorkflow:
                 error={"code": "workflow_error", "message": str(exc)},
             )
         finally:
+            speculative = state.pop("_speculative_recall", None) if state else None
+            if speculative:
+                speculative.discard()
             self.last_trace = get_trace_metadata(state) if state else {
                 "agents_used": [],
                 "skills_used": [],
@@ -386,6 +480,118 @@ class EditWorkflow:
                 except Exception:
                     pass
 
+    def _save_checkpoint(self, state: Dict[str, Any], stage: str) -> None:
+        """在澄清 / 消歧中断点保存工作流状态（模糊请求需要用户重新描述，不保存）"""
+        settings = get_settings()
+        if not settings.ENABLE_WORKFLOW_CHECKPOINTS or not self.cache:
+            return
+        clarification = state.get("clarification") or {}
+        if stage == "clarification" and clarification.get("type") == "ambiguous":
+            return
+
+        intent = state.get("intent")
+        payload = {
+            "stage": stage,
+            "doc_id": state["doc_id"],
+            "user_id": state["user_id"],
+            "active_rev_id": state["active_rev_id"],
+            "user_message": state["user_message"],
+            # 只保存可序列化的部分（偏好 / 规则 / 记忆是 ORM 对象，恢复轮只用到 prompt_context）；
+            # prompt_context 取状态中的值，保留上一轮恢复时追加的澄清选择
+            "memory_context": {
+                "prompt_context": state.get("memory_context", ""),
+                "summary": self.last_memory_context.get("summary") or {},
+                "working_memory": self.last_memory_context.get("working_memory") or {},
+            },
+            "intent": intent.model_dump() if hasattr(intent, "model_dump") else intent,
+            "clarification": clarification if stage == "clarification" else None,
+            "candidates": [
+                c.model_dump() if hasattr(c, "model_dump") else c
+                for c in state.get("candidates", [])
+            ],
+        }
+        try:
+            saved = self.cache.store_workflow_checkpoint(
+                state["session_id"],
+                payload,
+                ttl=settings.WORKFLOW_CHECKPOINT_TTL_SECONDS,
+            )
+        except Exception as exc:
+            print(f"工作流检查点保存失败: {exc}")
+            saved = False
+        if saved:
+            workflow_checkpoints.labels(stage=stage, outcome="saved").inc()
+
+    def _pop_checkpoint(
+        self,
+        session_id: str,
+        doc_id: str,
+        user_id: str,
+        active_rev_id: str,
+        user_selection: Optional[str],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        取出可恢复的检查点
+
+        检查点一次性使用：每个请求都会取走它，只有带 user_selection 的选择轮、
+        且文档版本未变化、选择与上一轮给出的选项匹配时才从检查点继续。
+        """
+        if not get_settings().ENABLE_WORKFLOW_CHECKPOINTS or not self.cache:
+            return None
+        try:
+            checkpoint = self.cache.pop_workflow_checkpoint(session_id)
+        except Exception as exc:
+            print(f"工作流检查点读取失败: {exc}")
+            return None
+        if not checkpoint:
+            return None
+
+        stage = checkpoint.get("stage")
+        if (
+            not user_selection
+            or checkpoint.get("doc_id") != doc_id
+            or checkpoint.get("user_id") != user_id
+            or checkpoint.get("active_rev_id") != active_rev_id
+        ):
+            workflow_checkpoints.labels(stage=stage, outcome="stale").inc()
+            return None
+
+        if stage == "disambiguation":
+            valid_choices = {str(c.get("block_id")) for c in checkpoint.get("candidates", [])}
+        else:
+            valid_choices = {o.get("id") for o in (checkpoint.get("clarification") or {}).get("options", [])}
+        if valid_choices:
+            accepted = user_selection in valid_choices
+        else:
+            # 没有选项的澄清（大范围修改 / 删除确认）必须显式确认，“取消”等其他选择不能继续执行
+            accepted = user_selection.strip().lower() in CLARIFICATION_CONFIRM_SELECTIONS
+        if not accepted:
+            workflow_checkpoints.labels(stage=stage, outcome="stale").inc()
+            return None
+
+        workflow_checkpoints.labels(stage=stage, outcome="resumed").inc()
+        return checkpoint
+
+    def _restore_checkpoint(self, state: Dict[str, Any], checkpoint: Dict[str, Any]) -> None:
+        """把检查点中的意图和候选恢复到状态中"""
+        state["intent"] = Intent.model_validate(checkpoint["intent"])
+        state["candidates"] = [BlockCandidate.model_validate(c) for c in checkpoint.get("candidates", [])]
+        state["needs_clarification"] = False
+
+        clarification = checkpoint.get("clarification")
+        if clarification:
+            choice = next(
+                (o for o in clarification.get("options", []) if o.get("id") == state["user_selection"]),
+                None,
+            )
+            state["user_clarification"] = {"type": clarification.get("type"), "choice": choice}
+            # 澄清选择不是候选块 ID，避免校验阶段把它当作用户选中的块
+            state["user_selection"] = None
+            if choice:
+                state["memory_context"] = "\n\n".join(
+                    part for part in (state.get("memory_context"), f"用户澄清：{choice['label']}") if part
+                )
+
     def _handle_error(self, state: Dict[str, Any]) -> ChatEditResponse:
         """处理错误"""
         error = state.get("error")
@@ -430,6 +636,22 @@ class EditWorkflow:
             error={"code": "unknown_error", "message": str(error) if error else "未知错误"},
         )
 
+    def _candidate_response(self, candidate: Any) -> CandidateResponse:
+        """候选块转为响应模型（兼容字典形式）"""
+        if isinstance(candidate, dict):
+            return CandidateResponse(
+                block_id=str(candidate.get("block_id")),
+                snippet=candidate.get("snippet", ""),
+                heading_context=candidate.get("heading_context", ""),
+                order_index=candidate.get("order_index", 0),
+            )
+        return CandidateResponse(
+            block_id=candidate.block_id,
+            snippet=candidate.snippet,
+            heading_context=candidate.heading_context,
+            order_index=candidate.order_index,
+        )
+
     def _extract_operation_type(self, state: Dict[str, Any]) -> str:
         """从状态中提取编辑操作类型"""
         intent = state.get("intent")
@@ -449,12 +671,7 @@ class EditWorkflow:
 
     def _export_document(self, rev_id: str) -> str:
         """导出文档"""
-        blocks = self.db.query(db_models.BlockVersion).filter(
-            db_models.BlockVersion.rev_id == uuid.UUID(rev_id)
-        ).order_by(db_models.BlockVersion.order_index).all()
-
-        markdown_parts = [block.content_md for block in blocks]
-        return "\n\n".join(markdown_parts)
+        return export_revision(self.db, rev_id, self.cache) or ""
 
     def _sync_working_memory_snapshot(
         self,
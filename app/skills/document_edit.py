@@ -1,10 +1,13 @@
 """
 Document editing skills used by workflow agents.
 """
-from typing import Any, Dict
+import threading
+from typing import Any, Dict, Optional
 
 from sqlalchemy.orm import Session
 
+from app.db.connection import request_session
+
 from app.models.schemas import TargetSelection
 from app.nodes.apply import ApplyEditsNode
 from app.nodes.intent_clarifier import IntentClarifierNode
@@ -29,6 +32,15 @@ class DocumentEditSkillBundle:
         self.preview_generator = PreviewGeneratorNode(db, cache_manager)
         self.apply_node = ApplyEditsNode(db)
 
+    def start_speculative_retrieval(self, state: Dict[str, Any]) -> None:
+        """Kick off recall on the raw message while intent parsing runs."""
+        state["_speculative_recall"] = self.retriever.start_speculative(
+            state["user_message"],
+            state["doc_id"],
+            state["active_rev_id"],
+            top_k=10,
+        )
+
     def parse_intent(self, state: Dict[str, Any]) -> Dict[str, Any]:
         return self.intent_parser(state)
 
@@ -43,6 +55,7 @@ class DocumentEditSkillBundle:
             rev_id=state["active_rev_id"],
             scope_hint=intent.scope_hint,
             top_k=10,
+            speculative=state.pop("_speculative_recall", None),
         )
         state["candidates"] = candidates
         return state
@@ -67,3 +80,23 @@ class DocumentEditSkillBundle:
 
     def apply_edits(self, state: Dict[str, Any]) -> Dict[str, Any]:
         return self.apply_node(state)
+
+
+_shared_bundle: Optional[DocumentEditSkillBundle] = None
+_shared_bundle_lock = threading.Lock()
+
+
+def get_shared_skill_bundle() -> DocumentEditSkillBundle:
+    """Process-wide skill bundle; the session is bound per request via bind_session()."""
+    global _shared_bundle
+    if _shared_bundle is None:
+        with _shared_bundle_lock:
+            if _shared_bundle is None:
+                from app.services.cache import get_cache_manager
+
+                try:
+                    cache = get_cache_manager()
+                except Exception:
+                    cache = None
+                _shared_bundle = DocumentEditSkillBundle(request_session, cache)
+    return _shared_bundle
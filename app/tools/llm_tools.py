@@ -78,7 +78,7 @@ class ParseIntentTool(BaseTool):
         ]
         
         try:
-            response = llm.chat_completion_json(messages, temperature=0.3)
+            response = llm.chat_completion_json(messages, temperature=0.3, span_name="intent_parser")
             result = json.loads(response)
             return result
         except Exception as e:
@@ -125,7 +125,7 @@ class VerifyTargetTool(BaseTool):
         ]
         
         try:
-            response = llm.chat_completion_json(messages, temperature=0.3)
+            response = llm.chat_completion_json(messages, temperature=0.3, span_name="verify_target")
             result = json.loads(response)
             return result
         except Exception as e:
@@ -234,7 +234,7 @@ class CheckSemanticConflictTool(BaseTool):
         ]
         
         try:
-            response = llm.chat_completion_json(messages, temperature=0.3)
+            response = llm.chat_completion_json(messages, temperature=0.3, span_name="semantic_conflict")
             result = json.loads(response)
             return result
         except Exception as e:
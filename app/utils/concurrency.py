@@ -0,0 +1,60 @@
+"""
+阻塞调用卸载 - 把同步的 DB / LLM / Meilisearch / Redis 调用移出事件循环
+
+async 接口中的同步工作统一提交到有界线程池执行，单个慢 LLM 调用不再阻塞同一 worker 上的其他请求。
+线程数应不超过数据库连接池容量（DB_POOL_SIZE + DB_MAX_OVERFLOW），避免线程等待连接。
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+import contextvars
+import threading
+import time
+
+from app.config import get_settings
+from app.monitoring.metrics import blocking_pool_inflight, blocking_pool_wait_seconds
+
+
+_blocking_executor: Optional[ThreadPoolExecutor] = None
+_blocking_executor_lock = threading.Lock()
+
+
+def get_blocking_executor() -> ThreadPoolExecutor:
+    """获取阻塞调用线程池单例"""
+    global _blocking_executor
+    if _blocking_executor is None:
+        with _blocking_executor_lock:
+            if _blocking_executor is None:
+                _blocking_executor = ThreadPoolExecutor(
+                    max_workers=get_settings().BLOCKING_POOL_MAX_WORKERS,
+                    thread_name_prefix="blocking-io"
+                )
+    return _blocking_executor
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    在有界线程池中执行同步函数并等待结果（保留 contextvars）
+    
+    Args:
+        func: 同步函数
+        *args, **kwargs: 参数
+    
+    Returns:
+        函数返回值（异常原样抛出）
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    submitted_at = time.perf_counter()
+
+    def _run():
+        # 排队时间反映线程池是否饱和
+        blocking_pool_wait_seconds.observe(time.perf_counter() - submitted_at)
+        blocking_pool_inflight.inc()
+        try:
+            return context.run(func, *args, **kwargs)
+        finally:
+            blocking_pool_inflight.dec()
+
+    return await loop.run_in_executor(get_blocking_executor(), _run)
+
@@ -5,7 +5,7 @@
 运行此脚本将：
 1. 启用 pgvector 扩展
 2. 添加 embedding 列到 block_versions 表
-3. 创建 HNSW 索引
+3. 创建 HNSW 索引（按 VECTOR_STORAGE_TYPE / HNSW_M 配置）
 """
 import sys
 import os
@@ -13,7 +13,9 @@ import os
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from app.config import get_settings
 from app.db.connection import get_db
+from app.db.vector import vector_cosine_ops, vector_sql_type
 from sqlalchemy import text
 
 
@@ -44,9 +46,9 @@ def add_vector_support():
         else:
             # 添加 embedding 列
             print("2️⃣ 添加 embedding 列到 block_versions 表...")
-            db.execute(text("""
+            db.execute(text(f"""
                 ALTER TABLE block_versions 
-                ADD COLUMN embedding vector(1536)
+                ADD COLUMN embedding {vector_sql_type()}
             """))
             db.commit()
             print("✅ embedding 列已添加")
@@ -56,7 +58,7 @@ def add_vector_support():
             SELECT indexname 
             FROM pg_indexes 
             WHERE tablename = 'block_versions' 
-            AND indexname = 'idx_block_versions_embedding'
+            AND indexname = 'idx_block_versions_embedding_hnsw'
         """)
         result = db.execute(check_index).fetchone()
         
@@ -65,10 +67,12 @@ def add_vector_support():
         else:
             # 创建 HNSW 索引
             print("3️⃣ 创建 HNSW 索引（这可能需要几分钟）...")
-            db.execute(text("""
-                CREATE INDEX idx_block_versions_embedding 
+            settings = get_settings()
+            db.execute(text(f"""
+                CREATE INDEX idx_block_versions_embedding_hnsw 
                 ON block_versions 
-                USING hnsw (embedding vector_cosine_ops)
+                USING hnsw (embedding {vector_cosine_ops()})
+                WITH (m = {settings.HNSW_M}, ef_construction = {settings.HNSW_EF_CONSTRUCTION})
             """))
             db.commit()
             print("✅ HNSW 索引已创建")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+为已有的 Meilisearch 索引补写范围过滤字段
+
+范围过滤下推（section_ids / parent_heading_block_id）之前索引的块没有这两个字段，
+带章节范围的检索在这些文档上 BM25 召回为空。本脚本按 revision 做部分更新，
+不重新生成 embedding。
+
+用法:
+    python scripts/backfill_meilisearch_scope.py [doc_id]
+
+    如果不指定 doc_id，将处理所有文档（只处理活跃版本）
+"""
+import os
+import sys
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.connection import get_db
+from app.models import database as db_models
+from app.services.search_indexer import get_indexer
+import uuid
+
+
+def backfill(doc_id: str = None):
+    """补写范围过滤字段"""
+    db = next(get_db())
+    indexer = get_indexer()
+    
+    try:
+        if doc_id:
+            docs = db.query(db_models.Document).filter(
+                db_models.Document.doc_id == uuid.UUID(doc_id)
+            ).all()
+            if not docs:
+                print(f"❌ 文档 {doc_id} 不存在")
+                return
+        else:
+            docs = db.query(db_models.Document).all()
+        
+        print(f"📚 找到 {len(docs)} 个文档需要处理")
+        
+        total = 0
+        for doc in docs:
+            active_rev = db.query(db_models.DocumentActiveRevision).filter(
+                db_models.DocumentActiveRevision.doc_id == doc.doc_id
+            ).first()
+            if not active_rev:
+                print(f"⚠️ 文档 {doc.doc_id} 没有活跃版本，跳过")
+                continue
+            
+            count = indexer.backfill_scope_fields(str(doc.doc_id), str(active_rev.rev_id), db)
+            total += count
+            print(f"   ✅ {doc.title} ({doc.doc_id}): {count} 个块")
+        
+        print(f"\n🎉 完成，共更新 {total} 个块（Meilisearch 异步处理更新任务，稍后生效）")
+        
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    doc_id = sys.argv[1] if len(sys.argv) > 1 else None
+    backfill(doc_id)
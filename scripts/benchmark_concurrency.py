@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+并发基准测试：N 个并发编辑请求下的吞吐与事件循环阻塞
+
+对每个并发级别：
+1. 以 N 个并发 worker 持续发送 /v1/chat/edit 请求，统计 requests/sec 与延迟 p50 / p95
+2. 同时每 50ms 探测一次 /health，探测延迟反映事件循环是否被同步调用阻塞
+   （同步 LLM / DB 调用直接跑在 async 接口里时，/health 会随编辑请求一起排队）
+
+用法:
+    python scripts/benchmark_concurrency.py --doc-id <uuid> [--base-url http://localhost:8001]
+        [--username traffic_test_user --password test123456] [--concurrency 1,4,16]
+        [--requests 32] [--message "把第一段的'旧词'改成'新词'"]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+async def _login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post(
+        "/v1/auth/login",
+        data={"username": username, "password": password},
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def _probe_health(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list):
+    """持续探测 /health 延迟"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get("/health")
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.05)
+
+
+async def _run_level(client: httpx.AsyncClient, headers: dict, args, concurrency: int) -> dict:
+    """运行一个并发级别"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/v1/chat/edit",
+                    json={"doc_id": args.doc_id, "message": args.message},
+                    headers=headers,
+                )
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    stop = asyncio.Event()
+    health_latencies: list = []
+    probe = asyncio.create_task(_probe_health(client, stop, health_latencies))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+
+    return {
+        "concurrency": concurrency,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": _percentile(latencies, 0.50),
+        "p95": _percentile(latencies, 0.95),
+        "errors": errors,
+        "health_p50": _percentile(health_latencies, 0.50),
+        "health_p95": _percentile(health_latencies, 0.95),
+        "health_max": max(health_latencies) if health_latencies else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="并发编辑吞吐基准测试")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--username", default="traffic_test_user")
+    parser.add_argument("--password", default="test123456")
+    parser.add_argument("--doc-id", required=True)
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=32, help="每个并发级别的请求总数")
+    parser.add_argument("--message", default="把第一段改得更简洁一些")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    print("=" * 78)
+    print("⚡ 并发编辑基准测试")
+    print("=" * 78)
+    print(f"服务: {args.base_url}  文档: {args.doc_id}  每级请求数: {args.requests}")
+
+    limits = httpx.Limits(max_connections=max(levels) + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        token = await _login(client, args.username, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        results = []
+        for concurrency in levels:
+            print(f"\n🚀 并发 {concurrency} ...")
+            result = await _run_level(client, headers, args, concurrency)
+            results.append(result)
+            print(
+                f"   {result['rps']:.2f} req/s  p50 {result['p50'] * 1000:.0f}ms  "
+                f"p95 {result['p95'] * 1000:.0f}ms  错误 {result['errors']}"
+            )
+            print(
+                f"   /health 探测 p50 {result['health_p50'] * 1000:.1f}ms  "
+                f"p95 {result['health_p95'] * 1000:.1f}ms  max {result['health_max'] * 1000:.1f}ms"
+            )
+
+    print("\n" + "=" * 78)
+    print(f"{'并发':>6} {'req/s':>10} {'p50(ms)':>10} {'p95(ms)':>10} {'错误':>6} {'health p95(ms)':>16}")
+    for result in results:
+        print(
+            f"{result['concurrency']:>6} {result['rps']:>10.2f} {result['p50'] * 1000:>10.0f} "
+            f"{result['p95'] * 1000:>10.0f} {result['errors']:>6} {result['health_p95'] * 1000:>16.1f}"
+        )
+    if len(results) > 1 and results[0]["rps"]:
+        speedup = results[-1]["rps"] / results[0]["rps"]
+        print(f"\n📈 并发 {results[-1]['concurrency']} 相对并发 {results[0]['concurrency']} 吞吐提升 {speedup:.2f}x")
+    print("💡 health p95 接近网络往返时间说明事件循环未被阻塞；随并发线性增长说明仍有同步调用跑在事件循环上")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
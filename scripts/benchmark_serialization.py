@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+序列化基准测试：缓存值 / API 响应的体积与编解码 CPU 开销
+
+对比以下编码方式（未安装的依赖自动跳过）：
+1. json：标准库 json.dumps / json.loads（改造前的缓存与响应编码）
+2. orjson：API 响应、协同事件与 JSON 缓存值
+3. msgpack：缓存值默认编码
+4. msgpack+zstd / orjson+zstd：超过 CACHE_COMPRESSION_MIN_BYTES 的缓存值
+
+样本为本地构造的典型载荷（不访问 Redis / 数据库）：块版本、检索结果、会话工作记忆、
+带完整 preview 与 workflow_trace 的确认 token。
+
+用法:
+    python scripts/benchmark_serialization.py [--iterations 2000] [--blocks 40]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.serialization import CacheSerializer, msgpack, orjson, zstandard
+
+
+_PARAGRAPH = (
+    "本合同自双方签字盖章之日起生效，有效期为三年。任何一方如需提前终止合同，"
+    "应提前三十日书面通知对方，并结清已发生的费用。"
+)
+
+
+def _block(index: int) -> dict:
+    return {
+        "block_id": str(uuid.uuid4()),
+        "rev_id": str(uuid.uuid4()),
+        "block_type": "paragraph",
+        "heading_context": f"第{index // 5 + 1}章 / 第{index + 1}条",
+        "content_md": _PARAGRAPH * 3,
+        "order_index": index,
+        "parent_heading": f"第{index // 5 + 1}章",
+    }
+
+
+def _build_samples(blocks: int) -> dict:
+    block_list = [_block(i) for i in range(blocks)]
+    preview = {
+        "diffs": [
+            {
+                "block_id": block["block_id"],
+                "op_type": "replace",
+                "before_snippet": block["content_md"],
+                "after_snippet": block["content_md"].replace("三年", "五年"),
+                "heading_context": block["heading_context"],
+            }
+            for block in block_list
+        ],
+        "total_changes": blocks,
+    }
+    workflow_trace = [
+        {
+            "node": node,
+            "duration_ms": 123.4 + i,
+            "started_at": datetime.utcnow(),
+            "output": {"candidates": [block["block_id"] for block in block_list[:10]]},
+        }
+        for i, node in enumerate(["intent", "clarify", "retrieve", "verify", "plan", "preview"])
+    ]
+    return {
+        "block_version": block_list[0],
+        "search_results": [
+            {"block_id": block["block_id"], "score": 0.87, "snippet": block["content_md"][:120]}
+            for block in block_list[:10]
+        ],
+        "working_memory": {
+            "session_id": str(uuid.uuid4()),
+            "turns": [
+                {"role": "user", "content": "把所有三年改成五年", "created_at": datetime.utcnow()}
+                for _ in range(20)
+            ],
+            "summary": _PARAGRAPH * 4,
+        },
+        "confirm_token": {
+            "doc_id": str(uuid.uuid4()),
+            "rev_id": str(uuid.uuid4()),
+            "edit_plan": {"changes": preview["diffs"]},
+            "preview": preview,
+            "workflow_trace": workflow_trace,
+        },
+    }
+
+
+def _codecs() -> list:
+    """(名称, 编码函数, 解码函数)"""
+    codecs = [(
+        "json",
+        lambda value: json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"),
+        json.loads,
+    )]
+    if orjson is not None:
+        codecs.append(("orjson", CacheSerializer("json", compress_min_bytes=0).dumps, CacheSerializer("json").loads))
+    if msgpack is not None:
+        codecs.append(("msgpack", CacheSerializer("msgpack", compress_min_bytes=0).dumps, CacheSerializer("msgpack").loads))
+    if zstandard is not None:
+        codec = "msgpack" if msgpack is not None else "json"
+        serializer = CacheSerializer(codec, compress_min_bytes=4096)
+        codecs.append((f"{'msgpack' if msgpack is not None else 'orjson'}+zstd", serializer.dumps, serializer.loads))
+    return codecs
+
+
+def _measure(fn, arg, iterations: int) -> float:
+    """平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="序列化基准测试")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--blocks", type=int, default=40, help="确认 token 中 preview 的 diff 条数")
+    args = parser.parse_args()
+
+    samples = _build_samples(args.blocks)
+    codecs = _codecs()
+
+    print("=" * 78)
+    print("📦 序列化基准测试")
+    print("=" * 78)
+    print(f"已启用: {', '.join(name for name, _, _ in codecs)}")
+    missing = [name for name, module in (("orjson", orjson), ("msgpack", msgpack), ("zstandard", zstandard)) if module is None]
+    if missing:
+        print(f"⚠️  未安装 {', '.join(missing)}，对应编码已跳过")
+    print(f"每项迭代 {args.iterations} 次\n")
+
+    print(f"{'载荷':<16} {'编码':<14} {'体积(B)':>10} {'体积比':>8} {'编码(µs)':>10} {'解码(µs)':>10}")
+    for sample_name, value in samples.items():
+        baseline_size = None
+        for codec_name, dumps, loads in codecs:
+            encoded = dumps(value)
+            size = len(encoded)
+            baseline_size = baseline_size or size
+            encode_us = _measure(dumps, value, args.iterations)
+            decode_us = _measure(loads, encoded, args.iterations)
+            print(
+                f"{sample_name:<16} {codec_name:<14} {size:>10} {size / baseline_size:>8.2f} "
+                f"{encode_us:>10.1f} {decode_us:>10.1f}"
+            )
+        print()
+
+    print("💡 体积比以标准库 json 为基准；zstd 只压缩编码后超过 4096 字节的值，小值与 msgpack 相同")
+    print("💡 API 响应与协同事件使用 orjson 行的编码耗时（响应不压缩）")
+
+
+if __name__ == "__main__":
+    main()
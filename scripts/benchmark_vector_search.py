@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+向量检索基准测试：HNSW 近似检索 vs 精确检索
+
+对比指标：
+1. recall@k（以全精度 vector 精确检索结果为基准）
+2. 查询延迟 p50 / p95
+3. embedding 列存储大小
+
+用法:
+    python scripts/benchmark_vector_search.py [--table block_versions] [--k 10]
+        [--queries 50] [--ef-search 20,40,80,160] [--rev-id <uuid>]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.config import get_settings
+from app.db.connection import get_db
+from app.db.vector import apply_hnsw_search_params, vector_sql_type
+
+ID_COLUMNS = {
+    "block_versions": "block_version_id",
+    "user_memory_items": "memory_id",
+}
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _sample_queries(db, table: str, id_column: str, rev_id: str, limit: int):
+    """从已有 embedding 中抽样作为查询向量"""
+    rev_filter = "AND rev_id = CAST(:rev_id AS uuid)" if rev_id else ""
+    rows = db.execute(
+        text(f"""
+            SELECT {id_column} AS row_id, embedding::text AS embedding
+            FROM {table}
+            WHERE embedding IS NOT NULL {rev_filter}
+            ORDER BY random()
+            LIMIT :limit
+        """),
+        {"limit": limit, "rev_id": rev_id},
+    ).fetchall()
+    return [row.embedding for row in rows]
+
+
+def _run_query(db, table: str, id_column: str, embedding: str, cast: str, k: int, rev_id: str):
+    rev_filter = "AND rev_id = CAST(:rev_id AS uuid)" if rev_id else ""
+    start = time.perf_counter()
+    rows = db.execute(
+        text(f"""
+            SELECT {id_column} AS row_id
+            FROM {table}
+            WHERE embedding IS NOT NULL {rev_filter}
+            ORDER BY embedding{cast} <=> CAST(:embedding AS {cast.lstrip(':') or vector_sql_type()})
+            LIMIT :k
+        """),
+        {"embedding": embedding, "k": k, "rev_id": rev_id},
+    ).fetchall()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return [row.row_id for row in rows], elapsed_ms
+
+
+def _exact_search(db, table, id_column, embedding, k, rev_id):
+    """精确检索：禁用索引扫描，并以全精度 vector 计算距离"""
+    dimensions = get_settings().EMBEDDING_DIMENSIONS
+    db.execute(text("SET LOCAL enable_indexscan = off"))
+    try:
+        return _run_query(db, table, id_column, embedding, f"::vector({dimensions})", k, rev_id)
+    finally:
+        db.rollback()
+
+
+def _ann_search(db, table, id_column, embedding, k, rev_id, ef_search):
+    """近似检索：按配置的存储类型命中 HNSW 索引"""
+    apply_hnsw_search_params(db, ef_search)
+    try:
+        return _run_query(db, table, id_column, embedding, "", k, rev_id)
+    finally:
+        db.rollback()
+
+
+def _storage_stats(db, table: str):
+    row = db.execute(
+        text(f"""
+            SELECT
+                count(embedding) AS vectors,
+                COALESCE(avg(pg_column_size(embedding)), 0) AS avg_bytes,
+                pg_size_pretty(pg_total_relation_size('{table}')) AS table_size
+            FROM {table}
+        """)
+    ).fetchone()
+    index_rows = db.execute(
+        text("""
+            SELECT indexname, pg_size_pretty(pg_relation_size(indexname::regclass)) AS size
+            FROM pg_indexes
+            WHERE tablename = :table AND indexdef ILIKE '%hnsw%'
+        """),
+        {"table": table},
+    ).fetchall()
+    return row, index_rows
+
+
+def benchmark(table: str, k: int, queries: int, ef_values, rev_id: str = None):
+    settings = get_settings()
+    id_column = ID_COLUMNS[table]
+    db = next(get_db())
+
+    try:
+        print(f"🧪 向量检索基准测试: {table}")
+        print(f"   存储类型: {vector_sql_type()}  m={settings.HNSW_M}  ef_construction={settings.HNSW_EF_CONSTRUCTION}")
+
+        stats, index_rows = _storage_stats(db, table)
+        print(f"   向量数: {stats.vectors}  平均每向量: {float(stats.avg_bytes):.0f} B  表总大小: {stats.table_size}")
+        for index_row in index_rows:
+            print(f"   索引 {index_row.indexname}: {index_row.size}")
+
+        samples = _sample_queries(db, table, id_column, rev_id, queries)
+        db.rollback()
+        if not samples:
+            print("⚠️ 没有可用的 embedding，请先运行 scripts/regenerate_embeddings.py")
+            return
+
+        # 1. 精确检索基准
+        exact_results = []
+        exact_latencies = []
+        for embedding in samples:
+            ids, elapsed_ms = _exact_search(db, table, id_column, embedding, k, rev_id)
+            exact_results.append(set(ids))
+            exact_latencies.append(elapsed_ms)
+
+        print(f"\n{'模式':<20}{'recall@' + str(k):>12}{'p50 ms':>10}{'p95 ms':>10}")
+        print(f"{'exact (vector)':<20}{1.0:>12.3f}{statistics.median(exact_latencies):>10.2f}"
+              f"{_percentile(exact_latencies, 0.95):>10.2f}")
+
+        # 2. 不同 ef_search 下的 HNSW 检索
+        for ef_search in ef_values:
+            recalls = []
+            latencies = []
+            for embedding, expected in zip(samples, exact_results):
+                ids, elapsed_ms = _ann_search(db, table, id_column, embedding, k, rev_id, ef_search)
+                latencies.append(elapsed_ms)
+                if expected:
+                    recalls.append(len(expected & set(ids)) / len(expected))
+            recall = statistics.mean(recalls) if recalls else 0.0
+            label = f"hnsw ef={ef_search}"
+            print(f"{label:<20}{recall:>12.3f}{statistics.median(latencies):>10.2f}"
+                  f"{_percentile(latencies, 0.95):>10.2f}")
+
+        print("\n📝 根据 recall / 延迟权衡调整 HNSW_EF_SEARCH（当前默认 "
+              f"{settings.HNSW_EF_SEARCH}）")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HNSW vs 精确检索基准测试")
+    parser.add_argument("--table", choices=sorted(ID_COLUMNS), default="block_versions")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--ef-search", default="20,40,80,160")
+    parser.add_argument("--rev-id", default=None, help="只在指定 revision 内检索")
+    args = parser.parse_args()
+    if args.rev_id and args.table != "block_versions":
+        parser.error("--rev-id 只适用于 block_versions（user_memory_items 没有 rev_id 列）")
+
+    benchmark(
+        table=args.table,
+        k=args.k,
+        queries=args.queries,
+        ef_values=[int(value) for value in args.ef_search.split(",") if value.strip()],
+        rev_id=args.rev_id,
+    )
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+工作流构建开销基准测试：每个请求新建 vs 进程内构建一次
+
+对比两种方式下单个请求在真正执行前的构建耗时（不访问数据库、不调用 LLM）：
+1. per-request：每次新建 DocumentEditSkillBundle / 工作流智能体 / LangChain 工具 / LangGraph 图
+   （即改造前 /v1/chat/edit 与 LangGraphWorkflowExecutor 的行为）
+2. shared：EditWorkflow / LangGraphWorkflowExecutor 复用进程内共享的技能、智能体与编译后的图，
+   只通过 bind_session 绑定本次请求的 db
+
+用法:
+    python scripts/benchmark_workflow_construction.py [--iterations 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.agents.clarify_agent import create_clarify_agent
+from app.agents.edit_workflow_agents import create_edit_workflow_agents
+from app.agents.intent_agent import create_intent_agent
+from app.agents.retrieval_agent import create_retrieval_agent
+from app.agents.router_agent import create_router_agent
+from app.db.connection import SessionLocal, bind_session
+from app.nodes.apply import ApplyEditsNode
+from app.nodes.planner import EditPlannerNode
+from app.nodes.preview import PreviewGeneratorNode
+from app.services.cache import get_cache_manager
+from app.services.langgraph_workflow import LangGraphWorkflowExecutor, create_workflow
+from app.services.memory import MemoryService
+from app.services.workflow import EditWorkflow
+from app.skills.document_edit import DocumentEditSkillBundle
+
+
+def _per_request_edit_workflow(db, cache):
+    bundle = DocumentEditSkillBundle(db, cache)
+    create_edit_workflow_agents(bundle)
+    MemoryService(db, cache)
+
+
+def _per_request_langgraph(db, cache):
+    create_workflow()
+    # 改造前每个节点调用都会新建智能体（含 LangChain 工具实例）和编辑节点
+    create_intent_agent(db)
+    create_router_agent(db)
+    create_clarify_agent(db)
+    create_retrieval_agent(db)
+    EditPlannerNode(db)
+    PreviewGeneratorNode(db, None)
+    ApplyEditsNode(db)
+
+
+def _shared_edit_workflow(db, cache):
+    with bind_session(db):
+        EditWorkflow(db, cache)
+
+
+def _shared_langgraph(db, cache):
+    with bind_session(db):
+        LangGraphWorkflowExecutor(db)
+
+
+def _measure(fn, iterations: int, cache) -> dict:
+    durations = []
+    for _ in range(iterations):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            fn(db, cache)
+            durations.append(time.perf_counter() - start)
+        finally:
+            db.close()
+    durations.sort()
+    return {
+        "mean": statistics.mean(durations),
+        "p50": durations[len(durations) // 2],
+        "p95": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工作流构建开销基准测试")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    cache = get_cache_manager()
+
+    # 预热：导入、单例（LLM 客户端、索引器、Embedding 服务）与共享组件在计时前完成初始化
+    for fn in (_per_request_edit_workflow, _per_request_langgraph, _shared_edit_workflow, _shared_langgraph):
+        _measure(fn, 3, cache)
+
+    print("=" * 72)
+    print("🏗️  工作流构建开销基准测试")
+    print("=" * 72)
+    print(f"每种方式迭代 {args.iterations} 次\n")
+
+    cases = [
+        ("EditWorkflow", _per_request_edit_workflow, _shared_edit_workflow),
+        ("LangGraph", _per_request_langgraph, _shared_langgraph),
+    ]
+
+    print(f"{'工作流':<14} {'方式':<12} {'mean(ms)':>10} {'p50(ms)':>10} {'p95(ms)':>10}")
+    for name, before_fn, after_fn in cases:
+        before = _measure(before_fn, args.iterations, cache)
+        after = _measure(after_fn, args.iterations, cache)
+        for label, result in (("per-request", before), ("shared", after)):
+            print(
+                f"{name:<14} {label:<12} {result['mean'] * 1000:>10.3f} "
+                f"{result['p50'] * 1000:>10.3f} {result['p95'] * 1000:>10.3f}"
+            )
+        if after["mean"]:
+            print(f"   📉 {name} 单请求构建耗时降低 {before['mean'] / after['mean']:.1f}x")
+
+    print("\n💡 LangGraph 的 per-request 数字只含一次智能体构建；改造前每个节点调用都会重新构建，实际开销更高")
+
+
+if __name__ == "__main__":
+    main()
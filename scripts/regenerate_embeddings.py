@@ -16,6 +16,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.db.connection import get_db
 from app.models import database as db_models
 from app.services.embedding import get_embedding_service
+from app.db.vector import to_vector_literal, vector_sql_type
 from sqlalchemy import text
 import uuid
 
@@ -86,13 +87,13 @@ def regenerate_embeddings(doc_id: str = None):
             print(f"   💾 保存到数据库...")
             for block_version_id, embedding in zip(block_version_ids, embeddings):
                 db.execute(
-                    text("""
+                    text(f"""
                         UPDATE block_versions 
-                        SET embedding = :embedding::vector
+                        SET embedding = CAST(:embedding AS {vector_sql_type()})
                         WHERE block_version_id = :block_version_id
                     """),
                     {
-                        'embedding': str(embedding),
+                        'embedding': to_vector_literal(embedding),
                         'block_version_id': block_version_id
                     }
                 )
@@ -0,0 +1,118 @@
+"""
+进程内 BM25 索引测试（Meilisearch 不可用时的降级检索）
+
+不需要数据库：索引直接从行数据构建，缓存测试替换 _build。
+"""
+from unittest import mock
+
+import pytest
+
+from app.services.bm25_index import BM25IndexCache, RevisionBM25Index, tokenize
+
+
+def _row(block_id, text, block_type="paragraph", parent=None):
+    return (block_id, text, 0, block_type, None, None, parent)
+
+
+def _index(*texts):
+    return RevisionBM25Index.build(
+        "rev",
+        [_row(f"b{i}", text) for i, text in enumerate(texts)]
+    )
+
+
+class TestTokenize:
+    """中文按 bigram 切分，英文 / 数字按单词"""
+
+    def test_chinese_bigrams(self):
+        assert tokenize("付款条款") == ["付款", "款条", "条款"]
+
+    def test_single_chinese_char_is_kept(self):
+        assert tokenize("由 甲 签署") == ["由", "甲", "签署"]
+
+    def test_english_is_lowercased(self):
+        assert tokenize("API Gateway v2_beta") == ["api", "gateway", "v2_beta"]
+
+    def test_mixed_and_punctuation(self):
+        assert tokenize("第3章：Redis缓存，TTL=600") == ["第", "3", "章", "redis", "缓存", "ttl", "600"]
+
+    def test_empty(self):
+        assert tokenize("") == []
+        assert tokenize(None) == []
+
+
+class TestBM25Scoring:
+    """BM25 打分与过滤"""
+
+    def test_only_matching_blocks_are_scored(self):
+        index = _index("付款条款约定", "交付时间安排", "违约责任")
+        scores = index.search("付款条款")
+        assert set(scores) == {0}
+        assert scores[0] > 0
+
+    def test_rare_term_outweighs_common_term(self):
+        index = _index("合同 付款", "合同 违约", "合同 交付", "合同 保密")
+        assert index.search("违约")[1] > index.search("合同")[1]
+        scores = index.search("合同 违约")
+        assert max(scores, key=scores.get) == 1
+
+    def test_shorter_block_wins_at_equal_frequency(self):
+        index = _index(
+            "违约责任",
+            "违约责任以及与本合同有关的其他各项约定和附件说明",
+            "保密义务"
+        )
+        scores = index.search("违约")
+        assert scores[0] > scores[1]
+
+    def test_term_frequency_increases_score(self):
+        index = _index("redis redis redis cache", "redis cache other words", "unrelated text here now")
+        scores = index.search("redis")
+        assert scores[0] > scores[1]
+
+    def test_scope_filters_blocks(self):
+        index = RevisionBM25Index.build("rev", [
+            _row("b0", "付款条款", block_type="paragraph"),
+            _row("b1", "付款条款", block_type="table"),
+        ])
+        scope = mock.Mock()
+        scope.matches.side_effect = lambda block_type, level, parent: block_type == "table"
+        assert set(index.search("付款", scope=scope)) == {1}
+
+    def test_matches_all(self):
+        index = _index("付款条款约定", "付款时间", "条款说明")
+        tokens = tokenize("付款条款")
+        assert index.matches_all(0, tokens)
+        assert not index.matches_all(1, tokens)
+        assert not index.matches_all(0, [])
+
+    def test_empty_revision(self):
+        assert RevisionBM25Index.build("rev", []).search("付款") == {}
+
+
+class TestBM25IndexCache:
+    """按 rev_id 缓存，按字节数 LRU 淘汰"""
+
+    def test_builds_once_and_evicts_least_recent(self):
+        size = _index("付款条款").nbytes
+        cache = BM25IndexCache(max_bytes=size * 2)
+        built = []
+
+        def build(db, rev_id):
+            built.append(rev_id)
+            return _index("付款条款")
+
+        with mock.patch.object(cache, "_build", side_effect=build):
+            cache.get(None, "r1")
+            cache.get(None, "r2")
+            cache.get(None, "r1")
+            cache.get(None, "r3")
+            cache.get(None, "r1")
+            cache.get(None, "r2")
+
+        assert built == ["r1", "r2", "r3", "r2"]
+        assert cache._total_bytes <= cache.max_bytes
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,120 @@
+"""
+批量修改应用路径测试
+
+覆盖数据库内执行的前置判断（正则可移植性、替换文本）与 preview_hash 不一致时的回退，
+不需要数据库：数据库内执行与 Python 应用均用 mock 替代。
+"""
+import re
+from unittest import mock
+
+import pytest
+
+from app.nodes.bulk_apply import BulkPreviewMismatchError, sql_replacement_for
+from app.services.bulk_edit import BulkEditPipeline, build_bulk_intent
+from app.services.discovery import is_portable_regex
+
+
+class TestPortableRegex:
+    """Python re 与 PostgreSQL ARE 语义一致的正则才在数据库内执行"""
+
+    @pytest.mark.parametrize("pattern", [
+        "旧词",
+        "v[0-9]+",
+        "产品A|产品B",
+        "a{2,3}",
+        "[]a]",
+        "x\\.y",
+    ])
+    def test_portable(self, pattern):
+        assert is_portable_regex(pattern)
+
+    @pytest.mark.parametrize("pattern", [
+        "",
+        "\\bfoo\\b",   # ARE 中 \b 是退格
+        "\\d+",
+        "(?i)foo",
+        "[[:alpha:]]",
+        "a{,3}",
+        "a+?",
+        "a.b",         # ARE 中 . 匹配换行
+        "[^a]",        # ARE 中取反字符类匹配换行
+        "^foo",
+        "foo$",
+    ])
+    def test_not_portable(self, pattern):
+        assert not is_portable_regex(pattern)
+
+
+class TestSqlReplacement:
+    """替换文本在 regexp_replace 与 re.sub 中的语义差异"""
+
+    def test_ampersand_is_literal_in_both(self):
+        # ARE 中只有 \\& 表示整个匹配，单独的 & 与 Python 一样是字面字符
+        intent = build_bulk_intent("regex", {"pattern": "旧词", "replacement": "A&B"})
+        assert sql_replacement_for(intent) is not None
+        assert re.sub("旧词", "A&B", "含旧词") == "含A&B"
+
+    @pytest.mark.parametrize("replacement", ["\\&", "\\1", "新\\\\词"])
+    def test_backslash_replacement_uses_python(self, replacement):
+        intent = build_bulk_intent("regex", {"pattern": "(旧)词", "replacement": replacement})
+        assert sql_replacement_for(intent) is None
+
+    def test_non_portable_pattern_uses_python(self):
+        intent = build_bulk_intent("regex", {"pattern": "\\b旧词", "replacement": "新词"})
+        assert sql_replacement_for(intent) is None
+
+    def test_exact_term(self):
+        intent = build_bulk_intent("exact_term", {"term": "50%off", "replacement": "半价"})
+        condition, _, _, params = sql_replacement_for(intent)
+        assert "LIKE" in condition
+        assert params["bulk_like"] == "%50\\%off%"
+
+
+class TestPreviewHashFallback:
+    """数据库内替换与预览不一致时回滚并改走 Python 路径"""
+
+    def _apply(self, pipeline, node):
+        with mock.patch("app.services.bulk_edit.BulkApplyNode") as node_cls:
+            node_cls.return_value = node
+            node_cls.supports_in_database.return_value = True
+            return pipeline.apply(
+                build_bulk_intent("regex", {"pattern": "旧词", "replacement": "新词"}),
+                "doc", "rev", 3,
+                user_id="user",
+                preview_hash="confirmed",
+                expected_changes=1
+            )
+
+    def _pipeline(self, recomputed_hash):
+        pipeline = BulkEditPipeline(mock.Mock())
+        pipeline.collect_changes = mock.Mock(return_value=({"block": "新词"}, recomputed_hash))
+        return pipeline
+
+    def test_falls_back_to_python(self):
+        node = mock.Mock()
+        node.apply_in_database.side_effect = BulkPreviewMismatchError("不一致")
+        node.apply_bulk_changes.return_value = {"success": True}
+
+        assert self._apply(self._pipeline("confirmed"), node) == {"success": True}
+        node.apply_bulk_changes.assert_called_once()
+        assert node.apply_bulk_changes.call_args[0][0] == {"block": "新词"}
+
+    def test_fallback_still_checks_preview_hash(self):
+        node = mock.Mock()
+        node.apply_in_database.side_effect = BulkPreviewMismatchError("不一致")
+
+        with pytest.raises(BulkPreviewMismatchError):
+            self._apply(self._pipeline("changed"), node)
+        node.apply_bulk_changes.assert_not_called()
+
+    def test_in_database_result_is_used(self):
+        node = mock.Mock()
+        node.apply_in_database.return_value = {"success": True, "changes_applied": 1}
+        pipeline = self._pipeline("confirmed")
+
+        assert self._apply(pipeline, node)["changes_applied"] == 1
+        pipeline.collect_changes.assert_not_called()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
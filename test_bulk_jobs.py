@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+测试多文档批量修改任务
+
+运行前确保：
+1. 系统正在运行
+2. 已创建管理员账号（scripts/create_admin_noninteractive.py）
+"""
+import time
+
+import requests
+
+API_BASE = "http://localhost:8001"
+
+
+def login():
+    """登录并返回认证头"""
+    response = requests.post(
+        f"{API_BASE}/v1/auth/login",
+        json={"username": "admin", "password": "admin123"}
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"登录失败: {response.text}")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def upload(headers, title, content):
+    """上传文档并返回 doc_id"""
+    response = requests.post(
+        f"{API_BASE}/v1/docs/upload",
+        data={"title": title, "content": content},
+        headers=headers
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"上传失败: {response.text}")
+    return response.json()["doc_id"]
+
+
+def wait_for_job(headers, job_id, statuses, timeout=60):
+    """轮询任务状态直到进入 statuses 之一"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = requests.get(f"{API_BASE}/v1/chat/bulk-jobs/{job_id}", headers=headers)
+        assert response.status_code == 200, response.text
+        job = response.json()
+        if job["status"] in statuses:
+            return job
+        time.sleep(1)
+    raise TimeoutError(f"任务 {job_id} 未在 {timeout} 秒内进入 {statuses}")
+
+
+def test_bulk_job():
+    """测试多文档任务：发现 → 预览 → 部分确认 → 应用"""
+    print("🧪 测试多文档批量修改任务\n")
+    headers = login()
+
+    print("1️⃣ 上传测试文档...")
+    doc_a = upload(headers, "任务测试文档 A", "# 文档 A\n\n甲公司负责交付。\n\n甲公司负责运维。\n")
+    doc_b = upload(headers, "任务测试文档 B", "# 文档 B\n\n合同由甲公司签署。\n")
+    doc_c = upload(headers, "任务测试文档 C", "# 文档 C\n\n这里没有需要修改的内容。\n")
+    print(f"✅ 已上传 3 个文档\n")
+
+    print("2️⃣ 创建批量任务...")
+    response = requests.post(
+        f"{API_BASE}/v1/chat/bulk-jobs",
+        json={
+            "message": "将所有'甲公司'替换为'乙公司'",
+            "match_type": "exact_term",
+            "scope_filter": {"term": "甲公司", "replacement": "乙公司"},
+            "doc_ids": [doc_a, doc_b, doc_c]
+        },
+        headers=headers
+    )
+    assert response.status_code == 200, response.text
+    job_id = response.json()["job_id"]
+    print(f"✅ 任务已创建: {job_id}\n")
+
+    print("3️⃣ 等待发现 / 预览完成...")
+    job = wait_for_job(headers, job_id, {"awaiting_confirm", "no_changes", "failed"})
+    assert job["status"] == "awaiting_confirm", job
+    documents = job["documents"]
+    assert documents[doc_a]["status"] == "previewed"
+    assert documents[doc_a]["total_changes"] == 2
+    assert documents[doc_b]["status"] == "previewed"
+    assert documents[doc_c]["status"] == "no_changes"
+    assert "owner" not in job
+    print(f"✅ 进度: {job['progress']}\n")
+
+    print("4️⃣ 文档级 token 可分页预览，但不能通过单文档接口确认...")
+    entry = documents[doc_a]
+    page = requests.post(
+        f"{API_BASE}/v1/chat/bulk-preview",
+        json={"session_id": job_id, "doc_id": doc_a, "confirm_token": entry["confirm_token"], "cursor": 0},
+        headers=headers
+    )
+    assert page.status_code == 200, page.text
+    rejected = requests.post(
+        f"{API_BASE}/v1/chat/bulk-confirm",
+        json={
+            "session_id": job_id,
+            "doc_id": doc_a,
+            "confirm_token": entry["confirm_token"],
+            "preview_hash": entry["preview_hash"],
+            "action": "apply"
+        },
+        headers=headers
+    )
+    assert rejected.status_code == 409, rejected.text
+    print("✅ 单文档确认已拒绝（409）\n")
+
+    print("5️⃣ 只确认文档 A...")
+    response = requests.post(
+        f"{API_BASE}/v1/chat/bulk-jobs/{job_id}/confirm",
+        json={"action": "apply", "doc_ids": [doc_a]},
+        headers=headers
+    )
+    assert response.status_code == 200, response.text
+
+    again = requests.post(
+        f"{API_BASE}/v1/chat/bulk-jobs/{job_id}/confirm",
+        json={"action": "apply"},
+        headers=headers
+    )
+    assert again.status_code == 409, again.text
+    print("✅ 重复确认已拒绝（409）\n")
+
+    print("6️⃣ 等待应用完成...")
+    job = wait_for_job(headers, job_id, {"completed", "completed_with_errors", "failed"})
+    assert job["status"] == "completed", job
+    assert job["documents"][doc_a]["status"] == "applied"
+    assert job["documents"][doc_a]["changes_applied"] == 2
+    assert job["documents"][doc_b]["status"] == "cancelled"
+    print(f"✅ 进度: {job['progress']}\n")
+
+    print("7️⃣ 导出验证...")
+    content_a = requests.get(f"{API_BASE}/v1/docs/{doc_a}/export", headers=headers).json()["content"]
+    content_b = requests.get(f"{API_BASE}/v1/docs/{doc_b}/export", headers=headers).json()["content"]
+    assert "甲公司" not in content_a and content_a.count("乙公司") == 2
+    assert "甲公司" in content_b
+    print("✅ 只有确认的文档被修改")
+
+
+def test_cancel_bulk_job():
+    """测试取消任务（全部文档级 token 作废）"""
+    print("\n🧪 测试取消多文档批量任务\n")
+    headers = login()
+
+    doc_id = upload(headers, "任务取消测试文档", "# 文档\n\n旧名称出现一次。\n")
+    job_id = requests.post(
+        f"{API_BASE}/v1/chat/bulk-jobs",
+        json={
+            "message": "将所有'旧名称'替换为'新名称'",
+            "scope_filter": {"term": "旧名称", "replacement": "新名称"},
+            "doc_ids": [doc_id]
+        },
+        headers=headers
+    ).json()["job_id"]
+    job = wait_for_job(headers, job_id, {"awaiting_confirm", "no_changes", "failed"})
+    assert job["status"] == "awaiting_confirm", job
+
+    response = requests.post(
+        f"{API_BASE}/v1/chat/bulk-jobs/{job_id}/confirm",
+        json={"action": "cancel"},
+        headers=headers
+    )
+    assert response.status_code == 200, response.text
+
+    job = requests.get(f"{API_BASE}/v1/chat/bulk-jobs/{job_id}", headers=headers).json()
+    assert job["status"] == "cancelled"
+    assert job["documents"][doc_id]["status"] == "cancelled"
+
+    page = requests.post(
+        f"{API_BASE}/v1/chat/bulk-preview",
+        json={
+            "session_id": job_id,
+            "doc_id": doc_id,
+            "confirm_token": job["documents"][doc_id]["confirm_token"],
+            "cursor": 0
+        },
+        headers=headers
+    )
+    assert page.status_code == 400, page.text
+    print("✅ 取消后 token 已作废")
+
+
+if __name__ == "__main__":
+    try:
+        test_bulk_job()
+        test_cancel_bulk_job()
+        print("\n✅ 所有测试通过！")
+    except KeyboardInterrupt:
+        print("\n\n⚠️ 测试中断")
+    except Exception as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
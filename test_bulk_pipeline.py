@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+测试分页批量修改流水线（发现 → 分页预览 → 确认应用）
+
+运行前确保：
+1. 系统正在运行
+2. 已创建管理员账号（scripts/create_admin_noninteractive.py）
+"""
+import requests
+
+API_BASE = "http://localhost:8001"
+
+# 超过 BULK_PAGE_SIZE（默认 200），预览需要翻页
+PARAGRAPHS = 260
+
+
+def login():
+    """登录并返回认证头"""
+    response = requests.post(
+        f"{API_BASE}/v1/auth/login",
+        json={"username": "admin", "password": "admin123"}
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"登录失败: {response.text}")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def upload(headers, title, content):
+    """上传文档并返回 doc_id"""
+    response = requests.post(
+        f"{API_BASE}/v1/docs/upload",
+        data={"title": title, "content": content},
+        headers=headers
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"上传失败: {response.text}")
+    return response.json()["doc_id"]
+
+
+def export(headers, doc_id):
+    """导出当前活跃版本的内容"""
+    response = requests.get(f"{API_BASE}/v1/docs/{doc_id}/export", headers=headers)
+    if response.status_code != 200:
+        raise RuntimeError(f"导出失败: {response.text}")
+    return response.json()["content"]
+
+
+def test_paged_preview_and_apply():
+    """测试分页预览与确认应用"""
+    print("🧪 测试分页批量修改\n")
+    headers = login()
+
+    print("1️⃣ 上传测试文档...")
+    content = "# 分页测试文档\n\n" + "\n\n".join(
+        f"第 {i} 段内容，包含旧产品名。" for i in range(PARAGRAPHS)
+    ) + "\n"
+    doc_id = upload(headers, "分页批量修改测试文档", content)
+    print(f"✅ 文档已上传: {doc_id}\n")
+
+    print("2️⃣ 发起批量修改...")
+    response = requests.post(
+        f"{API_BASE}/v1/chat/bulk-edit",
+        json={
+            "doc_id": doc_id,
+            "message": "将所有'旧产品名'替换为'新产品名'",
+            "match_type": "exact_term",
+            "scope_filter": {"term": "旧产品名", "replacement": "新产品名"}
+        },
+        headers=headers
+    )
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["status"] == "need_confirm", result
+    assert result["preview"]["total_changes"] == PARAGRAPHS
+    assert result["next_cursor"] is not None, "第一页之后应该还有预览页"
+    print(f"✅ 总修改数: {result['preview']['total_changes']}，第一页 {len(result['preview']['diffs'])} 条\n")
+
+    print("3️⃣ 按游标翻页...")
+    seen = {diff["block_id"] for diff in result["preview"]["diffs"]}
+    cursor = result["next_cursor"]
+    pages = 1
+    while cursor is not None:
+        page = requests.post(
+            f"{API_BASE}/v1/chat/bulk-preview",
+            json={
+                "session_id": result["session_id"],
+                "doc_id": doc_id,
+                "confirm_token": result["confirm_token"],
+                "cursor": cursor
+            },
+            headers=headers
+        )
+        assert page.status_code == 200, page.text
+        page = page.json()
+        seen.update(diff["block_id"] for diff in page["diffs"])
+        cursor = page["next_cursor"]
+        pages += 1
+    assert len(seen) == PARAGRAPHS, f"翻页后得到 {len(seen)} 条 diff"
+    print(f"✅ 共 {pages} 页，{len(seen)} 条 diff 无重复\n")
+
+    print("4️⃣ 使用错误的 preview_hash 确认...")
+    wrong = requests.post(
+        f"{API_BASE}/v1/chat/bulk-confirm",
+        json={
+            "session_id": result["session_id"],
+            "doc_id": doc_id,
+            "confirm_token": result["confirm_token"],
+            "preview_hash": "0" * 64,
+            "action": "apply"
+        },
+        headers=headers
+    )
+    assert wrong.status_code == 400, wrong.text
+    print("✅ 已拒绝（token 同时作废）\n")
+
+    print("5️⃣ 重新预览并确认...")
+    result = requests.post(
+        f"{API_BASE}/v1/chat/bulk-edit",
+        json={
+            "doc_id": doc_id,
+            "message": "将所有'旧产品名'替换为'新产品名'",
+            "match_type": "exact_term",
+            "scope_filter": {"term": "旧产品名", "replacement": "新产品名"}
+        },
+        headers=headers
+    ).json()
+    confirm = requests.post(
+        f"{API_BASE}/v1/chat/bulk-confirm",
+        json={
+            "session_id": result["session_id"],
+            "doc_id": doc_id,
+            "confirm_token": result["confirm_token"],
+            "preview_hash": result["preview_hash"],
+            "action": "apply"
+        },
+        headers=headers
+    )
+    assert confirm.status_code == 200, confirm.text
+    confirm = confirm.json()
+    assert confirm["changes_applied"] == PARAGRAPHS
+    print(f"✅ 已应用 {confirm['changes_applied']} 处，新版本号 {confirm['new_rev_no']}\n")
+
+    print("6️⃣ 导出验证...")
+    exported = export(headers, doc_id)
+    assert "旧产品名" not in exported
+    assert exported.count("新产品名") == PARAGRAPHS
+    print("✅ 全部替换完成\n")
+
+
+def test_regex_replacement():
+    """测试正则替换（替换文本中的 & 在数据库内执行与 Python 路径中都是字面字符）"""
+    print("\n🧪 测试正则批量修改\n")
+    headers = login()
+
+    content = "# 正则测试文档\n\n版本 v1 已发布。\n\n版本 v22 计划中。\n\n版本号写作 V3 的不替换。\n"
+    doc_id = upload(headers, "正则批量修改测试文档", content)
+
+    result = requests.post(
+        f"{API_BASE}/v1/chat/bulk-edit",
+        json={
+            "doc_id": doc_id,
+            "message": "把版本号替换为 R&D 版本",
+            "match_type": "regex",
+            "scope_filter": {"pattern": "v[0-9]+", "replacement": "R&D"}
+        },
+        headers=headers
+    ).json()
+    assert result["status"] == "need_confirm", result
+    assert result["preview"]["total_changes"] == 2
+
+    confirm = requests.post(
+        f"{API_BASE}/v1/chat/bulk-confirm",
+        json={
+            "session_id": result["session_id"],
+            "doc_id": doc_id,
+            "confirm_token": result["confirm_token"],
+            "preview_hash": result["preview_hash"],
+            "action": "apply"
+        },
+        headers=headers
+    )
+    assert confirm.status_code == 200, confirm.text
+
+    exported = export(headers, doc_id)
+    assert "版本 R&D 已发布" in exported
+    assert "版本 R&D 计划中" in exported
+    assert "V3" in exported
+    print("✅ 正则替换结果与预览一致")
+
+
+if __name__ == "__main__":
+    try:
+        test_paged_preview_and_apply()
+        test_regex_replacement()
+        print("\n✅ 所有测试通过！")
+    except KeyboardInterrupt:
+        print("\n\n⚠️ 测试中断")
+    except Exception as e:
+        print(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()